@@ -18,7 +18,7 @@ from astropy.io import fits, ascii
 from astropy import units as u 
 #from astropy import constants as const
 
-from xastropy.atomic.elements import ELEMENTS
+from xastropy.atomic import periodic
 from xastropy.xutils import xdebug as xdb
 
 from astropy.utils.misc import isiterable
@@ -29,6 +29,84 @@ xa_path = imp.find_module('xastropy')[1]
 #def ion_name(ion):
 #def photo_cross(Z, ion, E, datfil=None, silent=False):
 
+# Solar tables already read, keyed by the path of the data file
+_SOLAR_TABLES = {}
+
+def solar_file(dat_file=None):
+    """ Path of a solar abundance file [Asplund+09]
+    """
+    if dat_file is None:
+        dat_file = xa_path+'/data/abund/solar_Apslund09.dat'
+    return os.path.abspath(dat_file)
+
+
+def read_table(dat_file=None):
+    """ Read a table of solar abundances (name, abund, Z), once per file
+
+    Parameters
+    ----------
+    dat_file : str, optional
+      Path to the abundance table [Asplund+09]
+
+    Returns
+    -------
+    table : Table
+    """
+    dat_file = solar_file(dat_file)
+    if dat_file not in _SOLAR_TABLES:
+        names=('name', 'abund', 'Z')
+        table = ascii.read(dat_file, format='no_header', names=names)
+        _SOLAR_TABLES[dat_file] = (table, abund_array(table))
+    return _SOLAR_TABLES[dat_file][0]
+
+
+def abund_array(table):
+    """ Dense array of the abundances of a table, indexed by Z
+
+    Parameters
+    ----------
+    table : Table
+      With columns Z and abund
+
+    Returns
+    -------
+    arr : ndarray
+      Solar abundance of each Z;  NaN if not in the table
+    """
+    Zs = np.asarray(table['Z'], dtype=int)
+    arr = np.empty(np.max(Zs)+1)
+    arr[:] = np.nan
+    arr[Zs] = table['abund']
+    return arr
+
+
+def to_Z(elm):
+    """ Atomic numbers from element names or numbers
+
+    Parameters
+    ----------
+    elm : int or str (or an array of either)
+
+    Returns
+    -------
+    Z : int or ndarray of int
+    """
+    arr = np.asarray(elm)
+    if arr.dtype.kind in 'iu':
+        return arr if arr.ndim > 0 else int(arr)
+    if arr.dtype.kind not in 'USO':
+        raise ValueError('abund.solar.abund: Not ready for this input yet.')
+    # Mixed lists come as digit strings
+    arr = arr.astype('U')
+    digits = np.char.isdigit(np.char.strip(arr))
+    if np.all(digits):
+        return to_Z(arr.astype(int))
+    Z = np.zeros(arr.shape, dtype=int)
+    Z[digits] = arr[digits].astype(int)
+    Z[~digits] = periodic.symbol_Z(arr[~digits])
+    return Z if arr.ndim > 0 else int(Z)
+
+
 ########################## ##########################
 ########################## ##########################
 def abund(Z,dat_file=None,table=None):
@@ -38,6 +116,10 @@ def abund(Z,dat_file=None,table=None):
     ----------
     Z: int or string (can be an array of either)
       Atomic number or name
+    dat_file : str, optional
+      Path to an alternate abundance table;  read once and cached
+    table : Table, optional
+      Table of abundances (name, abund, Z) to use instead
 
     Returns
     -------
@@ -47,30 +129,23 @@ def abund(Z,dat_file=None,table=None):
     JXP on 21 Nov 2014
     """
     if table is None:
-        # Data file
-        if dat_file is None:
-            dat_file = xa_path+'/data/abund/solar_Apslund09.dat'
-    
-        # Read table
-        names=('name', 'abund', 'Z')
-        table = ascii.read(dat_file, format='no_header', names=names) 
-
-
-    # Iterate?
-    if isiterable(Z): 
-        out_abnd = []
-        for iZ in Z:
-            out_abnd.append(abund(iZ,table=table))
-        out_abnd = np.array(out_abnd)
-    else: 
-        if isinstance(Z,int):
-            idx = np.where( table['Z'] == Z )[0]
-            if len(idx) == 0:
-                raise ValueError('abund.solar.abund: Z={:d} not in {:s}'.format(Z,dat_file))
-            out_abnd = table['abund'][idx[0]]
-        else:
-            raise ValueError('abund.solar.abund: Not ready for this input yet.')
-
+        read_table(dat_file)
+        arr = _SOLAR_TABLES[solar_file(dat_file)][1]
+    else:
+        arr = abund_array(table)
+
+    # Gather
+    Zs = to_Z(Z)
+    aZ = np.asarray(Zs)
+    bad = (aZ < 0) | (aZ >= arr.size)
+    aZ = np.where(bad, 0, aZ)
+    out_abnd = arr[aZ]
+    bad |= np.isnan(out_abnd)
+    if np.any(bad):
+        raise ValueError('abund.solar.abund: Z={} not in {}'.format(
+            np.asarray(Zs)[bad], solar_file(dat_file) if table is None else 'table'))
+    if np.ndim(out_abnd) == 0:
+        return float(out_abnd)
     return out_abnd
 
 
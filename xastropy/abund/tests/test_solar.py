@@ -0,0 +1,27 @@
+# Module to run tests on solar abundances
+
+### TEST_UNICODE_LITERALS
+
+import numpy as np
+import pytest
+
+from xastropy.abund import solar
+
+
+def test_abund():
+    np.testing.assert_allclose(solar.abund(6), 8.43)
+    np.testing.assert_allclose(solar.abund('O'), 8.69)
+    np.testing.assert_allclose(solar.abund([6, 'Fe', 6]), [8.43, 7.45, 8.43])
+    np.testing.assert_allclose(solar.abund(np.array([[6, 8], [26, 14]])),
+                               [[8.43, 8.69], [7.45, 7.51]])
+    with pytest.raises(ValueError):
+        solar.abund(200)
+
+
+def test_alt_table(tmpdir):
+    dat_file = str(tmpdir.join('solar.dat'))
+    with open(dat_file, 'w') as f:
+        f.write('C  8.00 6\nO  9.00 8\n')
+    np.testing.assert_allclose(solar.abund(['C', 'O'], dat_file=dat_file), [8., 9.])
+    with pytest.raises(ValueError):
+        solar.abund('Fe', dat_file=dat_file)
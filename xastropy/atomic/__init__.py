@@ -1,3 +1,4 @@
 import elements  # From Gohlke
 #import elements_gui  # From Gohlke
 import ionization
+import periodic
@@ -19,17 +19,22 @@ from astropy import units as u
 #from astropy import constants as const
 
 from xastropy.atomic.elements import ELEMENTS
-from xastropy.outils import roman
+from xastropy.atomic import periodic
 from xastropy.xutils import xdebug as xdb
 
 from astropy.utils.misc import isiterable
 
+try:
+    basestring
+except NameError:  # For Python 3
+    basestring = str
+
 # Path for xastropy
 xa_path = imp.find_module('xastropy')[1]
 
 #def ion_name(ion):
 #def name_ion(ion):
-#def photo_cross(Z, ion, E, datfil=None, silent=False):
+#def photo_cross(Z, ion, E, datfil=None, silent=False, cache=False):
 
 ########################## ##########################
 ########################## ##########################
@@ -53,8 +58,7 @@ def ion_name(ion,flg=0,nspace=None):
       e.g. Si II, {\rm Si}^{+}
     """
     if isinstance(ion,tuple):
-        elm = ELEMENTS[ion[0]]
-        str_elm = elm.symbol
+        str_elm = periodic.Z_symbol(ion[0])
     else: 
         return ion_name( (ion['Z'], ion['ion']) )
         #raise ValueError('ionization.ion_name: Not ready for this input yet.')
@@ -62,9 +66,7 @@ def ion_name(ion,flg=0,nspace=None):
     # Ion state
     if flg == 0: # Roman
         if nspace is None: nspace = 0
-        str_ion = roman.toRoman(ion[1]) 
-        spc = ' '*nspace
-        outp = str_elm+spc+str_ion
+        outp = periodic.zion_name(ion[0], ion[1], nspace=nspace)
     elif flg == 1: # LaTeX
         if ion[1] == 0:
             raise ValueError('ionization.ion_name: Not ready for this input yet.')
@@ -104,69 +106,128 @@ def name_ion(ion,flg=0,nspace=None):
     else: 
         raise ValueError('ionization.name_ion: Not ready for this input yet.')
 
-    if ion[1] in ['I','V', 'X', ' ']:
-        iion = 1
-    else:
-        iion = 2
+    # Hash lookup
+    return periodic.name_zion(ion)
 
-    # Element
-    Z = ELEMENTS[ion[0:iion]].number
 
-    # Ion
-    ion_state = roman.fromRoman(ion[iion:].strip())
+## Verner tables and cross-sections on cached energy grids
+_VERNER = {}
+_SIGMA_GRIDS = {}
 
-    return (Z,ion_state)
+def verner_table(datfil=None):
+    """ Fit parameters of Verner et al. 1996, read once per file
 
+    Parameters
+    ----------
+    datfil : str, optional
+      Path to the table of fit parameters
 
-########################## ##########################
-########################## ##########################
-def photo_cross(Z, ion, E, datfil=None, silent=False):
+    Returns
+    -------
+    vdict : dict
+      'pars' : ndarray (nrow, 8) of Eth, E0, s0, ya, P, yw, y0, y1
+      'idx' : ndarray (Z, ion) of the row in pars;  -1 if missing
+    """
+    if datfil is None:
+        datfil = xa_path+'/data/atomic/verner96_photoion_table1.dat'
+    datfil = os.path.abspath(datfil)
+    if datfil not in _VERNER:
+        dat = ascii.read(datfil)
+        Z = np.array(dat['Z'], dtype=int)
+        # N is the number of electrons
+        ion = Z - np.array(dat['N'], dtype=int) + 1
+        idx = -1 * np.ones((np.max(Z)+1, np.max(ion)+1), dtype=int)
+        idx[Z, ion] = np.arange(len(dat))
+        pars = np.array([dat[key] for key in
+                         ['Eth', 'E0', 's0', 'ya', 'P', 'yw', 'y0', 'y1']]).T
+        _VERNER[datfil] = dict(pars=pars, idx=idx, datfil=datfil)
+    return _VERNER[datfil]
+
+
+def verner_rows(Z, ion, vdict):
+    """ Rows of the Verner table for arrays of (Z, ion)
+    """
+    Z, ion = np.broadcast_arrays(np.asarray(Z, dtype=int), np.asarray(ion, dtype=int))
+    idx = vdict['idx']
+    ok = (Z >= 0) & (Z < idx.shape[0]) & (ion >= 0) & (ion < idx.shape[1])
+    rows = np.where(ok, idx[np.where(ok, Z, 0), np.where(ok, ion, 0)], -1)
+    if np.any(rows < 0):
+        bad = rows < 0
+        raise ValueError('photo_cross: {} pairs not in our table'.format(
+            [(int(iZ), int(iion)) for iZ, iion in zip(Z[bad], ion[bad])]))
+    return rows
+
+
+def verner_sigma(pars, E):
+    """ Evaluate the Verner fits
+
+    Parameters
+    ----------
+    pars : ndarray (..., 8)
+      Rows of the Verner table
+    E : ndarray
+      Energies (eV)
+
+    Returns
+    -------
+    sigma : ndarray (..., E.shape)
+      Cross-sections (cm^2);  0 below threshold
+    """
+    E = np.asarray(E, dtype=float)
+    # Broadcast the parameters against the energy axes
+    pars = np.asarray(pars).reshape(np.shape(pars)[:-1] + (1,)*E.ndim + (8,))
+    Eth, E0, s0, ya, P, yw, y0, y1 = [pars[..., ii] for ii in range(8)]
+    x = E/E0 - y0
+    y = np.sqrt(x**2 + y1**2)
+    F = (((x-1.)**2 + yw**2) * y**(0.5*P - 5.5) *
+            (1 + np.sqrt(y/ya))**(-1.*P))
+    sigma = s0 * F * 1e-18
+    # Energy threshold
+    return np.where(E < Eth, 0., sigma)
+
+
+def photo_cross(Z, ion, E, datfil=None, silent=False, cache=False):
     """ Estimate photo-ionization cross-section using Fit parameters
     from Verner et al. 1996, ApJ, 465, 487
     JXP on 04 Nov 2014
 
     Parameters
     ----------
-    Z: Atomic number
-    ion : Ionization state (1=Neutral)
-    E : Energy to calculate at [eV]
+    Z: int or ndarray
+      Atomic number
+    ion : int or ndarray
+      Ionization state (1=Neutral);  broadcast against Z
+    E : Quantity or ndarray
+      Energy to calculate at [eV]
+    cache : bool, optional
+      Keep the cross-sections of every ion on this energy grid,
+      for repeated calls with the same E
 
     Returns
     -------
-    sigma : Cross-section (cm^2)
+    sigma : Quantity
+      Cross-section (cm^2) with shape Z.shape + E.shape
     """
-    assert False  # USE LINETOOLS
-    # Read data
-    if datfil == None:
-        datfil = xa_path+'/data/atomic/verner96_photoion_table1.dat'
-    dat = ascii.read(datfil)
+    vdict = verner_table(datfil)
 
     # Deal with Units
     if not isinstance(E,u.quantity.Quantity):
         if silent is False: print('photo_cross: Assuming eV for input energy')
         E = E * u.eV
+    E = np.asarray(E.to(u.eV).value, dtype=float)
 
     # Match
-    #pdb.set_trace()
-    mt = np.where((Z == dat['Z']) & (ion == dat['N']))[0]
-    nmt = len(mt)
-    if nmt == 0:
-        raise ValueError('photo_cross: %d,%d pair not in our table' % (Z,ion))
-    idx = mt[0]
-    #
-    x = E/(dat['E0'][idx]*u.eV) - dat['y0'][idx]
-    y = np.sqrt(x**2 + dat['y1'][idx]**2)
-
-    F = (((x-1.)**2 + dat['yw'][idx]**2) * y**(0.5*dat['P'][idx] - 5.5) * 
-            (1 + np.sqrt(y/dat['ya'][idx]) )**(-1.*dat['P'][idx]))
+    rows = verner_rows(Z, ion, vdict)
 
-    sigma = dat['s0'][idx] * F * 1e-18 * u.cm**2 
-
-    # Energy threshold
-    low = np.where(E < dat['Eth'][idx]*u.eV)[0]
-    if len(low) > 0: sigma[low] = 0.
+    if cache:
+        key = (vdict['datfil'], E.shape, E.tobytes())
+        if key not in _SIGMA_GRIDS:
+            _SIGMA_GRIDS[key] = verner_sigma(vdict['pars'], E)
+        sigma = _SIGMA_GRIDS[key][rows]
+    else:
+        sigma = verner_sigma(vdict['pars'][rows], E)
 
-    return sigma
+    return sigma * u.cm**2
 
 # Testing
 if __name__ == '__main__':
@@ -0,0 +1,172 @@
+"""
+#;+
+#; NAME:
+#; periodic
+#;    Version 1.0
+#;
+#; PURPOSE:
+#;    Module for an array-backed periodic table and fast
+#;      conversions between element/ion names and (Z, ion)
+#;   18-Oct-2016
+#;-
+#;------------------------------------------------------------------------------
+"""
+from __future__ import print_function, absolute_import, division, unicode_literals
+
+import numpy as np
+
+from xastropy.atomic.elements import ELEMENTS
+from xastropy.outils import roman
+
+# Highest ionization state in the name maps
+MAX_ION = 30
+
+# Filled on first use by _build()
+_TABLE = {}
+
+
+def _build():
+    ''' Generate the element table and name maps from ELEMENTS
+    '''
+    nelm = len(ELEMENTS)
+    table = np.zeros(nelm+1, dtype=[(str('Z'), int), (str('symbol'), 'U3'),
+                                    (str('name'), 'U16'), (str('mass'), float),
+                                    (str('ionenergy'), float, (MAX_ION,))])
+    table['ionenergy'] = np.nan
+    table['mass'] = np.nan
+    romans = [''] + [roman.toRoman(ii) for ii in range(1, MAX_ION+2)]
+    symbol_Z = {}
+    ion_zion = {}
+    for elm in ELEMENTS:
+        Z = elm.number
+        table['Z'][Z] = Z
+        table['symbol'][Z] = elm.symbol
+        table['name'][Z] = elm.name
+        table['mass'][Z] = elm.mass
+        nion = min(len(elm.ionenergy), MAX_ION)
+        table['ionenergy'][Z, :nion] = elm.ionenergy[:nion]
+        symbol_Z[elm.symbol] = Z
+        symbol_Z[elm.name] = Z
+        for ion in range(1, min(Z+1, MAX_ION)+1):
+            ion_zion[elm.symbol+romans[ion]] = (Z, ion)
+    _TABLE['table'] = table
+    _TABLE['symbol_Z'] = symbol_Z
+    _TABLE['ion_zion'] = ion_zion
+    _TABLE['romans'] = np.array(romans)
+
+
+def elem_table():
+    ''' Structured array of the elements, indexed by Z
+
+    Fields are Z, symbol, name, mass (amu) and ionenergy (eV, NaN padded
+    to MAX_ION).  Row 0 is empty.
+    '''
+    if len(_TABLE) == 0:
+        _build()
+    return _TABLE['table']
+
+
+def _maps():
+    if len(_TABLE) == 0:
+        _build()
+    return _TABLE
+
+
+def _apply(func, names):
+    ''' Apply func once per unique name of a scalar or array of names
+    '''
+    arr = np.asarray(names)
+    if arr.ndim == 0:
+        return func(str(arr))
+    uniq, inv = np.unique(arr.astype('U'), return_inverse=True)
+    vals = [func(name) for name in uniq]
+    return np.array(vals)[inv].reshape(arr.shape + np.shape(vals[0]))
+
+
+def symbol_Z(symbol):
+    ''' Atomic number of an element symbol or name
+
+    Parameters
+    ----------
+    symbol : str or array of str
+      e.g. 'Si' or 'Silicon'
+
+    Returns
+    -------
+    Z : int or ndarray
+    '''
+    smap = _maps()['symbol_Z']
+    def lookup(name):
+        try:
+            return smap[name.strip()]
+        except KeyError:
+            raise ValueError('periodic.symbol_Z: {:s} is not an element'.format(name))
+    return _apply(lookup, symbol)
+
+
+def Z_symbol(Z):
+    ''' Element symbol(s) of atomic number(s)
+    '''
+    symbols = elem_table()['symbol'][np.asarray(Z, dtype=int)]
+    if np.ndim(symbols) == 0:
+        return str(symbols)
+    return symbols
+
+
+def name_zion(names):
+    ''' (Z, ion) of ion names
+
+    Parameters
+    ----------
+    names : str or array of str
+      e.g. 'SiII' or 'Si II'
+
+    Returns
+    -------
+    Z, ion : int or ndarray
+    '''
+    imap = _maps()['ion_zion']
+    def lookup(name):
+        key = name.replace(' ', '')
+        try:
+            return imap[key]
+        except KeyError:
+            # Beyond MAX_ION
+            for ii in range(min(2, len(key)-1), 0, -1):
+                if key[:ii] in _maps()['symbol_Z']:
+                    try:
+                        return (_maps()['symbol_Z'][key[:ii]], roman.fromRoman(key[ii:]))
+                    except roman.RomanError:
+                        pass
+            raise ValueError('periodic.name_zion: Not an ion name {:s}'.format(name))
+    zion = np.asarray(_apply(lookup, names))
+    if zion.ndim == 1:
+        return int(zion[0]), int(zion[1])
+    return zion[..., 0], zion[..., 1]
+
+
+def zion_name(Z, ion, nspace=0):
+    ''' Ion names from arrays of Z and ion
+
+    Parameters
+    ----------
+    Z, ion : int or ndarray
+    nspace : int, optional
+      Spaces between the element and the ionization state
+
+    Returns
+    -------
+    name : str or ndarray
+      e.g. 'SiII'
+    '''
+    Z, ion = np.broadcast_arrays(np.asarray(Z, dtype=int), np.asarray(ion, dtype=int))
+    if np.any(ion < 1):
+        raise ValueError('periodic.zion_name: ion must be >= 1')
+    romans = _maps()['romans']
+    if np.any(ion >= len(romans)):
+        romans = np.array([''] + [roman.toRoman(ii) for ii in range(1, np.max(ion)+1)])
+    names = np.char.add(np.char.add(elem_table()['symbol'][Z], ' '*nspace),
+                        romans[ion])
+    if names.ndim == 0:
+        return str(names)
+    return names
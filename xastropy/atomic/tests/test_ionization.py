@@ -0,0 +1,38 @@
+# Module to run tests on photo-ionization cross-sections
+
+### TEST_UNICODE_LITERALS
+
+import numpy as np
+import pytest
+
+from astropy import units as u
+
+from xastropy.atomic import ionization as xai
+
+
+def test_photo_cross():
+    # Hydrogen and neutral Helium at threshold
+    sigma = xai.photo_cross(1, 1, 13.6*u.eV)
+    np.testing.assert_allclose(sigma.to('cm**2').value, 6.346e-18, rtol=1e-3)
+    sigma = xai.photo_cross(2, 1, [20., 24.6]*u.eV)
+    assert sigma[0].value == 0.
+    np.testing.assert_allclose(sigma[1].value, 7.43e-18, rtol=1e-3)
+
+
+def test_broadcast():
+    E = np.logspace(1, 3, 100)*u.eV
+    Z = np.array([[1, 2], [6, 14]])
+    ion = np.array([[1, 1], [4, 2]])
+    sigma = xai.photo_cross(Z, ion, E)
+    assert sigma.shape == (2, 2, 100)
+    np.testing.assert_allclose(sigma[1, 0], xai.photo_cross(6, 4, E))
+    # Cached grid
+    np.testing.assert_allclose(xai.photo_cross(Z, ion, E, cache=True), sigma)
+    with pytest.raises(ValueError):
+        xai.photo_cross(1, 3, E)
+
+
+def test_ion_names():
+    assert xai.ion_name((14, 2)) == 'SiII'
+    assert xai.ion_name((6, 4), nspace=1) == 'C IV'
+    assert xai.name_ion('Si II') == (14, 2)
@@ -0,0 +1,25 @@
+# Module to run tests on the array-backed periodic table
+
+### TEST_UNICODE_LITERALS
+
+import numpy as np
+import pytest
+
+from xastropy.atomic import periodic
+
+
+def test_table():
+    tbl = periodic.elem_table()
+    assert tbl['symbol'][14] == 'Si'
+    np.testing.assert_allclose(tbl['ionenergy'][1, 0], 13.5984, rtol=1e-4)
+
+
+def test_names():
+    np.testing.assert_array_equal(periodic.symbol_Z(['Si', 'C', 'Iron']), [14, 6, 26])
+    assert periodic.name_zion('Si II') == (14, 2)
+    Z, ion = periodic.name_zion(np.array(['CIV', 'HI', 'FeXXXV']))
+    np.testing.assert_array_equal(Z, [6, 1, 26])
+    np.testing.assert_array_equal(ion, [4, 1, 35])
+    np.testing.assert_array_equal(periodic.zion_name([6, 1], [4, 1]), ['CIV', 'HI'])
+    with pytest.raises(ValueError):
+        periodic.name_zion('XyII')
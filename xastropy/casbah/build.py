@@ -38,25 +38,15 @@ warnings.warn('casbah.build: Deal with Cosmology')
 path = os.getenv('CASBAH_GALAXIES')
 skip_SDSS = True
 mk_figs = False
-for field in fields:
 
-    # Targeting for other Telescopes
-    xcasg.build_targets(field, path=path)
+# Targets, imaging and spectra (SDSS/BOSS on request);  fields in parallel
+steps = ('targets', 'imaging', 'spectra')
+if not skip_SDSS:
+    steps = steps + ('sdss',)
+xcasg.build_fields(fields, steps=steps, sdss_radius=0.2*u.deg)
 
-    # Target Imaging
-    xcasg.build_imaging(field)
-
-    # Target figures
-    if mk_figs:
+# Target figures
+if mk_figs:
+    for field in fields:
         xcassf.hectospec_targets(field)
         xcassf.deimos_targets(field)
-
-    # Spectra+Redshifts
-    xcasg.build_spectra(field)
-
-    # SDSS/BOSS
-    if not skip_SDSS:
-        xcasg.build_sdss(radius=0.2*u.deg)
-
-
-
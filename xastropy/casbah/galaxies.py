@@ -21,20 +21,25 @@ from astropy.io import fits, ascii
 from astropy import units as u 
 from astropy.table import Table, Column, MaskedColumn, vstack
 
-from astroquery.sdss import SDSS
 from astropy import coordinates as coords
 from astropy.coordinates import SkyCoord
 from astropy.cosmology import Planck15 as cosmo
 
-from linetools import utils as ltu
 
 #from astropy import constants as const
 from xastropy.casbah import utils as xcasbahu
 from xastropy.xutils import lists as xxul
 from xastropy.obs import radec as xra
+from xastropy.obs.skyindex import SkyIndex
+from xastropy.sdss import query_cache as xsqc
 
 from xastropy.xutils import xdebug as xdb
 
+# SDSS PhotoObj fields of the galaxies
+SDSS_MAGS = ['petroMag_u', 'petroMag_g', 'petroMag_r', 'petroMag_i', 'petroMag_z']
+SDSS_MAGERRS = ['petroMagErr_u', 'petroMagErr_g', 'petroMagErr_r', 'petroMagErr_i', 'petroMagErr_z']
+SDSS_PHOTOOBJ_FIELDS = ['ra', 'dec', 'objid', 'run', 'rerun', 'camcol', 'field'] + SDSS_MAGS + SDSS_MAGERRS
+
 # SDSS
 def build_sdss(field, radius=2.0*u.deg):
     """ Grab SDSS photometry and spectra for those fields in the footprint
@@ -59,13 +64,17 @@ def build_sdss(field, radius=2.0*u.deg):
         radius=radius, outfil=sdss_fil, maxsep=20., zmin=500./3e5)
         #outfig = os.environ.get('DROPBOX_DIR')+'/CASBAH/Galaxies/SDSS/PG1407+265_SDSS.pdf'
 
-def build_spectra(field, obs_path=None, path='./'):
+def build_spectra(field, obs_path=None, path='./', max_sep=2.*u.arcsec):
     """Top-level program to build spectra files
 
     Parameters
     ----------
     field : tuple
       (Name, ra, dec)
+    max_sep : Quantity, optional
+      Maximum separation when matching duplicate IDs to the targets.
+      A ValueError is raised if any duplicate has no target within
+      max_sep (the nearest target was taken before, at any separation)
     """
     if obs_path is None:
         obs_path = os.getenv('DROPBOX_DIR')+'CASBAH_Observing/'
@@ -86,30 +95,33 @@ def build_spectra(field, obs_path=None, path='./'):
     hecto_path = '/Galx_Spectra/Hectospec/'
     spfiles = glob.glob(obs_path+field[0]+hecto_path+'spHect-*')
     spfiles.sort()
-    for spfile in spfiles:
-        if 'zcat' not in spfile:  # Spectra
-            hdu = fits.open(spfile)
-            print('Reading {:s}'.format(spfile))
-            wave = hdu[0].data
-            flux = hdu[1].data
-            ivar = hdu[2].data
-            sig = np.zeros_like(flux)
-            gd = ivar > 0.
-            sig[gd] = np.sqrt(ivar[gd])
-            tbl = Table(hdu[5].data)
-            if 'hecto_wave' not in locals():
-                hecto_wave, hecto_flux, hecto_sig, hecto_stbl = wave, flux, sig, tbl
-            else:
-                hecto_wave = np.concatenate((hecto_wave, wave))
-                hecto_flux = np.concatenate((hecto_flux, flux))
-                hecto_sig = np.concatenate((hecto_sig, sig))
-                hecto_stbl = vstack([hecto_stbl,tbl])
-        else:
-            tmp = Table.read(spfile)  # z values
-            if 'hecto_ztbl' not in locals():
-                hecto_ztbl = tmp
-            else:
-                hecto_ztbl = vstack([hecto_ztbl,tmp])
+    spec_files = [spfile for spfile in spfiles if 'zcat' not in spfile]
+    zcat_files = [spfile for spfile in spfiles if 'zcat' in spfile]
+    # Preallocate from the headers
+    nfib = [fits.getheader(spfile, 1)['NAXIS2'] for spfile in spec_files]
+    i0 = np.concatenate([[0], np.cumsum(nfib)]).astype(int)
+    stbls = []
+    for kk, spfile in enumerate(spec_files):  # Spectra
+        hdu = fits.open(spfile)
+        print('Reading {:s}'.format(spfile))
+        wave = hdu[0].data
+        flux = hdu[1].data
+        ivar = hdu[2].data
+        if kk == 0:
+            shape = (i0[-1], flux.shape[1])
+            hecto_wave = np.zeros(shape, dtype=wave.dtype)
+            hecto_flux = np.zeros(shape, dtype=flux.dtype)
+            hecto_sig = np.zeros(shape, dtype=flux.dtype)
+        hecto_wave[i0[kk]:i0[kk+1]] = wave
+        hecto_flux[i0[kk]:i0[kk+1]] = flux
+        gd = ivar > 0.
+        sig = np.zeros_like(flux)
+        sig[gd] = np.sqrt(ivar[gd])
+        hecto_sig[i0[kk]:i0[kk+1]] = sig
+        stbls.append(Table(hdu[5].data))
+        hdu.close()
+    hecto_stbl = vstack(stbls)
+    hecto_ztbl = vstack([Table.read(zfile) for zfile in zcat_files])  # z values
     # Check
     if len(hecto_stbl) != len(hecto_ztbl):
         raise ValueError("Bad Hecto tables..")
@@ -125,22 +137,18 @@ def build_spectra(field, obs_path=None, path='./'):
         targ_file = xcasbahu.get_filename(field, 'TARGETS')
         targs = Table.read(targ_file,delimiter='|', format='ascii.fixed_width',
                                 fill_values=[('--','0','MASK_NAME')])
-        tcoord = SkyCoord(ra=targs['TARG_RA']*u.deg, dec=targs['TARG_DEC']*u.deg)
-        # Loop on duplicates
-        dup = np.where(counts>1)[0]
-        for idup in dup:
-            dobj = np.where(hecto_ztbl['ID'] == str(uni[idup]))[0]
-            # Loop on objects
-            for idobj in dobj:
-                dcoord = SkyCoord(ra=hecto_stbl['RA'][idobj]*u.deg,
-                                  dec=hecto_stbl['DEC'][idobj]*u.deg)
-                # Match by RA/DEC
-                mt = np.argmin(dcoord.separation(tcoord))
-                # Reset ID
-                #xdb.set_trace()
-                print('Setting ID to {:s} from {:s}'.format(
-                        str(targs['TARG_ID'][mt]), hecto_ztbl['ID'][idobj]))
-                hecto_ztbl['ID'][idobj] = str(targs['TARG_ID'][mt])
+        # Match all of the duplicates by RA/DEC at once
+        dupid = [str(dval) for dval in uni[counts>1]]
+        dobj = np.where(np.in1d(np.array(hecto_ztbl['ID']).astype(str), dupid))[0]
+        mt, _, _ = xcasbahu.match_targets(targs, hecto_stbl['RA'][dobj],
+                                          hecto_stbl['DEC'][dobj], max_sep=max_sep)
+        if np.any(mt < 0):
+            raise ValueError("Duplicate IDs without a target within {:g}".format(max_sep))
+        # Reset IDs
+        for idobj, imt in zip(dobj, mt):
+            print('Setting ID to {:s} from {:s}'.format(
+                    str(targs['TARG_ID'][imt]), hecto_ztbl['ID'][idobj]))
+            hecto_ztbl['ID'][idobj] = str(targs['TARG_ID'][imt])
     # Double check
     idval = np.array(hecto_ztbl[gdobj]['ID']).astype(int)
     uni, counts = np.unique(idval, return_counts=True)
@@ -184,24 +192,44 @@ def build_imaging(field, obs_path=None, path='./'):
         obs_path = os.getenv('DROPBOX_DIR')+'CASBAH_Observing/'
     import shutil
     # DEIMOS mask image
-    targ_file = xcasbahu.get_filename(field,'TARGETS')
-    targets = Table.read(targ_file,delimiter='|',
-        format='ascii.fixed_width', 
-        fill_values=[('--','0','MASK_NAME')])
-    deimos_targ = np.where(targets['INSTR'] == 'DEIMOS')[0]
-    if len(deimos_targ) > 0:
-        # Search for LBT image
-        msk_img = targets[deimos_targ]['TARG_IMG'][0]
-        img_fil = glob.glob(obs_path+field[0]+'/IMG/LBT/'+msk_img+'*')
+    msk_img, img_fil = lbt_images(field, obs_path)
+    if msk_img is not None:
         if len(img_fil) == 1:
             # Copy
-            path = os.getenv('CASBAH_GALAXIES')
-            shutil.copy2(img_fil[0], path+'/'+field[0]+'/')
+            path = xcasbahu.get_filename(field, 'FIELD_PATH')
+            shutil.copy2(img_fil[0], path+'/')
             print('Copied {:s}'.format(img_fil[0]))
         else:
             raise ValueError('Need to provide the image! {:s}'.format(
                 field[0]+'/IMG/LBT/'+msk_img))
 
+def lbt_images(field, obs_path):
+    """LBT images of the DEIMOS targets of a field
+
+    Parameters
+    ----------
+    field : tuple
+      (Name, ra, dec)
+    obs_path : str
+
+    Returns
+    -------
+    msk_img : str or None
+      Root of the image names;  None if there are no DEIMOS targets
+    img_fil : list of str
+      Images in obs_path matching msk_img
+    """
+    targ_file = xcasbahu.get_filename(field,'TARGETS')
+    targets = Table.read(targ_file,delimiter='|',
+        format='ascii.fixed_width', 
+        fill_values=[('--','0','MASK_NAME')])
+    deimos_targ = np.where(targets['INSTR'] == 'DEIMOS')[0]
+    if len(deimos_targ) == 0:
+        return None, []
+    # Search for LBT image
+    msk_img = targets[deimos_targ]['TARG_IMG'][0]
+    return msk_img, glob.glob(obs_path+field[0]+'/IMG/LBT/'+msk_img+'*')
+
 def build_targets(field, obs_path=None, path='./'):
     """Top-level program to build target info
 
@@ -273,6 +301,186 @@ def build_targets(field, obs_path=None, path='./'):
              #fill_values=[('--','0','DATE_OBS','TEXP')])
 
 
+def step_files(field, step, obs_path=None):
+    """Input and output files of one step of a field build
+
+    Parameters
+    ----------
+    field : tuple
+      (Name, ra, dec)
+    step : str
+      'targets', 'imaging', 'spectra' or 'sdss'
+    obs_path : str, optional
+
+    Returns
+    -------
+    inputs, outputs : list of str
+    """
+    if obs_path is None:
+        obs_path = os.getenv('DROPBOX_DIR')+'CASBAH_Observing/'
+    hecto_path = obs_path+field[0]+'/Galx_Spectra/Hectospec/'
+    mask_path = obs_path+field[0]+'/Galx_Spectra/DEIMOS/Masks/'
+    targ_file = xcasbahu.get_filename(field, 'TARGETS')
+    if step == 'targets':
+        inputs = (glob.glob(hecto_path+'*.targ') + glob.glob(hecto_path+'*.cat') +
+                  glob.glob(hecto_path+'spHect-*.fits.gz') +
+                  glob.glob(mask_path+'*targ.yaml') + glob.glob(mask_path+'*.out'))
+        outputs = [targ_file, xcasbahu.get_filename(field, 'MULTI_OBJ')]
+    elif step == 'imaging':
+        inputs = [targ_file] + glob.glob(obs_path+field[0]+'/IMG/LBT/*')
+        # Copies of the images (known once the targets are built)
+        outputs = []
+        if os.path.isfile(targ_file):
+            outpath = xcasbahu.get_filename(field, 'FIELD_PATH')
+            outputs = [os.path.join(outpath, os.path.basename(img_fil))
+                       for img_fil in lbt_images(field, obs_path)[1]]
+    elif step == 'spectra':
+        inputs = [targ_file] + glob.glob(hecto_path+'spHect-*')
+        outputs = [xcasbahu.get_filename(field, 'HECTOSPEC')]
+    elif step == 'sdss':
+        # The cached SDSS queries
+        cache = xsqc.default_cache()
+        inputs = [cache.files(sdss_fields)['rows']
+                  for sdss_fields in [SDSS_PHOTOOBJ_FIELDS, None]]
+        outputs = [xcasbahu.get_filename(field, 'SDSS')]
+    else:
+        raise ValueError('Not ready for this step: {:s}'.format(step))
+    return sorted(inputs), outputs
+
+
+def build_field(field, steps=('targets', 'imaging', 'spectra'), obs_path=None,
+                sdss_radius=0.2*u.deg, force=False):
+    """Build the files of one field, skipping steps that are up to date
+
+    A step is skipped when the stamps (mtime, size) of its inputs and
+    outputs, and its parameters, match those recorded in the field
+    manifest after its last run.
+
+    Parameters
+    ----------
+    field : tuple
+      (Name, ra, dec)
+    steps : tuple, optional
+      Build steps to run, in order;  add 'sdss' to query SDSS
+    obs_path : str, optional
+    sdss_radius : Quantity, optional
+    force : bool, optional
+      Run every step
+
+    Returns
+    -------
+    ran : list
+      Steps that were run
+    """
+    outpath = xcasbahu.get_filename(field, 'FIELD_PATH')
+    if not exists(outpath):
+        makedirs(outpath)
+    manifest = xcasbahu.read_manifest(field)
+    ran = []
+    for step in steps:
+        inputs, outputs = step_files(field, step, obs_path=obs_path)
+        params = step_params(step, sdss_radius=sdss_radius)
+        if (not force) and xcasbahu.step_uptodate(manifest.get(step), inputs, outputs,
+                                                  params=params):
+            print('CASBAH: {:s} {:s} is up to date'.format(field[0], step))
+            continue
+        if step == 'targets':
+            build_targets(field, obs_path=obs_path)
+        elif step == 'imaging':
+            build_imaging(field, obs_path=obs_path)
+        elif step == 'spectra':
+            build_spectra(field, obs_path=obs_path)
+        elif step == 'sdss':
+            build_sdss(field, radius=sdss_radius)
+        ran.append(step)
+        # Record (inputs may have been generated by an earlier step)
+        inputs, outputs = step_files(field, step, obs_path=obs_path)
+        manifest[step] = xcasbahu.step_entry(inputs, outputs, params=params)
+        xcasbahu.write_manifest(field, manifest)
+    return ran
+
+
+def step_params(step, sdss_radius=0.2*u.deg):
+    """Parameters of one step of a field build, saved in the manifest
+
+    Returns
+    -------
+    params : dict or None
+    """
+    if step == 'sdss':
+        return dict(radius=sdss_radius.to('deg').value)
+    return None
+
+
+def _build_field(args):
+    field, kwargs = args
+    return build_field(field, **kwargs)
+
+
+def build_fields(fields, nproc=4, **kwargs):
+    """Build several fields in parallel
+
+    Parameters
+    ----------
+    fields : list of tuple
+      (Name, ra, dec) of each field
+    nproc : int, optional
+      Number of processes
+    **kwargs :
+      Passed to build_field
+
+    Returns
+    -------
+    ran : dict
+      Steps run for each field
+    """
+    # Query SDSS for all of the fields in one pass
+    if 'sdss' in kwargs.get('steps', ()):
+        prefetch_sdss(fields, radius=kwargs.get('sdss_radius', 0.2*u.deg),
+                      obs_path=kwargs.get('obs_path'), force=kwargs.get('force', False))
+    nproc = min(nproc, len(fields))
+    if nproc > 1:
+        import multiprocessing
+        pool = multiprocessing.Pool(nproc)
+        try:
+            out = pool.map(_build_field, [(field, kwargs) for field in fields])
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        out = [build_field(field, **kwargs) for field in fields]
+    return dict((field[0], iran) for field, iran in zip(fields, out))
+
+
+def prefetch_sdss(fields, radius=0.2*u.deg, obs_path=None, force=False, cache=None):
+    """Fill the SDSS query cache for the fields whose SDSS step will run
+
+    Parameters
+    ----------
+    fields : list of tuple
+      (Name, ra, dec) of each field
+    radius : Quantity, optional
+    obs_path : str, optional
+    force : bool, optional
+      Include the fields with an up to date SDSS file
+    cache : QueryCache, optional
+      [sdss.query_cache.default_cache()]
+    """
+    if cache is None:
+        cache = xsqc.default_cache()
+    radecs = []
+    for field in fields:
+        inputs, outputs = step_files(field, 'sdss', obs_path=obs_path)
+        entry = xcasbahu.read_manifest(field).get('sdss')
+        if force or (not xcasbahu.step_uptodate(entry, inputs, outputs,
+                         params=step_params('sdss', sdss_radius=radius))):
+            radecs.append((field[1], field[2]))
+    if len(radecs) == 0:
+        return
+    for sdss_fields in [SDSS_PHOTOOBJ_FIELDS, None]:
+        cache.fetch(radecs, radius, fields=sdss_fields)
+
+
 # SExtrator
 def parse_sex_file(field,targ_yaml_file):
     '''Parse SExtractor file for targets
@@ -425,18 +633,18 @@ def deimos_targets(field, obs_path, deimos_path=None):
         mask_dict, targ_tab, obs_tab = parse_deimos_mask_file(msk_file)
         # Fill up SEx file
         if sex_targ is not None:
-            for targ in targ_tab:
-                targ_coord = xra.to_coord((targ['RAS'], targ['DECS']))
-                sep = targ_coord.separation(sex_coord)
-                isep = np.argmin(sep)
-                if sep[isep] > 0.5*u.arcsec:
-                    raise ValueError('No match in SExtractor?!')
-                else: # Fill
-                    if sex_msk_clms['MASK_NAME'][isep] == smsk:
-                        sex_msk_clms['MASK_NAME'][isep] = mask_dict['MASK_NAME']
-                    else: # Already full 
-                        sex_targ.add_row(sex_targ[isep])
-                        sex_msk_clms['MASK_NAME'].append(mask_dict['MASK_NAME'])
+            # Match all of the mask targets at once
+            idx, _, sep2d = coords.match_coordinates_sky(
+                SkyCoord(ra=targ_tab['TARG_RA']*u.deg, dec=targ_tab['TARG_DEC']*u.deg),
+                sex_coord, nthneighbor=1)
+            if np.any(sep2d > 0.5*u.arcsec):
+                raise ValueError('No match in SExtractor?!')
+            for isep in idx: # Fill
+                if sex_msk_clms['MASK_NAME'][isep] == smsk:
+                    sex_msk_clms['MASK_NAME'][isep] = mask_dict['MASK_NAME']
+                else: # Already full 
+                    sex_targ.add_row(sex_targ[isep])
+                    sex_msk_clms['MASK_NAME'].append(mask_dict['MASK_NAME'])
         # Append
         all_masks.append(mask_dict)
         all_masktarg.append(targ_tab)
@@ -538,6 +746,9 @@ def parse_deimos_mask_file(msk_file):
         obs_tab = None
     # Targ
     targ_tab = xxul.dict_list_to_table(all_targ)
+    rad, decd = xra.stod_arrays(targ_tab['RAS'], targ_tab['DECS'])
+    targ_tab.add_column(Column(rad.value, name='TARG_RA'))
+    targ_tab.add_column(Column(decd.value, name='TARG_DEC'))
 
     # Return
     return mask_dict, targ_tab, obs_tab 
@@ -585,13 +796,10 @@ def hecto_targets(field, obs_path, hecto_path=None):
     nrow = len(targs)
     targs.rename_column('ra','RAS')
     targs.rename_column('dec','DECS')
-    targs.add_column(Column([0.]*nrow,name='TARG_RA'))
-    targs.add_column(Column([0.]*nrow,name='TARG_DEC'))
     # Get RA/DEC in degrees
-    for k,row in enumerate(targs):
-        coord = ltu.radec_to_coord((row['RAS'], row['DECS']))
-        targs[k]['TARG_RA'] = coord.ra.value
-        targs[k]['TARG_DEC'] = coord.dec.value
+    rad, decd = xra.stod_arrays(targs['RAS'], targs['DECS'])
+    targs.add_column(Column(rad.value,name='TARG_RA'))
+    targs.add_column(Column(decd.value,name='TARG_DEC'))
     # ID/Mag (not always present)
     targ_coord = SkyCoord(ra=targs['TARG_RA']*u.deg, dec=targs['TARG_DEC']*u.deg)
     try:
@@ -745,7 +953,8 @@ def galaxy_attrib():
 
 
 def grab_sdss_spectra(radec, radius=0.1*u.deg, outfil=None,
-                      debug=False, maxsep=None, timeout=600., zmin=None):
+                      debug=False, maxsep=None, timeout=600., zmin=None,
+                      cache=None):
     """ Grab SDSS spectra
 
     Parameters
@@ -762,6 +971,8 @@ def grab_sdss_spectra(radec, radius=0.1*u.deg, outfil=None,
       Maximum separation to include
     zmin : float (None)
       Minimum redshift to include
+    cache : QueryCache, optional
+      Cache of the SDSS queries and spectra [sdss.query_cache.default_cache()]
 
     Returns
     -------
@@ -771,14 +982,14 @@ def grab_sdss_spectra(radec, radius=0.1*u.deg, outfil=None,
 
     cC = coords.SkyCoord(ra=radec[0], dec=radec[1])
 
-    # Query
-    photoobj_fs = ['ra', 'dec', 'objid', 'run', 'rerun', 'camcol', 'field']
-    mags = ['petroMag_u', 'petroMag_g', 'petroMag_r', 'petroMag_i', 'petroMag_z']
-    magsErr = ['petroMagErr_u', 'petroMagErr_g', 'petroMagErr_r', 'petroMagErr_i', 'petroMagErr_z']
-
-    phot_catalog = SDSS.query_region(cC,spectro=True,radius=radius, timeout=timeout,
-                                     photoobj_fields=photoobj_fs+mags+magsErr) # Unique
-    spec_catalog = SDSS.query_region(cC,spectro=True, radius=radius, timeout=timeout) # Duplicates exist
+    # Query (through the cache)
+    if cache is None:
+        cache = xsqc.default_cache(timeout=timeout)
+    mags = SDSS_MAGS
+    magsErr = SDSS_MAGERRS
+    phot_catalog = cache.query_region(radec[0], radec[1], radius,
+                                      fields=SDSS_PHOTOOBJ_FIELDS) # Unique
+    spec_catalog = cache.query_region(radec[0], radec[1], radius) # Duplicates exist
     nobj = len(phot_catalog)
 
     #
@@ -786,13 +997,13 @@ def grab_sdss_spectra(radec, radius=0.1*u.deg, outfil=None,
 
     # Coordinates
     cgal = SkyCoord(ra=phot_catalog['ra']*u.degree, dec=phot_catalog['dec']*u.degree)
-    sgal = SkyCoord(ra=spec_catalog['ra']*u.degree, dec=spec_catalog['dec']*u.degree)
+    spec_index = SkyIndex(spec_catalog['ra'], spec_catalog['dec'])
     sepgal = cgal.separation(cC) #in degrees
 
     # Check for problems and parse z
     zobj = np.zeros(nobj)
-    idx, d2d, d3d = coords.match_coordinates_sky(cgal, sgal, nthneighbor=1)
-    if np.max(d2d) > 1.*u.arcsec:
+    idx, _ = spec_index.match(phot_catalog['ra'], phot_catalog['dec'], radius=1.*u.arcsec)
+    if np.any(idx < 0):
         print('No spectral match!')
         xdb.set_trace()
     else:
@@ -839,7 +1050,7 @@ def grab_sdss_spectra(radec, radius=0.1*u.deg, outfil=None,
         #print('idx = {:d}'.format(idx))
 
         # Grab spectra (there may be duplicates)
-        mt = np.where( sgal.separation(cgal[idx]).to('arcsec') < 1.*u.Unit('arcsec'))[0]
+        mt, _ = spec_index.cone(obj['ra'], obj['dec'], 1.*u.arcsec)
         if len(mt) > 1:
             # Use BOSS if you have it
             mmt = np.where( spec_catalog[mt]['instrument'] == 'BOSS')[0]
@@ -853,7 +1064,7 @@ def grab_sdss_spectra(radec, radius=0.1*u.deg, outfil=None,
             mt = mt[0]
 
         # Grab spectra
-        spec_hdus = SDSS.get_spectra(matches=Table(spec_catalog[mt]))
+        spec_hdus = cache.get_spectra(spec_catalog[mt])
 
         tbl[idx]['INSTRUMENT'] = spec_catalog[mt]['instrument']
         spec = spec_hdus[0][1].data
@@ -13,6 +13,7 @@
 from __future__ import print_function, absolute_import, division, unicode_literals
 
 import numpy as np
+import copy
 from astropy import units as u
 from astropy.coordinates import SkyCoord
 from astropy.table import Table
@@ -20,49 +21,106 @@ from astropy.table import Table
 from pyigm.field.igmfield import IgmGalaxyField
 
 #from astropy import constants as const
-from xastropy.casbah import galaxy_data as xcgd
 from xastropy.casbah import utils as xcasbahu
 from xastropy.xutils import lists as xxul
+from xastropy.xutils import files as xxf
 
 from xastropy.xutils import xdebug as xdb
 
-# SDSS
-def load_field(field):
-    ''' Load up CASBAH data for a given field
+def read_targets(targ_file):
+    '''Read a CASBAH targets file (fixed width, '|' delimited)
+    '''
+    return Table.read(targ_file,delimiter='|',
+        format='ascii.fixed_width',
+        fill_values=[('--','0','MASK_NAME')])
+
+
+def read_observing(obs_file):
+    '''Read a CASBAH MULTI_OBJ file of observing details
+    '''
+    observing = Table.read(obs_file,delimiter='|',
+        format='ascii.fixed_width',
+        fill_values=[('--','0','DATE_OBS','TEXP')])
+    return Table(observing,masked=True) # Insist on Masked
+
+
+# Attribute: (ftype, reader, binary cache?)
+#   The FITS tables are read directly;  the ASCII ones are cached
+_TABLES = dict(targets=('TARGETS', read_targets, True),
+               observing=('MULTI_OBJ', read_observing, True),
+               galaxies=('SDSS', Table.read, False),
+               hectospec=('HECTOSPEC', Table.read, False))
+
+
+def _lazy_table(attr):
+    '''Property reading a table of the field on first access
+    '''
+    def getter(self):
+        if self._tables.get(attr) is None:
+            self._tables[attr] = self.load_table(attr)
+        return self._tables[attr]
+    def setter(self, value):
+        self._tables[attr] = value
+    return property(getter, setter, doc='{:s} Table (loaded on first use)'.format(attr))
+
+
+class CasbahField(IgmGalaxyField):
+    '''IgmGalaxyField for a CASBAH field whose tables are read lazily
+
+    The ASCII tables are parsed once and kept in a binary cache that
+    is invalidated when the file changes (xutils.files.cached_parse).
 
     Parameters:
     -----------
     field: tuple
       (Name, ra, dec)
-
-    Returns:
-    --------
-    lfield:     
-      Loaded IgmGalaxyField class
+    use_cache: bool, optional
+      Use the binary cache of the ASCII tables
     '''
-    reload(xcasbahu)
-    lfield = IgmGalaxyField((field[1],field[2]), name=field[0])
+    targets = _lazy_table('targets')
+    observing = _lazy_table('observing')
+    galaxies = _lazy_table('galaxies')
+    hectospec = _lazy_table('hectospec')
 
-    # Load targets
-    targ_file = xcasbahu.get_filename(field,'TARGETS')
-    lfield.targets = Table.read(targ_file,delimiter='|',
-        format='ascii.fixed_width', 
-        fill_values=[('--','0','MASK_NAME')])
+    def __init__(self, field, use_cache=True):
+        self._tables = {}
+        self.field = field
+        self.use_cache = use_cache
+        IgmGalaxyField.__init__(self, (field[1],field[2]), name=field[0])
 
-    # Load observing details for multi-object follow-up
-    obs_file = xcasbahu.get_filename(field,'MULTI_OBJ')
-    lfield.observing = Table.read(obs_file,delimiter='|',
-        format='ascii.fixed_width', 
-        fill_values=[('--','0','DATE_OBS','TEXP')])
-    lfield.observing = Table(lfield.observing,masked=True) # Insist on Masked
+    def load_table(self, attr):
+        '''Read one of the tables of the field
+
+        Parameters:
+        -----------
+        attr: str
+          targets, observing, galaxies or hectospec
+        '''
+        ftype, reader, cache = _TABLES[attr]
+        fil = xcasbahu.get_filename(self.field, ftype)
+        if cache:
+            # Copy, so the cached Table is never modified
+            return copy.deepcopy(xxf.cached_parse(fil, reader, tag='casbah_'+attr,
+                                                  use_cache=self.use_cache))
+        return reader(fil)
+
+
+def load_field(field, use_cache=True):
+    ''' Load up CASBAH data for a given field
 
-    # Load galaxies
-    sdss_file = xcasbahu.get_filename(field,'SDSS')
-    sdss_tab = Table.read(sdss_file)
-    # VSTACK
-    hectospec_file = xcasbahu.get_filename(field,'HECTOSPEC')
+    The targets, observing, galaxies and hectospec tables are only
+    read when first accessed.
 
-    lfield.galaxies = sdss_tab
+    Parameters:
+    -----------
+    field: tuple
+      (Name, ra, dec)
+    use_cache: bool, optional
+      Use the binary cache of the ASCII tables
 
-    # Return
-    return lfield
+    Returns:
+    --------
+    lfield: CasbahField
+      Loaded IgmGalaxyField class
+    '''
+    return CasbahField(field, use_cache=use_cache)
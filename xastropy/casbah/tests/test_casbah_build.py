@@ -0,0 +1,72 @@
+# Tests the manifest of the CASBAH field builds
+import numpy as np
+import os
+import pytest
+
+from astropy.table import Table
+from astropy import units as u
+
+from xastropy.casbah import galaxies as xcg
+from xastropy.casbah import utils as xcasbahu
+
+FIELD = ('TST_FIELD', 212.34957, 26.30585)
+
+
+def append(fil, text='x'):
+    with open(fil, 'a') as f:
+        f.write(text)
+
+
+@pytest.fixture
+def build(tmpdir, monkeypatch):
+    monkeypatch.setenv('CASBAH_GALAXIES', str(tmpdir.join('gal')))
+    monkeypatch.setenv('XASTROPY_CACHE', str(tmpdir.join('cache')))
+    obs_path = str(tmpdir.join('obs'))+'/'
+    hecto_path = obs_path+FIELD[0]+'/Galx_Spectra/Hectospec/'
+    img_path = obs_path+FIELD[0]+'/IMG/LBT/'
+    os.makedirs(hecto_path)
+    os.makedirs(img_path)
+    append(hecto_path+'mask1.cat')
+    append(img_path+'img1.fits')
+    # Stub steps
+    def build_targets(field, obs_path=None):
+        targs = Table(dict(TARG_ID=[1, 2], INSTR=['MMT', 'DEIMOS'], TARG_IMG=['--', 'img1'],
+                           MASK_NAME=['m1', 'm2']),
+                      names=('TARG_ID', 'INSTR', 'TARG_IMG', 'MASK_NAME'))
+        targs.write(xcasbahu.get_filename(field, 'TARGETS'), format='ascii.fixed_width',
+                    delimiter='|', overwrite=True)
+        append(xcasbahu.get_filename(field, 'MULTI_OBJ'))
+    def build_sdss(field, radius=None):
+        append(xcasbahu.get_filename(field, 'SDSS'))
+    monkeypatch.setattr(xcg, 'build_targets', build_targets)
+    monkeypatch.setattr(xcg, 'build_sdss', build_sdss)
+    def run(**kwargs):
+        return xcg.build_field(FIELD, obs_path=obs_path, **kwargs)
+    return run, hecto_path, img_path
+
+
+def test_build_manifest(build):
+    run, hecto_path, img_path = build
+    steps = ('targets', 'imaging')
+    assert run(steps=steps) == ['targets', 'imaging']
+    img_copy = os.path.join(xcasbahu.get_filename(FIELD, 'FIELD_PATH'), 'img1.fits')
+    assert os.path.isfile(img_copy)
+    # Nothing changed
+    assert run(steps=steps) == []
+    # Output removed
+    os.remove(img_copy)
+    assert run(steps=steps) == ['imaging']
+    # Inputs changed
+    append(img_path+'img1.fits')
+    assert run(steps=steps) == ['imaging']
+    append(hecto_path+'mask1.cat')
+    assert 'targets' in run(steps=steps)
+    assert run(steps=steps) == []
+
+
+def test_build_params(build):
+    run = build[0]
+    assert run(steps=('sdss',)) == ['sdss']
+    assert run(steps=('sdss',)) == []
+    assert run(steps=('sdss',), sdss_radius=0.3*u.deg) == ['sdss']
+    assert run(steps=('sdss',), force=True) == ['sdss']
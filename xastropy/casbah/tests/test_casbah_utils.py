@@ -0,0 +1,29 @@
+# Tests the CASBAH utilities
+import numpy as np
+import os
+import pytest
+
+from astropy.table import Table
+from astropy import units as u
+
+from xastropy.casbah import utils as xcasbahu
+
+
+def test_match_targets():
+    dec0 = 26.3
+    ddeg = 1./3600/np.cos(np.radians(dec0))  # 1 arcsec in RA
+    targs = Table(dict(TARG_ID=[10, 11, 12, 13],
+                       TARG_RA=[212.3, 212.4, 212.4+1.5*ddeg, 212.5],
+                       TARG_DEC=[dec0]*4), names=('TARG_ID', 'TARG_RA', 'TARG_DEC'))
+    # Unique, ambiguous and unmatched positions
+    ra = np.array([212.3+0.5*ddeg, 212.4+0.5*ddeg, 212.6])
+    dec = np.array([dec0]*3)
+    idx, sep, ambig = xcasbahu.match_targets(targs, ra, dec, max_sep=2.*u.arcsec)
+    assert list(idx) == [0, 1, -1]
+    np.testing.assert_allclose(sep[:2], 0.5, rtol=1e-3)
+    assert list(ambig) == [False, True, False]
+    # Nothing within a smaller max_sep
+    idx, _, ambig = xcasbahu.match_targets(targs, ra, dec, max_sep=0.1*u.arcsec,
+                                           sindex=xcasbahu.targ_index(targs))
+    assert np.all(idx == -1)
+    assert not np.any(ambig)
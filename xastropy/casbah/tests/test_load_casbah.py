@@ -0,0 +1,40 @@
+# Tests the loading of CASBAH fields
+import numpy as np
+import os
+import pytest
+
+from astropy.table import Table
+
+pytest.importorskip('pyigm')
+from xastropy.casbah import load_casbah as xcl
+
+FIELD = ('TST_FIELD', 212.34957, 26.30585)
+
+
+def write_targets(path, ntarg):
+    targs = Table(dict(TARG_ID=np.arange(ntarg), TARG_RA=np.linspace(212.3, 212.4, ntarg),
+                       TARG_DEC=np.full(ntarg, 26.3), MASK_NAME=['m1']*ntarg),
+                  names=('TARG_ID', 'TARG_RA', 'TARG_DEC', 'MASK_NAME'))
+    targ_file = os.path.join(path, FIELD[0], FIELD[0]+'_targets.ascii')
+    targs.write(targ_file, format='ascii.fixed_width', delimiter='|', overwrite=True)
+    return targ_file
+
+
+def test_load_field(tmpdir, monkeypatch):
+    monkeypatch.setenv('CASBAH_GALAXIES', str(tmpdir))
+    monkeypatch.setenv('XASTROPY_CACHE', str(tmpdir.join('cache')))
+    os.makedirs(str(tmpdir.join(FIELD[0])))
+    targ_file = write_targets(str(tmpdir), 3)
+    # Lazy:  no SDSS file is needed unless galaxies is used
+    lfield = xcl.load_field(FIELD)
+    assert len(lfield.targets) == 3
+    with pytest.raises(IOError):
+        lfield.galaxies
+    # Loads are independent
+    lfield.targets['NEW'] = 1
+    assert 'NEW' not in xcl.load_field(FIELD).targets.colnames
+    # A changed file invalidates the cache
+    stat = os.stat(targ_file)
+    write_targets(str(tmpdir), 5)
+    os.utime(targ_file, (stat.st_atime, stat.st_mtime+10))
+    assert len(xcl.load_field(FIELD).targets) == 5
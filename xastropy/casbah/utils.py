@@ -13,12 +13,13 @@
 from __future__ import print_function, absolute_import, division, unicode_literals
 
 import numpy as np
-import os, imp, glob, copy
+import os, imp, glob, copy, io, json
 from astropy.io import fits, ascii
 from astropy import units as u 
 from astropy.coordinates import SkyCoord
 
 from xastropy.obs import radec as xra
+from xastropy.obs.skyindex import SkyIndex
 
 from xastropy.xutils import xdebug as xdb
 
@@ -47,8 +48,138 @@ def get_filename(field, ftype):
         filename = path+'/'+field[0]+'/'+field[0]+'_deimostarg.pdf'
     elif ftype == 'HECTO_TARG_FIG':
         filename = path+'/'+field[0]+'/'+field[0]+'_hectotarg.pdf'
+    elif ftype == 'MANIFEST':
+        filename = path+'/'+field[0]+'/'+field[0]+'_MANIFEST.json'
     else:
         raise ValueError('Not ready for this ftype: {:s}'.format(ftype))
     # Return
     return filename
 
+
+
+def file_stamps(files):
+    '''(mtime, size) of each file, keyed by path;  None if missing
+    '''
+    stamps = {}
+    for fil in files:
+        if os.path.isfile(fil):
+            stat = os.stat(fil)
+            stamps[fil] = [stat.st_mtime, stat.st_size]
+        else:
+            stamps[fil] = None
+    return stamps
+
+
+def read_manifest(field):
+    '''Read the build manifest of a field;  empty if none
+
+    Returns:
+    --------
+    manifest: dict
+      Keyed by build step, each with the 'inputs' and 'outputs' stamps
+    '''
+    man_file = get_filename(field, 'MANIFEST')
+    if not os.path.isfile(man_file):
+        return {}
+    with io.open(man_file, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def write_manifest(field, manifest):
+    '''Write the build manifest of a field
+    '''
+    man_file = get_filename(field, 'MANIFEST')
+    with io.open(man_file, 'w', encoding='utf-8') as f:
+        f.write(json.dumps(manifest, sort_keys=True, indent=2))
+
+
+def step_entry(inputs, outputs, params=None):
+    '''Manifest entry of a build step that has just run
+
+    Parameters:
+    -----------
+    inputs, outputs: list of str
+      Files read and written by the step
+    params: dict, optional
+      Parameters of the step (JSON types)
+
+    Returns:
+    --------
+    entry: dict
+    '''
+    return dict(inputs=file_stamps(inputs), outputs=file_stamps(outputs),
+                params=params)
+
+
+def step_uptodate(entry, inputs, outputs, params=None):
+    '''Do the inputs, outputs and parameters of a build step match its
+    manifest entry?
+
+    Parameters:
+    -----------
+    entry: dict or None
+      Manifest entry of the step
+    inputs, outputs: list of str
+      Files read and written by the step
+    params: dict, optional
+      Parameters of the step (JSON types)
+
+    Returns:
+    --------
+    uptodate: bool
+    '''
+    if entry is None:
+        return False
+    out_stamps = file_stamps(outputs)
+    if any([stamp is None for stamp in out_stamps.values()]):
+        return False
+    return ((entry['inputs'] == file_stamps(inputs)) & (entry['outputs'] == out_stamps)
+            & (entry.get('params') == params))
+
+
+def targ_index(targs):
+    '''Sky index of a CASBAH targets table (TARG_RA, TARG_DEC in deg)
+    '''
+    return SkyIndex(np.array(targs['TARG_RA'], dtype=float),
+                    np.array(targs['TARG_DEC'], dtype=float))
+
+
+def match_targets(targs, ra, dec, max_sep=2.*u.arcsec, sindex=None,
+                  verbose=True):
+    '''Match a set of positions to a CASBAH targets table in one pass
+
+    Parameters:
+    -----------
+    targs: Table
+      Targets, with TARG_RA, TARG_DEC (and TARG_ID for the report)
+    ra, dec: ndarray or Quantity
+      Decimal degrees if not Quantity
+    max_sep: Quantity, optional
+      Maximum separation of a match
+    sindex: SkyIndex, optional
+      From targ_index;  built here if not given
+    verbose: bool, optional
+      Report the unmatched and ambiguous positions
+
+    Returns:
+    --------
+    idx: ndarray
+      Row of the nearest target;  -1 if none within max_sep
+    sep: ndarray
+      Separation in arcsec
+    ambig: ndarray of bool
+      More than one target within max_sep
+    '''
+    if sindex is None:
+        sindex = targ_index(targs)
+    idx, sep = sindex.match(ra, dec, radius=max_sep)
+    ambig = sindex.count(ra, dec, max_sep) > 1
+    idx, sep, ambig = np.atleast_1d(idx), np.atleast_1d(sep), np.atleast_1d(ambig)
+    if verbose:
+        for ii in np.where(idx < 0)[0]:
+            print('match_targets: No target within {:g} of position {:d}'.format(
+                max_sep, ii))
+        for ii in np.where(ambig)[0]:
+            print('match_targets: Ambiguous match for position {:d};  taking {:s} at {:.2f} arcsec'.format(
+                ii, str(targs['TARG_ID'][idx[ii]]), sep[ii]))
+    return idx, sep, ambig
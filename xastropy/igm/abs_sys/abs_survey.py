@@ -0,0 +1,217 @@
+"""
+#;+
+#; NAME:
+#; abs_survey
+#;    Version 1.0
+#;
+#; PURPOSE:
+#;    Module for surveys of Absorption Systems stored as columns
+#;   18-Oct-2016
+#;-
+#;------------------------------------------------------------------------------
+"""
+
+from __future__ import print_function, absolute_import, division, unicode_literals
+
+import numpy as np
+
+from astropy import units as u
+from astropy.table import Table, QTable, Column
+from astropy.coordinates import SkyCoord
+
+from xastropy.igm.abs_sys.abssys_utils import GenericAbsSystem
+
+
+###################### ######################
+# Class for a survey of Absorption Line Systems
+class AbslineSurvey(object):
+    """A survey of absorption line systems, stored as columns
+
+    AbslineSystem objects are only generated when a system is
+    accessed by index (and are then kept).
+
+    Attributes
+        abs_type : str
+        ref : str
+          Reference for the survey
+        sys_class : class
+          AbslineSystem class generated on access;  called with kwargs
+        _data : Table
+          name, zabs, zem, NHI, sigNHI (-/+), MH, RA, Dec (deg), Refs
+    """
+    # Columns of the survey
+    colnames = ('name', 'zabs', 'zem', 'NHI', 'sigNHI', 'MH', 'RA', 'Dec', 'Refs')
+
+    # Init
+    def __init__(self, abs_type, ref='', sys_class=None):
+        self.abs_type = abs_type
+        self.ref = ref
+        if sys_class is None:
+            sys_class = GenericAbsSystem
+        self.sys_class = sys_class
+        self._data = self.empty_table(0)
+        self._systems = {}  # AbslineSystem objects already generated
+
+    @classmethod
+    def empty_table(cls, nsys):
+        """ Table of the survey columns for nsys systems
+        """
+        return Table([Column(np.zeros(nsys, dtype='U40'), name='name'),
+                      Column(np.zeros(nsys), name='zabs'),
+                      Column(np.zeros(nsys), name='zem'),
+                      Column(np.zeros(nsys), name='NHI'),
+                      Column(np.zeros((nsys, 2)), name='sigNHI'),
+                      Column(np.zeros(nsys), name='MH'),
+                      Column(np.zeros(nsys), name='RA', unit=u.deg),
+                      Column(np.zeros(nsys), name='Dec', unit=u.deg),
+                      Column(np.zeros(nsys, dtype='U80'), name='Refs')])
+
+    @classmethod
+    def from_arrays(cls, abs_type, zabs, RA, Dec, name=None, zem=None, NHI=None,
+                    sigNHI=None, MH=None, Refs=None, **kwargs):
+        """ Generate a survey from arrays of the system properties
+
+        Parameters
+        ----------
+        abs_type : str
+        zabs : ndarray
+        RA, Dec : Quantity or ndarray (deg)
+        name, zem, NHI, sigNHI, MH : ndarray, optional
+        Refs : list of lists, optional
+        **kwargs :
+          Passed to the Init
+
+        Returns
+        -------
+        survey : AbslineSurvey
+        """
+        slf = cls(abs_type, **kwargs)
+        nsys = len(zabs)
+        data = cls.empty_table(nsys)
+        # Fill in place, keeping the column units
+        data['zabs'][:] = zabs
+        data['RA'][:] = u.Quantity(RA, u.deg).value
+        data['Dec'][:] = u.Quantity(Dec, u.deg).value
+        for key, val in zip(['zem', 'NHI', 'MH'], [zem, NHI, MH]):
+            if val is not None:
+                data[key][:] = val
+        if sigNHI is not None:
+            data['sigNHI'][:] = np.resize(np.asarray(sigNHI, dtype=float), (nsys, 2))
+        if name is None:
+            name = ['{:s}_{:d}'.format(abs_type, ii) for ii in range(nsys)]
+        data.replace_column('name', Column(np.array(name, dtype='U'), name='name'))
+        if Refs is not None:
+            data.replace_column('Refs', Column(
+                np.array([','.join(refs) for refs in Refs], dtype='U'), name='Refs'))
+        slf._data = data
+        return slf
+
+    @classmethod
+    def from_systems(cls, systems, abs_type=None, **kwargs):
+        """ Generate a survey from a list of AbslineSystem objects
+
+        The input objects are kept and returned on access.
+        """
+        if abs_type is None:
+            abs_type = systems[0].abs_type
+        coords = SkyCoord([isys.coord for isys in systems])
+        slf = cls.from_arrays(abs_type,
+            np.array([isys.zabs for isys in systems]),
+            coords.ra.deg, coords.dec.deg,
+            name=[isys.name for isys in systems],
+            zem=np.array([isys.zem for isys in systems]),
+            NHI=np.array([isys.NHI for isys in systems]),
+            sigNHI=np.array([np.resize(isys.sigNHI, 2) for isys in systems]),
+            MH=np.array([isys.MH for isys in systems]),
+            Refs=[isys.Refs for isys in systems], **kwargs)
+        slf._systems = dict(enumerate(systems))
+        return slf
+
+    @property
+    def nsys(self):
+        return len(self._data)
+
+    def __len__(self):
+        return self.nsys
+
+    @property
+    def coord(self):
+        """ SkyCoord of all the systems
+        """
+        return SkyCoord(ra=self._data['RA'], dec=self._data['Dec'], unit='deg')
+
+    def __getattr__(self, k):
+        """ Passback a column of the survey as an array
+        """
+        if k.startswith('_') or (k not in self.colnames):
+            raise AttributeError(k)
+        if k == 'Refs':
+            return [refs.split(',') if len(refs) > 0 else []
+                    for refs in self._data['Refs']]
+        return np.array(self._data[k])
+
+    def mk_system(self, idx):
+        """ Generate the AbslineSystem for one row of the survey
+        """
+        row = self._data[idx]
+        isys = self.sys_class(zabs=row['zabs'], zem=row['zem'], NHI=row['NHI'],
+                              sigNHI=np.array(row['sigNHI']), MH=row['MH'],
+                              RA=row['RA']*u.deg, Dec=row['Dec']*u.deg)
+        isys.name = row['name']
+        isys.Refs = row['Refs'].split(',') if len(row['Refs']) > 0 else []
+        return isys
+
+    def __getitem__(self, idx):
+        """ int: AbslineSystem (generated on first access)
+        slice, int array or bool mask: sub-survey
+        """
+        if isinstance(idx, (int, np.integer)):
+            if idx < 0:
+                idx += self.nsys
+            if idx not in self._systems:
+                self._systems[idx] = self.mk_system(idx)
+            return self._systems[idx]
+        else:
+            return self.select(idx)
+
+    def __iter__(self):
+        for ii in range(self.nsys):
+            yield self[ii]
+
+    def select(self, idx):
+        """ Sub-survey from a bool mask, int array or slice
+
+        Parameters
+        ----------
+        idx : ndarray or slice
+
+        Returns
+        -------
+        survey : AbslineSurvey
+        """
+        rows = np.arange(self.nsys)[idx]
+        new = self.__class__(self.abs_type, ref=self.ref, sys_class=self.sys_class)
+        new._data = self._data[rows]
+        new._systems = dict((jj, self._systems[ii]) for jj, ii in enumerate(rows)
+                            if ii in self._systems)
+        return new
+
+    def sort(self, keys):
+        """ Sorted copy of the survey
+
+        Parameters
+        ----------
+        keys : str or list of str
+          Column(s) to sort on
+        """
+        return self.select(self._data.argsort(keys))
+
+    def to_table(self):
+        """ QTable of the survey, one row per system
+        """
+        return QTable(self._data, copy=True)
+
+    # #############
+    def __repr__(self):
+        return ('[AbslineSurvey: {:s}, nsys={:d}, ref={:s}]'.format(
+                self.abs_type, self.nsys, self.ref))
@@ -14,6 +14,7 @@
 from __future__ import print_function, absolute_import, division, unicode_literals
 
 import numpy as np
+import bisect
 from abc import ABCMeta, abstractmethod
 from collections import OrderedDict
 
@@ -29,6 +30,141 @@ from xastropy.igm.abs_sys.ionclms import IonClms, Ionic_Clm_File
 from xastropy.xutils import xdebug as xdb
 from xastropy.atomic import ionization as xai
 
+try:
+    basestring
+except NameError:  # For Python 3
+    basestring = str
+
+# Tolerance when matching lines (and AbsID rows) by rest wavelength
+WREST_TOLER = 1e-4*u.AA
+
+# LineList('ISM') shared by all systems in the process
+_ISM_LINELIST = None
+
+def ism_linelist():
+    '''Return the shared LineList('ISM'), building it on the first call
+    '''
+    global _ISM_LINELIST
+    if _ISM_LINELIST is None:
+        _ISM_LINELIST = LineList('ISM')
+    return _ISM_LINELIST
+
+###################### ######################
+# List of lines with lookup indices
+class LineIndex(list):
+    '''List of AbsLine objects indexed by rest wavelength, name and Zion
+
+    The wavelength index is kept sorted (O(log n) lookup) and the name
+    and Zion indices are hashes (O(1)).  Both are updated by the usual
+    list methods.  A line must not change its wrest while in the list.
+    '''
+    def __init__(self, lines=()):
+        list.__init__(self)
+        self._wv = []        # Sorted wrest (Angstroms)
+        self._wv_lines = []  # Lines in the order of _wv
+        self._names = {}
+        self._zion = {}
+        self.extend(lines)
+
+    @staticmethod
+    def _keys(line):
+        '''(wrest in Angstroms, name, Zion) of a line
+        '''
+        wv = line.wrest.to(u.AA).value
+        try:
+            name = line.data['name']
+        except (AttributeError, KeyError, TypeError):
+            name = getattr(line, 'trans', None)
+        try:
+            zion = (line.data['Z'], line.data['ion'])
+        except (AttributeError, KeyError, TypeError):
+            zion = None
+        return wv, name, zion
+
+    def _index(self, line):
+        wv, name, zion = self._keys(line)
+        ii = bisect.bisect_right(self._wv, wv)
+        self._wv.insert(ii, wv)
+        self._wv_lines.insert(ii, line)
+        self._names.setdefault(name, []).append(line)
+        self._zion.setdefault(zion, []).append(line)
+
+    def _unindex(self, line):
+        wv, name, zion = self._keys(line)
+        ii = bisect.bisect_left(self._wv, wv)
+        while self._wv_lines[ii] is not line:
+            ii += 1
+        del self._wv[ii]
+        del self._wv_lines[ii]
+        for hsh, key in [(self._names, name), (self._zion, zion)]:
+            hsh[key] = [iline for iline in hsh[key] if iline is not line]
+            if len(hsh[key]) == 0:
+                del hsh[key]
+
+    def __reduce__(self):  # Rebuild the indices on copy/pickle
+        return (self.__class__, (list(self),))
+
+    # List methods
+    def append(self, line):
+        list.append(self, line)
+        self._index(line)
+
+    def extend(self, lines):
+        for line in lines:
+            self.append(line)
+
+    def __iadd__(self, lines):
+        self.extend(lines)
+        return self
+
+    def insert(self, ii, line):
+        list.insert(self, ii, line)
+        self._index(line)
+
+    def remove(self, line):
+        list.remove(self, line)
+        self._unindex(line)
+
+    def pop(self, ii=-1):
+        line = list.pop(self, ii)
+        self._unindex(line)
+        return line
+
+    def __setitem__(self, ii, lines):
+        old = self[ii] if isinstance(ii, slice) else [self[ii]]
+        list.__setitem__(self, ii, lines)
+        for line in old:
+            self._unindex(line)
+        for line in (self[ii] if isinstance(ii, slice) else [self[ii]]):
+            self._index(line)
+
+    def __delitem__(self, ii):
+        old = self[ii] if isinstance(ii, slice) else [self[ii]]
+        list.__delitem__(self, ii)
+        for line in old:
+            self._unindex(line)
+
+    # Lookups
+    def by_wrest(self, wrest, toler=WREST_TOLER):
+        '''Lines with rest wavelength within toler of wrest
+        '''
+        wv = Quantity(wrest, u.AA).to(u.AA).value
+        tol = toler.to(u.AA).value
+        i0 = bisect.bisect_left(self._wv, wv-tol)
+        i1 = bisect.bisect_right(self._wv, wv+tol)
+        return self._wv_lines[i0:i1]
+
+    def by_name(self, name):
+        '''Lines with this transition name, e.g. 'SiII 1526'
+        '''
+        return list(self._names.get(name, []))
+
+    def by_zion(self, Zion):
+        '''Lines of the ion Zion, e.g. (14,2)
+        '''
+        return list(self._zion.get(tuple(Zion), []))
+
+
 ###################### ######################
 ###################### ######################
 ###################### ######################
@@ -102,6 +238,7 @@ class AbslineSystem(object):
         self.linelist = linelist
         self.lines = []  # List of SpectraLine classes
         self.absid_file = None
+        self._absid_rows = None  # AbsID rows not yet loaded as lines (lazy)
 
         # Spectra
         self.spec_files = [] # List of spectra on the b/g source
@@ -125,19 +262,73 @@ class AbslineSystem(object):
         # Refs (list of references)
         self.Refs = []
 
+    @property
+    def lines(self):
+        '''List of absorption lines;  loads any pending AbsID rows
+        '''
+        if self._absid_rows is not None:
+            self._load_absid(np.arange(len(self._absid_rows)))
+        return self._lines
+
+    @lines.setter
+    def lines(self, lines):
+        if isinstance(lines, list) and not isinstance(lines, LineIndex):
+            lines = LineIndex(lines)
+        self._lines = lines
+        self._absid_rows = None
+
+    def _load_absid(self, idx):
+        '''Generate AbsLine objects for pending rows of the AbsID file
+        Parameters:
+        -----------
+        idx: int array
+          Rows of the AbsID table
+        '''
+        rows = self._absid_rows
+        idx = np.asarray(idx, dtype=int)
+        idx = idx[~self._absid_loaded[idx]]
+        for ii in idx:
+            self._lines.append(self._absid_line(rows[ii]))
+        self._absid_loaded[idx] = True
+        if np.all(self._absid_loaded):
+            self._absid_rows = None
+
+    def _load_wrest(self, wrest, toler=WREST_TOLER):
+        '''Load the pending AbsID rows matching a rest wavelength
+        '''
+        if self._absid_rows is None:
+            return
+        wv = Quantity(wrest, u.AA).to(u.AA).value
+        self._load_absid(np.where(np.abs(self._absid_rows['WREST']-wv) <
+                                  toler.to(u.AA).value)[0])
+
     def grab_line(self,inp):
         '''Search for line in the AbslineSystem
         Parameters:
         -----------
-        inp: tuple or AbsLine
+        inp: tuple, AbsLine or str
           tuple -- (z,wrest) or (z,wrest,RA,Dec)
+          str -- Transition name, e.g. 'SiII 1526'
 
         Returns:
         -----------
         First matching AbsLine or None
         '''
-        # Loop on lines
-        for iline in self.lines:
+        if isinstance(inp, basestring):
+            mt = self.lines.by_name(inp)
+            return mt[0] if len(mt) > 0 else None
+        # Lazy AbsID rows
+        if isinstance(inp, AbsLine):
+            wrest = inp.wrest
+        else:
+            wrest = inp[1]
+        self._load_wrest(wrest)
+        # Candidates from the wavelength index
+        if isinstance(self._lines, LineIndex):
+            lines = self._lines.by_wrest(wrest)
+        else:
+            lines = self._lines
+        for iline in lines:
             # Match?
             if iline.ismatch(inp):
                 return iline 
@@ -155,7 +346,7 @@ class AbslineSystem(object):
         '''
         iline = self.grab_line(inp) 
         if iline is not None:
-            self.lines.remove(iline)
+            self._lines.remove(iline)
             return True
         else:
             return False
@@ -173,11 +364,18 @@ class AbslineSystem(object):
 
     # ##
     # Parse AbsID file
-    def parse_absid_file(self, abs_fil):
+    def parse_absid_file(self, abs_fil, lazy=False):
+        '''Read the lines of an AbsID FITS file
 
-        from xastropy import spec as xxspec 
+        Parameters:
+        -----------
+        abs_fil: str
+        lazy: bool, optional
+          Keep the rows and only generate the AbsLine objects when
+          accessed (grab_line, __getitem__ or lines)
+        '''
         if self.linelist is None:
-            self.linelist = LineList('ISM')
+            self.linelist = ism_linelist()
         # FITS binary table
         hdu = fits.open(abs_fil)
         table = hdu[1].data
@@ -188,41 +386,52 @@ class AbslineSystem(object):
         self.absid_file = abs_fil
 
         # Load up lines
-        for row in table:
-            aline = AbsLine(row['WREST']*u.AA, linelist=self.linelist,
-                closest=True)
-            # Velocity limits and flags
-            try:
-                aline.analy['vlim'] = row['VLIM'] * u.km/u.s
-            except KeyError:
-                aline.analy['vlim'] = row['DV'] * u.km/u.s
-            try:
-                aline.analy['do_analysis'] = row['do_analysis']
-            except KeyError:
-                aline.analy['do_analysis'] = row['FLG_ANLY']
-            aline.analy['flg_eye'] = row['FLG_EYE']
-            aline.analy['flg_limit'] = row['FLG_LIMIT']
-            try:
-                aline.analy['datafile'] = row['datafile']
-            except KeyError:
-                aline.analy['datafile'] = row['DATFIL']
-            aline.analy['spec'] = None # Spectrum
-            aline.attrib['z'] = self.zabs
-            # Append
-            self.lines.append(aline)
-            ''' OLD FORMAT
-            self.lines[row['WREST']] = xxspec.analysis.Spectral_Line(row['WREST'])
-            # Velocity limits and flags
-            try:
-                self.lines[row['WREST']].analy['VLIM'] = row['VLIM']
-            except KeyError:
-                self.lines[row['WREST']].analy['VLIM'] = row['DV']
-            self.lines[row['WREST']].analy['FLG_ANLY'] = row['FLG_ANLY']
-            self.lines[row['WREST']].analy['FLG_EYE'] = row['FLG_EYE']
-            self.lines[row['WREST']].analy['FLG_LIMIT'] = row['FLG_LIMIT']
-            self.lines[row['WREST']].analy['DATFIL'] = row['DATFIL']
-            self.lines[row['WREST']].analy['IONNM'] = row['IONNM']
-            '''
+        rows = np.array(table)
+        hdu.close()
+        if lazy:
+            self.lines  # Load any previous rows
+            self._absid_rows = rows
+            self._absid_loaded = np.zeros(len(rows), dtype=bool)
+        else:
+            for row in rows:
+                self.lines.append(self._absid_line(row))
+        ''' OLD FORMAT
+        self.lines[row['WREST']] = xxspec.analysis.Spectral_Line(row['WREST'])
+        # Velocity limits and flags
+        try:
+            self.lines[row['WREST']].analy['VLIM'] = row['VLIM']
+        except KeyError:
+            self.lines[row['WREST']].analy['VLIM'] = row['DV']
+        self.lines[row['WREST']].analy['FLG_ANLY'] = row['FLG_ANLY']
+        self.lines[row['WREST']].analy['FLG_EYE'] = row['FLG_EYE']
+        self.lines[row['WREST']].analy['FLG_LIMIT'] = row['FLG_LIMIT']
+        self.lines[row['WREST']].analy['DATFIL'] = row['DATFIL']
+        self.lines[row['WREST']].analy['IONNM'] = row['IONNM']
+        '''
+
+    def _absid_line(self, row):
+        '''Generate an AbsLine from a row of an AbsID table
+        '''
+        names = [name.upper() for name in row.dtype.names]
+        def grab(*keys):  # First of the column names present
+            for key in keys:
+                if key.upper() in names:
+                    val = row[row.dtype.names[names.index(key.upper())]]
+                    if isinstance(val, bytes):  # FITS strings
+                        val = val.decode('utf-8')
+                    return val
+            raise KeyError(keys[0])
+        aline = AbsLine(row['WREST']*u.AA, linelist=self.linelist,
+            closest=True)
+        # Velocity limits and flags
+        aline.analy['vlim'] = grab('VLIM', 'DV') * u.km/u.s
+        aline.analy['do_analysis'] = grab('do_analysis', 'FLG_ANLY')
+        aline.analy['flg_eye'] = row['FLG_EYE']
+        aline.analy['flg_limit'] = row['FLG_LIMIT']
+        aline.analy['datafile'] = grab('datafile', 'DATFIL')
+        aline.analy['spec'] = None # Spectrum
+        aline.attrib['z'] = self.zabs
+        return aline
 
     # Read a .ion file (transitions)
     def read_ion_file(self,ion_fil,zabs=0.,RA=0.*u.deg, Dec=0.*u.deg):
@@ -236,7 +445,7 @@ class AbslineSystem(object):
         table = ascii.read(ion_fil, format='no_header', names=names) 
 
         if self.linelist is None:
-            self.linelist = LineList('ISM')
+            self.linelist = ism_linelist()
 
         # Generate AbsLine's
         for row in table:
@@ -340,7 +549,8 @@ class AbslineSystem(object):
         str:   Dict of info on that ion and wavelengths of matching lines
         '''
         if isinstance(k,Quantity):  # List of AbsLines
-            return [ilin for ilin in self.lines if np.abs(ilin.wrest-k)<1e-4*u.AA]
+            self._load_wrest(k)
+            return self._lines.by_wrest(k)
         elif isinstance(k,(basestring,tuple)):  # 
             # Column densities
             idict = self._ionclms[k]
@@ -349,8 +559,7 @@ class AbslineSystem(object):
                 Zion = xai.name_ion(k)
             else:
                 Zion = k
-            idict[str('lines')] = [ilin.wrest for ilin in self.lines if ( 
-                (ilin.data['Z']==Zion[0]) & (ilin.data['ion']==Zion[1]))]
+            idict[str('lines')] = [ilin.wrest for ilin in self.lines.by_zion(Zion)]
             return idict
             #lines = [ilin for ilin in self.lines if ilin.trans==k]
         else:
@@ -18,19 +18,99 @@ import copy
 from astropy.io import ascii
 from astropy.units.quantity import Quantity
 from astropy import units as u
-from astropy.table import Table, Column
+from astropy.table import Table, Column, vstack
 
 from linetools.spectralline import AbsLine
-from linetools.analysis import absline as ltaa
 
 from xastropy.atomic import ionization as xai
 from xastropy.xutils import xdebug as xdb
+from xastropy.xutils import files as xxf
+
+try:
+    basestring
+except NameError:  # For Python 3
+    basestring = str
 
 #class Ion_Clm(object):
 #class Ions_Clm(object):
 #class Ionic_Clm_File(object):
 #def fits_flag(idx):
 
+# Columns of the JXP files
+ALL_NAMES = ('Z', 'ion', 'logN', 'sig_logN', 'flag_N', 'flg_inst')
+ALL_DTYPE = ('i4', 'i4', 'f8', 'f8', 'i4', 'i4')
+ION_NAMES = ('wrest', 'logN', 'sig_logN', 'flag_N', 'flg_inst')
+ION_DTYPE = ('f8', 'f8', 'f8', 'i4', 'i4')
+CLM_NAMES = ('wrest', 'flg', 'vmin', 'vmax', 'flg_inst')
+CLM_DTYPE = ('f8', 'i4', 'f8', 'f8', 'i4')
+
+# (Z, ion) are stored as the single integer key Z*ZION_BASE + ion
+ZION_BASE = 100
+
+def zion_key(Z, ion):
+    ''' Integer key(s) for (Z, ion) pairs;  sorts by Z, then ion
+    '''
+    return np.asarray(Z, dtype=int)*ZION_BASE + np.asarray(ion, dtype=int)
+
+def _is_zion_arrays(ions):
+    ''' Is ions a (Z, ion) tuple of integer arrays (not of names or tuples)?
+    '''
+    if not (isinstance(ions, tuple) and (len(ions) == 2)):
+        return False
+    for arr in ions:
+        if isinstance(arr, (tuple, basestring)):
+            return False
+        arr = np.asarray(arr)
+        if (arr.ndim != 1) or (arr.dtype.kind not in 'iu'):
+            return False
+    return True
+
+def to_zion(ion):
+    ''' Convert an ion name or (Z, ion) tuple into a (Z, ion) tuple
+    '''
+    if isinstance(ion, tuple):
+        return ion
+    elif isinstance(ion, basestring):
+        return xai.name_ion(ion)
+    else:
+        raise ValueError('Not prepared for this type')
+
+def log_sum_clm(logN1, sig1, logN2, sig2):
+    ''' Sum column densities (and errors) in log space, element by element
+
+    Returns
+    -------
+    logN, sig_logN : ndarray
+    '''
+    logN = np.logaddexp(logN1*np.log(10.), logN2*np.log(10.)) / np.log(10.)
+    sig_logN = np.sqrt((sig1*10.**(logN1-logN))**2 + (sig2*10.**(logN2-logN))**2)
+    return logN, sig_logN
+
+def ionclms_table(all_ionclms, ions, cols=('logN', 'sig_logN', 'flg_clm')):
+    ''' Table of column densities for a set of ions over many systems
+
+    Parameters
+    ----------
+    all_ionclms : list of IonClms
+    ions : list of str or tuple
+      e.g. ['SiII', (26,2)]
+    cols : tuple, optional
+      Columns to grab
+
+    Returns
+    -------
+    table : Table
+      One row per system;  each column is (nsys, nion) with NaN or 0
+      for ions not measured.  Zion of the ions is in table.meta
+    '''
+    zion = [to_zion(ion) for ion in ions]
+    out = Table()
+    grabs = [ionc.batch(zion, cols=cols) for ionc in all_ionclms]
+    for col in cols:
+        out[col] = np.array([grab[col] for grab in grabs])
+    out.meta['Zion'] = zion
+    return out
+
 
 # ###################
 # Class for Ionic columns 
@@ -60,6 +140,9 @@ class IonClms(object):
         #self.keys= ('clm', 'sig_clm', 'flg_clm', 'flg_inst') 
         #self.key_dtype=('f4','f4','i4','i4')
 
+        self._data = Table()
+        self._keys = np.zeros(0, dtype=int)
+
         # .all file?
         if all_file is not None:
             self.from_all_file(all_file)
@@ -95,8 +178,9 @@ class IonClms(object):
                     tdict['ion'] = Zion[1]
                 # Add
                 table.add_row(tdict)
-        # Finish
-        self._data = table
+        # Finish (nothing to set for an empty dict)
+        if table is not None:
+            self.set_data(table)
 
     # Read a .all file
     def from_all_file(self,all_fil,verbose=False):
@@ -108,12 +192,78 @@ class IonClms(object):
         # Read
         if verbose:
             print('Reading {:s}'.format(all_fil))
-        names=('Z', 'ion', 'logN', 'sig_logN', 'flg_clm', 'flg_inst')
-        table = ascii.read(all_fil, format='no_header', names=names) 
+        table = Table(xxf.cached_parse(all_fil, parse_all_file, tag='all'))
+        table.rename_column('flag_N', 'flg_clm')
 
         # Write
-        #self._data = tmp
-        self._data = table
+        self.set_data(table)
+
+    def set_data(self, table):
+        '''Store the data Table, sorted by (Z, ion), and its key index
+        '''
+        keys = zion_key(table['Z'], table['ion'])
+        srt = np.argsort(keys, kind='mergesort')
+        self._data = table[srt]
+        self._keys = keys[srt]
+
+    def _clm_cols(self):
+        '''Names of the column density, error and flag columns
+        Literature dicts use clm/sig_clm;  .all files use logN/sig_logN
+        '''
+        if 'logN' in self._data.colnames:
+            return 'logN', 'sig_logN', 'flg_clm'
+        else:
+            return 'clm', 'sig_clm', 'flg_clm'
+
+    def index(self, ions):
+        '''Row indices of a set of ions
+
+        Parameters:
+        -----------
+        ions: list of str or tuple, or (Z, ion) int arrays
+
+        Returns:
+        ----------
+        idx: int ndarray
+          -1 for ions not in the data
+        '''
+        if _is_zion_arrays(ions):
+            keys = zion_key(ions[0], ions[1])
+        else:
+            zion = [to_zion(ion) for ion in ions]
+            keys = zion_key([iz[0] for iz in zion], [iz[1] for iz in zion])
+        keys = np.atleast_1d(keys)
+        if len(self._keys) == 0:
+            return np.full(len(keys), -1, dtype=int)
+        idx = np.minimum(np.searchsorted(self._keys, keys), len(self._keys)-1)
+        return np.where(self._keys[idx] == keys, idx, -1)
+
+    def batch(self, ions, cols=('logN', 'sig_logN', 'flg_clm')):
+        '''Grab columns for many ions at once
+
+        Parameters:
+        -----------
+        ions: list of str or tuple, or (Z, ion) int arrays
+        cols: tuple, optional
+          logN and sig_logN also map to clm and sig_clm
+
+        Returns:
+        ----------
+        dict of ndarray;  NaN (float) or 0 (int) for missing ions
+        '''
+        idx = self.index(ions)
+        gd = idx >= 0
+        clm_cols = dict(zip(('logN', 'sig_logN', 'flg_clm'), self._clm_cols()))
+        out = {}
+        for col in cols:
+            data = np.array(self._data[clm_cols.get(col, col)])
+            if data.dtype.kind == 'f':
+                arr = np.full(len(idx), np.nan)
+            else:
+                arr = np.zeros(len(idx), dtype=data.dtype)
+            arr[gd] = data[idx[gd]]
+            out[col] = arr
+        return out
 
 
     ##
@@ -128,50 +278,34 @@ class IonClms(object):
         --------
         A new instance of IonClms with the column densities summed
         '''
-        # Instantiate and use data form original as starting point
+        # Rows of other that are new, and those to merge
+        oidx = self.index((other.Z, other.ion))
+        table = vstack([self._data, other._data[oidx < 0]])
         newIC = IonClms()
-        newIC._data = copy.deepcopy(self._data)
-        # Loop through other
-        for row in other._data:
-            # New?
-            Zion = (row['Z'], row['ion'])
-            try:
-                sdict = newIC[Zion]
-            except KeyError:
-                # Add in the new row
-                newIC._data.add_row(row)
-            else:
-                idx = np.where((newIC.Z==Zion[0]) & (newIC.ion==Zion[1]))[0][0]
-                # Clm
-                logN, siglogN = ltaa.sum_logN(sdict,row)
-                newIC._data['logN'][idx] = logN
-                # Error
-                newIC._data['sig_logN'][idx] = siglogN
-                '''
-                np.sqrt(
-                    np.sum([(sdict['sig_clm']*(10.**sdict['clm']))**2,
-                    (row['sig_clm']*(10.**row['clm']))**2]))/(10.**newIC._data['clm'][idx])
-                '''
-                # Flag
-                flags = [sdict['flg_clm'], row['flg_clm']]
-                if 2 in flags:   # At least one saturated
-                    flag = 2
-                elif 1 in flags: # None saturated; at least one detection
-                    flag = 1
-                else:            # Both upper limits
-                    flag = 3  
-                newIC._data['flg_clm'][idx] = flag
-                # Instrument (assuming binary flag)
-                if 'flg_inst' in sdict.keys():
-                    binflg = [0]*10
-                    for jj in range(10):
-                        if (row['flg_inst'] % 2**(jj+1)) >= 2**jj:
-                            binflg[jj] = 1
-                        if (sdict['flg_inst'] % 2**(jj+1)) >= 2**jj:
-                            binflg[jj] = 1
-                    newIC._data['flg_inst'][idx] = int(np.sum(
-                        [2**kk for kk,ibinf in enumerate(binflg) if ibinf==1]))
-            # Return
+        newIC.set_data(table)
+        both = oidx >= 0
+        if np.any(both):
+            sidx = newIC.index((other.Z[both], other.ion[both]))
+            ocol = other._data[both]
+            clm, sig, flg = newIC._clm_cols()
+            oclm, osig, oflg = other._clm_cols()
+            # Clm and error
+            logN, siglogN = log_sum_clm(
+                np.array(newIC._data[clm][sidx]), np.array(newIC._data[sig][sidx]),
+                np.array(ocol[oclm]), np.array(ocol[osig]))
+            newIC._data[clm][sidx] = logN
+            newIC._data[sig][sidx] = siglogN
+            # Flag
+            flags = np.array([newIC._data[flg][sidx], ocol[oflg]])
+            newIC._data[flg][sidx] = np.where(np.any(flags == 2, axis=0), 2, # At least one saturated
+                np.where(np.any(flags == 1, axis=0), 1,  # None saturated; at least one detection
+                3)) # Both upper limits
+            # Instrument (assuming binary flag)
+            if ('flg_inst' in newIC._data.colnames) & ('flg_inst' in ocol.colnames):
+                newIC._data['flg_inst'][sidx] = (
+                    (np.array(newIC._data['flg_inst'][sidx]) |
+                     np.array(ocol['flg_inst'])) & (2**10-1))
+        # Return
         return newIC
 
     #####
@@ -182,6 +316,8 @@ class IonClms(object):
         '''
         if not isinstance(k, basestring): 
             raise ValueError('Entry must be a basestring')
+        if k.startswith('_'):
+            raise AttributeError(k)
 
         # Deal with QTable
         colm = self._data[k]
@@ -203,18 +339,11 @@ class IonClms(object):
         ----------
         Dict (from row in the data table)
         '''
-        if isinstance(ion,tuple):
-            mt = np.where((self._data['Z'] == ion[0]) & (self._data['ion'] == ion[1]))[0]
-        elif isinstance(ion,basestring):
-            # Convert to tuple
-            return self.__getitem__(xai.name_ion(ion))
-        else:
-            raise ValueError('Not prepared for this type')
-
-        if len(mt) == 0:
+        idx = self.index([to_zion(ion)])[0]
+        if idx < 0:
             raise KeyError
         else:
-            return dict(zip(self._data.dtype.names,self._data[mt][0]))
+            return dict(zip(self._data.dtype.names,self._data[idx]))
 
     # Printing
     def __repr__(self):
@@ -264,70 +393,137 @@ class Ionic_Clm_File(object):
         See get_elem for properties of LINEDIC
         """
 
-        # Read file
-        f=open(self.clm_fil, 'r')
-        arr=f.readlines()
-        f.close()
-        nline = len(arr)
-        #
-        source=arr[0][:-1]
-        # Data files
-        self.flg_data = int(arr[1][:-1])
-        self.fits_files={}
-        ii=2
-        for jj in range(0,6):
-            if (self.flg_data % (2**(jj+1))) > (2**jj - 1):
-                self.fits_files[2**jj] = arr[ii].strip()
-                ii += 1
-
-        # Redshift
-        self.zsys=float(arr[ii][:-1]) ; ii+=1
-        self.ion_fil=arr[ii].strip() ; ii+=1
-        # NHI
-        tmp = arr[ii].split(',') ; ii+=1
-        if len(tmp) != 2:
-            raise ValueError('ionic_clm: Bad formatting {:s} in {:s}'
-                                           .format(arr[ii-1],self.clm_fil))
-        self.NHI=float(tmp[0])
-        self.sigNHI=float(tmp[1])
-        # Abundances by hand
-        numhand=int(arr[ii][:-1]) ; ii+=1
-        self.fixabund={}
-        if numhand>0:
-            for jj in range(numhand):
-                # Atomic number
-                atom=int(arr[ii][:-1]) ; ii+=1
-                # Values
-                tmp = arr[ii].strip().split(',') ; ii+=1
-                self.fixabund[atom]= float(tmp[0]), float(tmp[1]), int(tmp[2])
-        # Loop on lines
+        clm_dict = xxf.cached_parse(self.clm_fil, parse_clm_file, tag='clm')
+        self.flg_data = clm_dict['flg_data']
+        self.fits_files = copy.deepcopy(clm_dict['fits_files'])
+        self.zsys = clm_dict['zsys']
+        self.ion_fil = clm_dict['ion_fil']
+        self.NHI = clm_dict['NHI']
+        self.sigNHI = clm_dict['sigNHI']
+        self.fixabund = copy.deepcopy(clm_dict['fixabund'])
+        # Lines
         self.clm_lines = {}
-        while ii < (nline-1):
-            # No empty lines allowed
-            if len(arr[ii].strip()) == 0:
-               break
-            # Read flag
-            ionflg = int(arr[ii].strip()); ii+=1
-            # Read the rest
-            tmp = arr[ii].split(',') ; ii+=1
-            if len(tmp) != 4: raise ValueError('ionic_clm: Bad formatting {:s} in {:s}'
-                                            .format(arr[ii-1],self.clm_fil))
-            vmin = float(tmp[1].strip())
-            vmax = float(tmp[2].strip())
-            key = float(tmp[0].strip()) # Using a float not string!
-            # Generate
+        for row in clm_dict['lines']:
+            key = float(row['wrest']) # Using a float not string!
             self.clm_lines[key] = AbsLine(key*u.AA,closest=True,linelist=self.linelist)
-            #self.clm_lines[key] = xa.spec.analysis.Spectral_Line(key)
-            self.clm_lines[key].analy['FLAGS'] = ionflg, int(tmp[3].strip())
+            self.clm_lines[key].analy['FLAGS'] = int(row['flg']), int(row['flg_inst'])
             # By-hand
-            if ionflg >= 8:
-                self.clm_lines[key].attrib['N'] = 10.**vmin
-                self.clm_lines[key].attrib['SIGN'] = (10.**(vmin+vmax) - 10.**(vmin-vmax))/2	      
+            if row['flg'] >= 8:
+                self.clm_lines[key].attrib['N'] = 10.**row['vmin']
+                self.clm_lines[key].attrib['SIGN'] = (10.**(row['vmin']+row['vmax']) -
+                                                      10.**(row['vmin']-row['vmax']))/2
             else:
-                self.clm_lines[key].analy['VLIM']= [vmin,vmax]
+                self.clm_lines[key].analy['VLIM']= [row['vmin'],row['vmax']]
+
+# Parse a .all file
+def parse_all_file(all_file):
+    """ Parse a JXP-style .all file in one pass
+
+    Parameters
+    ----------
+    all_file : str
+      Full path to the .all file
+
+    Returns
+    -------
+    data : structured ndarray
+      Columns of ALL_NAMES
+    """
+    dtype = list(zip([str(name) for name in ALL_NAMES], ALL_DTYPE))
+    return np.loadtxt(all_file, dtype=dtype, ndmin=1)
+
+# Parse a .ion file
+def parse_ion_file(ion_fil):
+    """ Parse a JXP-style .ion file in one pass
+
+    Parameters
+    ----------
+    ion_fil : str
+      Full path to the .ion file
+
+    Returns
+    -------
+    data : structured ndarray
+      Columns of ION_NAMES
+    """
+    dtype = list(zip([str(name) for name in ION_NAMES], ION_DTYPE))
+    return np.loadtxt(ion_fil, dtype=dtype, ndmin=1)
+
+# Parse a .clm file
+def parse_clm_file(clm_file):
+    """ Parse a JXP-style .clm file into plain data (no AbsLine objects)
+
+    Parameters
+    ----------
+    clm_file : str
+      Full path to the .clm file
+
+    Returns
+    -------
+    clm_dict : dict
+      flg_data, fits_files, zsys, ion_fil, NHI, sigNHI, fixabund and
+      lines, a structured ndarray with columns of CLM_NAMES
+    """
+    with open(clm_file, 'r') as f:
+        arr = [line.strip() for line in f.readlines()]
+
+    def bad_format(ii):
+        return ValueError('ionic_clm: Bad formatting {:s} in {:s}'.format(
+            arr[ii], clm_file))
+
+    clm_dict = {}
+    # Data files
+    clm_dict['flg_data'] = int(arr[1])
+    clm_dict['fits_files'] = {}
+    ii = 2
+    for jj in range(0,6):
+        if (clm_dict['flg_data'] % (2**(jj+1))) > (2**jj - 1):
+            clm_dict['fits_files'][2**jj] = arr[ii]
+            ii += 1
+    # Redshift
+    clm_dict['zsys'] = float(arr[ii]) ; ii+=1
+    clm_dict['ion_fil'] = arr[ii] ; ii+=1
+    # NHI
+    tmp = arr[ii].split(',')
+    if len(tmp) != 2:
+        raise bad_format(ii)
+    clm_dict['NHI'] = float(tmp[0])
+    clm_dict['sigNHI'] = float(tmp[1])
+    ii += 1
+    # Abundances by hand
+    numhand = int(arr[ii]) ; ii+=1
+    clm_dict['fixabund'] = {}
+    for jj in range(numhand):
+        tmp = arr[ii+1].split(',')
+        clm_dict['fixabund'][int(arr[ii])] = float(tmp[0]), float(tmp[1]), int(tmp[2])
+        ii += 2
+
+    # Lines come in (flag, 'wrest, vmin, vmax, flag') pairs until a blank line
+    body = arr[ii:]
+    if '' in body:
+        body = body[:body.index('')]
+    if len(body) % 2 == 1:
+        raise ValueError('ionic_clm: Line {:s} has no partner in {:s}'.format(
+            body[-1], clm_file))
+    nlin = len(body) // 2
+    dtype = list(zip([str(name) for name in CLM_NAMES], CLM_DTYPE))
+    lines = np.zeros(nlin, dtype=dtype)
+    if nlin > 0:
+        vals = [line.split(',') for line in body[1:2*nlin:2]]
+        for jj, tmp in enumerate(vals):
+            if len(tmp) != 4:
+                raise bad_format(ii+2*jj+1)
+        vals = np.array(vals, dtype=float)
+        lines['wrest'] = vals[:,0]
+        lines['vmin'] = vals[:,1]
+        lines['vmax'] = vals[:,2]
+        lines['flg_inst'] = vals[:,3]
+        lines['flg'] = np.array(body[0:2*nlin:2], dtype=int)
+    clm_dict['lines'] = lines
+    return clm_dict
 
 # Read a .all file
-def read_all_file(all_file,components=None,verbose=False):
+def read_all_file(all_file,components=None,verbose=False,use_cache=True):
     """Read in JXP-style .all file in an appropriate manner
 
     NOTE: If program breaks in this function, check the all file
@@ -341,21 +537,23 @@ def read_all_file(all_file,components=None,verbose=False):
       Full path to the .all file
     components : list, optional
       List of AbsComponent objects
+    use_cache : bool, optional
+      Use the binary cache of the parsed file
     """
-    assert False # USE LINETOOLS
     # Read
     if verbose:
         print('Reading {:s}'.format(all_file))
-    names=('Z', 'ion', 'logN', 'sig_logN', 'flag_N', 'flg_inst') # was using flg_clm
-    table = ascii.read(all_file, format='no_header', names=names)
+    table = Table(xxf.cached_parse(all_file, parse_all_file, tag='all',
+                                   use_cache=use_cache))
 
     # Fill components
     if components is not None:
-        allZ = np.array([comp.Zion[0] for comp in components])
-        allion = np.array([comp.Zion[1] for comp in components])
+        comp_idx = {}
+        for jj,comp in enumerate(components):
+            comp_idx.setdefault(tuple(comp.Zion), []).append(jj)
         # Loop
         for row in table:
-            mt = np.where((allZ==row['Z'])&(allion==row['ion']))[0]
+            mt = comp_idx.get((row['Z'],row['ion']), [])
             if len(mt) == 0:
                 pass
             elif len(mt) == 1:
@@ -368,7 +566,7 @@ def read_all_file(all_file,components=None,verbose=False):
     # Write
     return table
 
-def read_clmfile(clm_file,linelist=None):
+def read_clmfile(clm_file,linelist=None,use_cache=True):
     """ Read in a .CLM file in an appropriate manner
 
     NOTE: If program breaks in this function, check the clm to see if it is properly formatted.
@@ -397,72 +595,32 @@ def read_clmfile(clm_file,linelist=None):
       Full path to the .clm file
     linelist : LineList
       can speed up performance
+    use_cache : bool, optional
+      Use the binary cache of the parsed file
     """
-    clm_dict = {}
-    # Read file
-    f=open(clm_file, 'r')
-    arr=f.readlines()
-    f.close()
-    nline = len(arr)
-    # Data files
-    clm_dict['flg_data'] = int(arr[1][:-1])
-    clm_dict['fits_files']={}
-    ii=2
-    for jj in range(0,6):
-        if (clm_dict['flg_data'] % (2**(jj+1))) > (2**jj - 1):
-            clm_dict['fits_files'][2**jj] = arr[ii].strip()
-            ii += 1
-
-    # Redshift
-    clm_dict['zsys']=float(arr[ii][:-1]) ; ii+=1
-    clm_dict['ion_fil']=arr[ii].strip() ; ii+=1
-    # NHI
-    tmp = arr[ii].split(',') ; ii+=1
-    if len(tmp) != 2:
-        raise ValueError('ionic_clm: Bad formatting {:s} in {:s}'
-                                       .format(arr[ii-1],clm_file))
-    clm_dict['NHI']=float(tmp[0])
-    clm_dict['sigNHI']=float(tmp[1])
-    # Abundances by hand
-    numhand=int(arr[ii][:-1]) ; ii+=1
-    clm_dict['fixabund']={}
-    if numhand>0:
-        for jj in range(numhand):
-            # Atomic number
-            atom=int(arr[ii][:-1]) ; ii+=1
-            # Values
-            tmp = arr[ii].strip().split(',') ; ii+=1
-            clm_dict['fixabund'][atom]= float(tmp[0]), float(tmp[1]), int(tmp[2])
-    # Loop on lines
+    clm_dict = copy.deepcopy(xxf.cached_parse(clm_file, parse_clm_file,
+                                              tag='clm', use_cache=use_cache))
+    # Generate the lines
+    line_data = clm_dict.pop('lines')
     clm_dict['lines'] = {}
-    while ii < (nline-1):
-        # No empty lines allowed
-        if len(arr[ii].strip()) == 0:
-           break
-        # Read flag
-        ionflg = int(arr[ii].strip()); ii+=1
-        # Read the rest
-        tmp = arr[ii].split(',') ; ii+=1
-        if len(tmp) != 4: raise ValueError('ionic_clm: Bad formatting {:s} in {:s}'
-                                        .format(arr[ii-1],clm_file))
-        vmin = float(tmp[1].strip())
-        vmax = float(tmp[2].strip())
-        key = float(tmp[0].strip()) # Using a float not string!
-        # Generate
-        clm_dict['lines'][key] = AbsLine(key*u.AA,closest=True,linelist=linelist)
-        clm_dict['lines'][key].attrib['z'] = clm_dict['zsys']
-        clm_dict['lines'][key].analy['FLAGS'] = ionflg, int(tmp[3].strip())
-        pdb.set_trace()
+    for row in line_data:
+        key = float(row['wrest']) # Using a float not string!
+        aline = AbsLine(key*u.AA,closest=True,linelist=linelist)
+        aline.attrib['z'] = clm_dict['zsys']
+        aline.analy['FLAGS'] = int(row['flg']), int(row['flg_inst'])
         # By-hand
-        if ionflg >= 8:
-            clm_dict['lines'][key].attrib['N'] = 10.**vmin / u.cm**2
-            clm_dict['lines'][key].attrib['sig_N'] = (10.**(vmin+vmax) - 10.**(vmin-vmax))/2/u.cm**2
+        vmin, vmax = row['vmin'], row['vmax']
+        if row['flg'] >= 8:
+            aline.attrib['N'] = 10.**vmin / u.cm**2
+            aline.attrib['sig_N'] = (10.**(vmin+vmax) - 10.**(vmin-vmax))/2/u.cm**2
         else:
-            clm_dict['lines'][key].analy['vlim']= [vmin,vmax]*u.km/u.s
+            aline.analy['vlim']= [vmin,vmax]*u.km/u.s
+        clm_dict['lines'][key] = aline
     # Return
     return clm_dict
 
-def read_ion_file(ion_fil,lines=None,components=None,linelist=None,toler=0.05*u.AA):
+def read_ion_file(ion_fil,lines=None,components=None,linelist=None,toler=0.05*u.AA,
+                  zabs=0.,coord=None,use_cache=True):
     """ Read in JXP-style .ion file in an appropriate manner
 
     NOTE: If program breaks in this function, check the .ion file
@@ -482,11 +640,21 @@ def read_ion_file(ion_fil,lines=None,components=None,linelist=None,toler=0.05*u.
       May speed up performance
     toler : Quantity, optional
       Tolerance for matching wrest
+    zabs : float, optional
+      Redshift given to new AbsLine objects
+    coord : SkyCoord, optional
+      Sightline coordinate given to new AbsLine objects
+    use_cache : bool, optional
+      Use the binary cache of the parsed file
+
+    Returns
+    -------
+    lines : list (if components is None)
+    table : Table (otherwise)
     """
-    assert False # USE LINETOOLS
     # Read
-    names=('wrest', 'logN', 'sig_logN', 'flag_N', 'flg_inst')
-    table = ascii.read(ion_fil, format='no_header', names=names)
+    table = Table(xxf.cached_parse(ion_fil, parse_ion_file, tag='ion',
+                                   use_cache=use_cache))
 
     if components is None:
         if lines is None:
@@ -496,10 +664,11 @@ def read_ion_file(ion_fil,lines=None,components=None,linelist=None,toler=0.05*u.
             # Generate the line
             aline = AbsLine(row['wrest']*u.AA, linelist=linelist, closest=True)
             # Set z, RA, DEC, etc.
-            aline.attrib['z'] = self.zabs
-            aline.attrib['RA'] = self.coord.ra
-            aline.attrib['Dec'] = self.coord.dec
-            aline.attrib['coord'] = self.coord
+            aline.attrib['z'] = zabs
+            if coord is not None:
+                aline.attrib['RA'] = coord.ra
+                aline.attrib['Dec'] = coord.dec
+                aline.attrib['coord'] = coord
             aline.attrib['logN'] = row['logN']
             aline.attrib['sig_logN'] = row['sig_logN']
             aline.attrib['flag_N'] = row['flag_N']
@@ -513,31 +682,33 @@ def read_ion_file(ion_fil,lines=None,components=None,linelist=None,toler=0.05*u.
                     lines.pop(imt)
             # Append
             lines.append(aline)
-            return lines
+        return lines
     else: # Fill entries in components
-        # Generate look-up table for quick searching
+        # Sorted wavelength index of all the component lines
         all_wv = []
         all_idx = []
         for jj,comp in enumerate(components):
             for kk,iline in enumerate(comp._abslines):
-                all_wv.append(iline.wrest)
+                all_wv.append(iline.wrest.to('AA').value)
                 all_idx.append((jj,kk))
-        all_wv = u.Quantity(all_wv)
-        # Loop now
-        for row in table:
-            mt = np.where(np.abs(all_wv-row['wrest']*u.AA)<toler)[0]
-            if len(mt) == 0:
-                pass
-            elif len(mt) == 1:
-                # Fill
-                jj = all_idx[mt[0]][0]
-                kk = all_idx[mt[0]][1]
-                components[jj]._abslines[kk].attrib['flag_N'] = row['flag_N']
-                components[jj]._abslines[kk].attrib['logN'] = row['logN']
-                components[jj]._abslines[kk].attrib['sig_logN'] = row['sig_logN']
-                components[jj]._abslines[kk].analy['flg_inst'] = row['flg_inst']
-            else:
-                raise ValueError("Matched multiple lines in read_ion_file")
+        all_wv = np.array(all_wv)
+        srt = np.argsort(all_wv)
+        srt_wv = all_wv[srt]
+        # Match all rows at once
+        tol = toler.to('AA').value
+        imin = np.searchsorted(srt_wv, table['wrest']-tol, side='right')
+        imax = np.searchsorted(srt_wv, table['wrest']+tol, side='left')
+        nmt = imax - imin
+        if np.any(nmt > 1):
+            raise ValueError("Matched multiple lines in read_ion_file")
+        for ii in np.where(nmt == 1)[0]:
+            row = table[ii]
+            # Fill
+            jj, kk = all_idx[srt[imin[ii]]]
+            components[jj]._abslines[kk].attrib['flag_N'] = row['flag_N']
+            components[jj]._abslines[kk].attrib['logN'] = row['logN']
+            components[jj]._abslines[kk].attrib['sig_logN'] = row['sig_logN']
+            components[jj]._abslines[kk].analy['flg_inst'] = row['flg_inst']
         # Return
         return table
 
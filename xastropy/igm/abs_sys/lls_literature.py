@@ -15,8 +15,12 @@
 from __future__ import print_function, absolute_import, division, unicode_literals
 
 import os, copy, sys, imp, glob
+import multiprocessing
 import numpy as np
-import urllib2
+try:
+    from urllib2 import urlopen
+except ImportError:  # Python 3
+    from urllib.request import urlopen
 
 from astropy import units as u
 from astropy.io import ascii 
@@ -30,12 +34,23 @@ from xastropy.igm.abs_sys.ionclms import IonClms
 from xastropy.igm.abs_sys import ionclms as xiai
 from xastropy.obs import radec as xor 
 from xastropy.xutils import xdebug as xdb
+from xastropy.xutils import files as xxf
 
 xa_path = imp.find_module('xastropy')[1]
 
 #class LLSSystem(AbslineSystem):
 #class LLS_Survey(Absline_Survey):
 
+def grab_tab_file(tab_fil, url):
+    '''Return a local copy of an online table, grabbing it if needed
+    '''
+    if not os.path.isfile(tab_fil):
+        print('LLSSurvey: Grabbing table file from {:s}'.format(url))
+        f = urlopen(url)
+        with open(tab_fil, "wb") as code:
+            code.write(f.read())
+    return tab_fil
+
 def zonak2004():
     '''Zoank, S. et al. 2004, ApJ, 2004, 606, 196
     PG1634+706
@@ -81,16 +96,8 @@ def jenkins2005():
     M/H from O/H
     '''
     # Grab ASCII file from ApJ
-    tab_fil = xa_path+"/data/LLS/jenkins2005.tb1.ascii"
-    chk_fil = glob.glob(tab_fil)
-    if len(chk_fil) > 0:
-        tab_fil = chk_fil[0]
-    else:
-        url = 'http://iopscience.iop.org/0004-637X/623/2/767/fulltext/61520.tb1.txt'
-        print('LLSSurvey: Grabbing table file from {:s}'.format(url))
-        f = urllib2.urlopen(url)
-        with open(tab_fil, "wb") as code:
-            code.write(f.read())
+    tab_fil = grab_tab_file(xa_path+"/data/LLS/jenkins2005.tb1.ascii",
+        'http://iopscience.iop.org/0004-637X/623/2/767/fulltext/61520.tb1.txt')
     # Setup
     radec = xor.stod1('J215501.5152-092224.688') # SIMBAD
     lls = LLSSystem(name='PHL1811_z0.081', RA=radec[0], Dec=radec[1], zem=0.192,
@@ -196,16 +203,8 @@ def tripp2005():
     tab_fils = [xa_path+"/data/LLS/tripp2005.tb3.ascii", xa_path+"/data/LLS/tripp2005.tb2.ascii"]
     urls = ['http://iopscience.iop.org/0004-637X/619/2/714/fulltext/60797.tb3.txt',
         'http://iopscience.iop.org/0004-637X/619/2/714/fulltext/60797.tb2.txt']
-    for jj,tab_fil in enumerate(tab_fils):
-        chk_fil = glob.glob(tab_fil)
-        if len(chk_fil) > 0:
-            tab_fil = chk_fil[0]
-        else:
-            url = urls[jj]
-            print('LLSSurvey: Grabbing table file from {:s}'.format(url))
-            f = urllib2.urlopen(url)
-            with open(tab_fil, "wb") as code:
-                code.write(f.read())
+    for tab_fil, url in zip(tab_fils, urls):
+        grab_tab_file(tab_fil, url)
     # Setup
     radec = xor.stod1('J121920.9320+063838.476') # SIMBAD
     lls = LLSSystem(name='PG1216+069_z0.006', RA=radec[0], Dec=radec[1], zem=0.3313,
@@ -240,7 +239,9 @@ def tripp2005():
             ion_dict[ionc] = dict(clm=clm, sig_clm=sig, flg_clm=1, Z=Zion[0],ion=Zion[1])
         else: # Add it in
             tmp_dict = dict(clm=clm, sig_clm=sig, flg_clm=1, Z=Zion[0],ion=Zion[1])
-            logN, siglogN = xiai.sum_logN(ion_dict[ionc], tmp_dict)
+            logN, siglogN = xiai.log_sum_clm(
+                ion_dict[ionc]['clm'], ion_dict[ionc]['sig_clm'],
+                tmp_dict['clm'], tmp_dict['sig_clm'])
             ion_dict[ionc]['clm'] = logN
             ion_dict[ionc]['sig_clm'] = siglogN
     ions = ion_dict.keys()
@@ -777,16 +778,8 @@ def tumlinson11():
     NHI from LL+Lyman series (uncertain)
     '''
     # Grab ASCII file from ApJ
-    tab_fil = xa_path+"/data/LLS/tumlinson11.tb1.ascii"
-    url = 'http://iopscience.iop.org/0004-637X/733/2/111/suppdata/apj388927t1_ascii.txt'
-    chk_fil = glob.glob(tab_fil)
-    if len(chk_fil) > 0:
-        tab_fil = chk_fil[0]
-    else:
-        print('LLSSurvey: Grabbing table file from {:s}'.format(url))
-        f = urllib2.urlopen(url)
-        with open(tab_fil, "wb") as code:
-            code.write(f.read())
+    tab_fil = grab_tab_file(xa_path+"/data/LLS/tumlinson11.tb1.ascii",
+        'http://iopscience.iop.org/0004-637X/733/2/111/suppdata/apj388927t1_ascii.txt')
     # Setup
     radec = xor.stod1('J100902.06+071343.8') # From paper
     lls = LLSSystem(name='J1009+0713_z0.356', RA=radec[0], Dec=radec[1], zem=0.456,
@@ -840,7 +833,9 @@ def tumlinson11():
                     ion_dict[ion]['flg_clm']=1
                     obj = dict(clm=float(iis[0:4]),sig_clm=float(iis[-4:]))
                     # Add
-                    N,sig = xiai.sum_logN(ion_dict[ion],obj)
+                    N,sig = xiai.log_sum_clm(
+                        ion_dict[ion]['clm'], ion_dict[ion]['sig_clm'],
+                        obj['clm'], obj['sig_clm'])
                     ion_dict[ion]['clm']=N
                     ion_dict[ion]['sig_clm']=sig
     # Finish
@@ -887,16 +882,8 @@ def battisti12():
     tab_fils = [xa_path+"/data/LLS/battisti12.tb1.ascii", xa_path+"/data/LLS/battisti12.tb3.ascii"]
     urls = ['http://iopscience.iop.org/0004-637X/744/2/93/suppdata/apj413924t1_ascii.txt',
         'http://iopscience.iop.org/0004-637X/744/2/93/suppdata/apj413924t3_ascii.txt']
-    for jj,tab_fil in enumerate(tab_fils):
-        chk_fil = glob.glob(tab_fil)
-        if len(chk_fil) > 0:
-            tab_fil = chk_fil[0]
-        else:
-            url = urls[jj]
-            print('LLSSurvey: Grabbing table file from {:s}'.format(url))
-            f = urllib2.urlopen(url)
-            with open(tab_fil, "wb") as code:
-                code.write(f.read())
+    for tab_fil, url in zip(tab_fils, urls):
+        grab_tab_file(tab_fil, url)
     # QSO info 
     with open(tab_fils[0],'r') as f:
         flines1 = f.readlines()
@@ -964,6 +951,72 @@ def battisti12():
     return fin_slls
 
 
+#####
+# Loaders of the compilation, ordered by publication date
+LLS_LOADERS = ['zonak2004', 'jenkins2005', 'tripp2005', 'peroux06a',
+               'peroux06b', 'meiring06', 'meiring07', 'meiring08', 'nestor08',
+               'meiring09', 'dessauges09', 'tumlinson11', 'kacprzak12',
+               'battisti12']
+
+def _run_loader(loader):
+    '''Run one loader by name;  always returns a list of LLSSystem
+    '''
+    out = globals()[loader]()
+    if not isinstance(out, list):
+        out = [out]
+    return out
+
+def load_all(loaders=None, nproc=None, use_cache=True):
+    '''Build the full literature compilation of LLS
+
+    Each loader is run once (in parallel) and the systems, with their
+    IonClms, are saved to a single binary cache.  The cache is rebuilt
+    when this module or any file in data/LLS changes.
+
+    Parameters
+    ----------
+    loaders : list of str, optional
+      Names of the loaders to run [LLS_LOADERS]
+    nproc : int, optional
+      Number of processes [one per loader, up to the number of CPUs]
+    use_cache : bool, optional
+
+    Returns
+    -------
+    all_lls : list of LLSSystem
+    '''
+    if loaders is None:
+        loaders = LLS_LOADERS
+    # Cache
+    sources = [os.path.abspath(__file__).replace('.pyc', '.py')]
+    sources += sorted(glob.glob(xa_path+'/data/LLS/*'))
+    stamp = (tuple(loaders),) + tuple(xxf.file_stamp(fil) for fil in sources)
+    key = xxf.cache_key('lls_literature', *loaders)
+    if use_cache:
+        all_lls = xxf.load_cache(key, stamp)
+        if all_lls is not None:
+            return copy.deepcopy(all_lls)
+    # Build
+    if nproc is None:
+        nproc = min(len(loaders), multiprocessing.cpu_count())
+    if nproc > 1:
+        pool = multiprocessing.Pool(nproc)
+        try:
+            out = pool.map(_run_loader, loaders)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        out = [_run_loader(loader) for loader in loaders]
+    all_lls = [lls for sub_lls in out for lls in sub_lls]
+    # Save (after any table downloads, which change the stamp)
+    if use_cache:
+        sources = sources[:1] + sorted(glob.glob(xa_path+'/data/LLS/*'))
+        stamp = (tuple(loaders),) + tuple(xxf.file_stamp(fil) for fil in sources)
+        xxf.save_cache(key, stamp, all_lls)
+        return copy.deepcopy(all_lls)
+    return all_lls
+
 #####
 def log_sum(logN):
     '''Sum up logN values return the log
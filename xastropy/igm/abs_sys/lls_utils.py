@@ -0,0 +1,52 @@
+"""
+#;+
+#; NAME:
+#; lls_utils
+#;    Version 1.0
+#;
+#; PURPOSE:
+#;    Module for Lyman Limit Systems
+#;   18-Oct-2016
+#;-
+#;------------------------------------------------------------------------------
+"""
+from __future__ import print_function, absolute_import, division, unicode_literals
+
+import string
+
+from xastropy.igm.abs_sys.abssys_utils import AbslineSystem, Abs_Sub_System
+
+#class LLSSystem(AbslineSystem):
+
+# Class for Lyman Limit Systems
+class LLSSystem(AbslineSystem):
+    """A Lyman Limit System
+
+    Attributes
+    ----------
+    nsub : int
+      Number of sub-systems
+    subsys : dict
+      Sub-systems (Abs_Sub_System), keyed 'A', 'B', ...
+    """
+    def __init__(self, NHI=17.3, **kwargs):
+        AbslineSystem.__init__(self, 'LLS', NHI=NHI, **kwargs)
+        self.nsub = 0
+        self.subsys = {}
+
+    def mk_subsys(self, nsub):
+        """ Generate empty sub-systems
+
+        Parameters
+        ----------
+        nsub : int
+          Number of sub-systems
+        """
+        self.nsub = nsub
+        for lbl in string.ascii_uppercase[:nsub]:
+            self.subsys[lbl] = Abs_Sub_System('LLS', zabs=self.zabs,
+                                              name=self.name+'_'+lbl)
+
+    def print_abs_type(self):
+        """"Return a string representing the type of vehicle this is."""
+        return 'LLS'
@@ -5,6 +5,12 @@ from __future__ import print_function, absolute_import, division, unicode_litera
 import numpy as np
 import glob, os, sys, io, json
 import datetime
+import hashlib
+import threading
+try:
+    import Queue as queue
+except ImportError:  # Python 3
+    import queue
 
 from astropy import units as u
 from astropy.table import Table, Column, QTable
@@ -16,6 +22,13 @@ from pyigm.surveys.dlasurvey import DLASurvey
 
 from xastropy.xutils import fits as xxf
 from xastropy.xutils import xdebug as xdb
+from xastropy.xutils.files import file_stamp
+from xastropy.xutils.jsonl import JsonlWriter
+
+try:
+    unicode
+except NameError:  # Python 3
+    unicode = str
 
 def neeleman13():
     """ Build a summary file for the Neeleman+13 sample
@@ -40,6 +53,7 @@ def neeleman13():
 
     # JSON SYS files (preferred)
     mk_json_sys(dlasurvey, outpath, prefix)
+    mk_jsonl_sys(dlasurvey, outpath+prefix+'_DLA_sys.jsonl', prefix)
 
     # Summary file and spectra
     mk_summary(dlasurvey, prefix, outpath+prefix+'_DLA.fits',
@@ -80,16 +94,20 @@ def survey_name(prefix, idla):
 
 
 ####
-def mk_1dspec(idla, outpath=None, name=None, clobber=False):
-    """ Collate and rename the spectra
+def spec_tasks(idla, outpath=None, name=None):
+    """ Source and output files of the spectra to collate for a DLA
+
     Parameters
     ----------
     idla : DLASystem
-    name : str, optional
-    clobber : bool, optional
+    outpath : str, optional
+    name : str
 
+    Returns
+    -------
+    tasks : list of tuple
+      (source file, output path, output file)
     """
-    #
     if outpath is None:
         outpath = 'Spectra/'
     if name is None:
@@ -97,7 +115,7 @@ def mk_1dspec(idla, outpath=None, name=None, clobber=False):
 
     # Spectra files
     spec_dict = idla._clmdict['fits_files']
-    all_spec = []
+    tasks = []
     for key in spec_dict.keys():
         instr= fits_idx(key)
         if instr == 'XX':
@@ -110,20 +128,181 @@ def mk_1dspec(idla, outpath=None, name=None, clobber=False):
                 xdb.set_trace()
         # Generate new filename
         spec_fil = name+'_'+instr+'.fits'
+        tasks.append((spec_dict[key], outpath, str(spec_fil)))
+    return tasks
+
+
+def md5sum(fil, blocksize=2**20):
+    """ MD5 checksum of a file, read in blocks
+    """
+    md5 = hashlib.md5()
+    with open(fil, 'rb') as f:
+        for block in iter(lambda: f.read(blocksize), b''):
+            md5.update(block)
+    return md5.hexdigest()
+
+
+def spec_uptodate(src, outfil, entry):
+    """ Is the collated spectrum up to date with its source?
+
+    Compares the size and mtime of the source and output files
+    to those recorded in the manifest
+
+    Parameters
+    ----------
+    src : str
+    outfil : str
+    entry : dict or None
+      Manifest entry of the output file
+
+    Returns
+    -------
+    uptodate : bool
+    """
+    if (entry is None) or (not os.path.isfile(outfil)):
+        return False
+    _, mtime, size = file_stamp(src)
+    _, out_mtime, out_size = file_stamp(outfil)
+    return ((entry['src_size'] == size) & (entry['src_mtime'] == mtime) &
+            (entry['size'] == out_size) & (entry['mtime'] == out_mtime))
+
+
+def collate_spec(task, entry=None, clobber=False):
+    """ Read a spectrum and write it to the output file, unless up to date
+
+    Parameters
+    ----------
+    task : tuple
+      (source file, output path, output file), e.g. from spec_tasks
+    entry : dict, optional
+      Manifest entry of a previous collation
+    clobber : bool, optional
+
+    Returns
+    -------
+    entry : dict
+      Manifest entry for the output file
+    """
+    src, outpath, spec_fil = task
+    outfil = outpath+spec_fil
+    if (not clobber) and spec_uptodate(src, outfil, entry):
+        return entry
+    # Read
+    spec = lsio.readspec(src)
+    # Write
+    spec.write_to_fits(outfil, clobber=True, add_wave=True)
+    # Manifest entry
+    _, mtime, size = file_stamp(src)
+    _, out_mtime, out_size = file_stamp(outfil)
+    return dict(source=src, src_size=size, src_mtime=mtime,
+                size=out_size, mtime=out_mtime, md5=md5sum(outfil))
+
+
+def read_manifest(manifest_fil):
+    """ Read a manifest of collated spectra;  empty if it does not exist
+    """
+    if not os.path.isfile(manifest_fil):
+        return {}
+    with io.open(manifest_fil, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def collate_all_spec(tasks, outpath, nthread=4, maxqueue=None, clobber=False,
+                     manifest_fil=None):
+    """ Collate the spectra of a survey on a pool of threads
+
+    Spectra are fed to the threads through a bounded queue.  Outputs
+    whose source and output files match the size and mtime recorded in
+    the manifest are skipped.  The manifest, with the MD5 checksum of
+    each output, is written at the end.
+
+    Parameters
+    ----------
+    tasks : list of tuple
+      From spec_tasks
+    outpath : str
+    nthread : int, optional
+    maxqueue : int, optional
+      Size of the queue of pending spectra [2*nthread]
+    clobber : bool, optional
+    manifest_fil : str, optional
+      [outpath+'MANIFEST.json']
+
+    Returns
+    -------
+    manifest : dict
+      Entries keyed by output file
+    """
+    if manifest_fil is None:
+        manifest_fil = outpath+'MANIFEST.json'
+    if maxqueue is None:
+        maxqueue = 2*nthread
+    old_manifest = read_manifest(manifest_fil)
+    manifest = {}
+    errors = []
+    lock = threading.Lock()
+    tqueue = queue.Queue(maxsize=maxqueue)
+
+    def worker():
+        while True:
+            task = tqueue.get()
+            if task is None:
+                tqueue.task_done()
+                return
+            try:
+                entry = collate_spec(task, entry=old_manifest.get(task[2]),
+                                     clobber=clobber)
+            except Exception as err:
+                with lock:
+                    errors.append((task[0], err))
+            else:
+                with lock:
+                    manifest[task[2]] = entry
+            tqueue.task_done()
+
+    threads = [threading.Thread(target=worker) for ii in range(nthread)]
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+    for task in tasks:
+        tqueue.put(task)  # Blocks while the queue is full
+    for thread in threads:
+        tqueue.put(None)
+    for thread in threads:
+        thread.join()
+    if len(errors) > 0:
+        raise IOError('Failed to collate {:d} spectra, e.g. {:s}: {}'.format(
+            len(errors), errors[0][0], errors[0][1]))
+
+    # Manifest
+    print('Writing {:s}'.format(manifest_fil))
+    with io.open(manifest_fil, 'w', encoding='utf-8') as f:
+        write_json(manifest, f)
+    return manifest
+
+
+def mk_1dspec(idla, outpath=None, name=None, clobber=False):
+    """ Collate and rename the spectra
+    Parameters
+    ----------
+    idla : DLASystem
+    name : str, optional
+    clobber : bool, optional
+
+    """
+    all_spec = []
+    for task in spec_tasks(idla, outpath=outpath, name=name):
         # Copy over?
-        tmp = glob.glob(outpath+spec_fil+"*")
-        if (len(tmp) == 0) | (clobber):
-            # Read
-            spec = lsio.readspec(spec_dict[key])
-            # Write
-            spec.write_to_fits(outpath+spec_fil, clobber=True, add_wave=True)
+        if clobber or (not os.path.isfile(task[1]+task[2])):
+            collate_spec(task, clobber=True)
         # Append
-        all_spec.append(str(spec_fil))
+        all_spec.append(task[2])
     # Return
     return all_spec
 
 ####
-def mk_summary(dlas, prefix, outfil, specpath=None, htmlfil=None):
+def mk_summary(dlas, prefix, outfil, specpath=None, htmlfil=None, nthread=4,
+               clobber=False):
     """ Loops through the DLA list and generates a Table
 
     Also pushes the 1D spectra into the folder
@@ -135,6 +314,10 @@ def mk_summary(dlas, prefix, outfil, specpath=None, htmlfil=None):
     outfil : str
       Name of the output FITS summary file
     htmlfil : str, optional
+    nthread : int, optional
+      Number of threads collating the spectra
+    clobber : bool, optional
+      Rewrite all of the spectra
 
     Returns
     -------
@@ -142,6 +325,8 @@ def mk_summary(dlas, prefix, outfil, specpath=None, htmlfil=None):
     #
     if htmlfil is None:
         htmlfil = 'tmp.html'
+    if specpath is None:
+        specpath = 'Spectra/'
 
     # # Constructing
     # QSO, RA/DEC
@@ -170,13 +355,17 @@ def mk_summary(dlas, prefix, outfil, specpath=None, htmlfil=None):
 
     # Spectra files
     all_sfiles = []
+    all_tasks = []
     for jj,ills in enumerate(dlas._abs_sys):
-        sub_spec = mk_1dspec(ills, name=cjname[jj], outpath=specpath)
+        tasks = spec_tasks(ills, name=cjname[jj], outpath=specpath)
+        all_tasks += tasks
+        sub_spec = [task[2] for task in tasks]
         # Pad
         while len(sub_spec) < 5:
             sub_spec.append(str('NULL'))
         # Append
         all_sfiles.append(sub_spec)
+    collate_all_spec(all_tasks, specpath, nthread=nthread, clobber=clobber)
 
     cspec = Column(np.array(all_sfiles), name='SPEC_FILES')
     dla_table.add_column( cspec )
@@ -193,6 +382,24 @@ def mk_summary(dlas, prefix, outfil, specpath=None, htmlfil=None):
     return dla_table
 
 
+def write_json(obj, f, **kwargs):
+    """ Stream an object as JSON to an open text file, chunk by chunk
+
+    Parameters
+    ----------
+    obj : dict or list
+    f : file
+      Opened in text mode
+    **kwargs :
+      Passed to JSONEncoder [sort_keys=True, indent=4]
+    """
+    kwargs.setdefault('sort_keys', True)
+    kwargs.setdefault('indent', 4)
+    kwargs.setdefault('separators', (',', ': '))
+    for chunk in json.JSONEncoder(**kwargs).iterencode(obj):
+        f.write(unicode(chunk))
+
+
 def mk_json_clms(dlas, outpath, prefix):
     """ Generate a JSON table of the Ion database
     Parameters
@@ -218,8 +425,28 @@ def mk_json_clms(dlas, outpath, prefix):
         # Write
         print('Writing {:s}'.format(outfil))
         with io.open(outfil, 'w', encoding='utf-8') as f:
-            f.write(unicode(json.dumps(tdict, sort_keys=True, indent=4,
-                                       separators=(',', ': '))))
+            write_json(tdict, f)
+
+
+def ion_dict(idla):
+    """ Dict of the column densities of a DLA, keyed by ion name
+    """
+    # Astropy Table
+    ion_tab = idla._ionN
+    # Convert key to standard names
+    new_dict = {}
+    for row in ion_tab:
+        Zion = (row['Z'], row['ion'])
+        # Skip HI
+        if Zion == (1,1):
+            continue
+        # Get name
+        new_key = ltai.ion_name(Zion)
+        # Fine structure?
+        if row['Ej'] > 0.:
+            new_key = new_key+'*'
+        new_dict[new_key] = dict(zip(row.dtype.names, row))
+    return new_dict
 
 
 def mk_json_ions(dlas, prefix, outfil):
@@ -230,42 +457,36 @@ def mk_json_ions(dlas, prefix, outfil):
     prefix : str
     outfil : str
       Output JSON file
+
+    The file is written one DLA at a time
+
+    Returns
+    -------
+    names : list
+      Names of the DLA written, sorted
     """
-    # Sort
-    ra = dlas.coord.ra.degree[0]
-    srt = np.argsort(np.array(ra))
-
-    all_ions = {}
-    # Loop on DLA
-    for jj, isrt in enumerate(srt):
-        idla = dlas._abs_sys[isrt]
-        # Astropy Table
-        ion_tab = idla._ionN
-        # Convert key to standard names
-        new_dict = {}
-        for row in ion_tab:
-            Zion = (row['Z'], row['ion'])
-            # Skip HI
-            if Zion == (1,1):
-                continue
-            # Get name
-            new_key = ltai.ion_name(Zion)
-            # Fine structure?
-            if row['Ej'] > 0.:
-                new_key = new_key+'*'
-            new_dict[new_key] = dict(zip(row.dtype.names, row))
-        # Write to all_ions
-        name = survey_name(prefix, idla)
-        all_ions[name] = new_dict
+    # Names, sorted as the keys of the JSON dict
+    names = [survey_name(prefix, idla) for idla in dlas._abs_sys]
+    srt = np.argsort(names)
 
     # Write
     print('Writing {:s}'.format(outfil))
     with io.open(outfil, 'w', encoding='utf-8') as f:
-        f.write(unicode(json.dumps(all_ions, sort_keys=True, indent=4,
-            separators=(',', ': '))))
+        f.write(unicode('{'))
+        # Loop on DLA
+        for jj, isrt in enumerate(srt):
+            if jj > 0:
+                f.write(unicode(','))
+            f.write(unicode('\n    {:s}: '.format(json.dumps(names[isrt]))))
+            ions = json.dumps(ion_dict(dlas._abs_sys[isrt]), sort_keys=True,
+                              indent=4, separators=(',', ': '))
+            f.write(unicode(ions.replace('\n', '\n    ')))
+        if len(srt) > 0:
+            f.write(unicode('\n'))
+        f.write(unicode('}'))
 
     # Return
-    return all_ions
+    return [names[isrt] for isrt in srt]
 
 
 def mk_json_sys(dlas, outpath, prefix):
@@ -291,8 +512,60 @@ def mk_json_sys(dlas, outpath, prefix):
         outfil = outpath+'SYS/'+name+'.json'
         print('Writing {:s}'.format(outfil))
         with io.open(outfil, 'wt') as f:
-            f.write(unicode(json.dumps(tdict, sort_keys=True, indent=4,
-                                       separators=(',', ': '))))
+            write_json(tdict, f)
+
+
+def mk_jsonl_sys(dlas, outfil, prefix):
+    """ Write the absorption systems to one line-delimited JSON file
+
+    Systems are written one at a time, with an offset index
+    (outfil+'.idx') for random access by name with
+    xastropy.xutils.jsonl.JsonlReader
+
+    Parameters
+    ----------
+    dlas : DLASurvey
+    outfil : str
+    prefix : str
+
+    Returns
+    -------
+    index : dict
+      (offset, length) of each system, keyed by name
+    """
+    print('Writing {:s}'.format(outfil))
+    with JsonlWriter(outfil) as jwrite:
+        for ii, abssys in enumerate(dlas._abs_sys):
+            name = survey_name(prefix, abssys)
+            if ~dlas.mask[ii]:
+                print('Skipping {:s}'.format(name))
+                continue
+            jwrite.write(abssys.to_dict(), name=name)
+    return jwrite.index
+
+
+def mk_jsonl_ions(dlas, prefix, outfil):
+    """ Write the Ion database to one line-delimited JSON file
+
+    One record per DLA, holding the ion dict under 'ions'
+
+    Parameters
+    ----------
+    dlas : DLASurvey
+    prefix : str
+    outfil : str
+
+    Returns
+    -------
+    index : dict
+      (offset, length) of each system, keyed by name
+    """
+    print('Writing {:s}'.format(outfil))
+    with JsonlWriter(outfil) as jwrite:
+        for idla in dlas._abs_sys:
+            jwrite.write(dict(ions=ion_dict(idla)),
+                         name=survey_name(prefix, idla))
+    return jwrite.index
 
 
 # ##################################################
@@ -0,0 +1,28 @@
+# Tests the codes in xastropy.igm.abs_sys.abs_survey
+import numpy as np
+import os, pdb
+import pytest
+
+from astropy import units as u
+
+from xastropy.igm.abs_sys import abs_survey as xias
+
+def test_survey_arrays():
+    survey = xias.AbslineSurvey.from_arrays('DLA', np.linspace(2.,3.,5),
+        np.linspace(10.,50.,5)*u.deg, np.linspace(-5.,5.,5)*u.deg,
+        NHI=np.array([20.3, 21., 20.5, 22., 20.1]), sigNHI=0.1,
+        Refs=[['A'], ['B','C'], [], ['D'], ['E']])
+    assert len(survey) == 5
+    # Sort and select
+    srt = survey.sort('NHI')
+    np.testing.assert_allclose(srt.NHI, [20.1, 20.3, 20.5, 21., 22.])
+    sub = survey[survey.NHI > 20.4]
+    assert len(sub) == 3
+    # System generated on access
+    isys = sub[0]
+    np.testing.assert_allclose(isys.zabs, 2.25)
+    assert isys.Refs == ['B', 'C']
+    assert sub[0] is isys
+    # Table
+    tab = survey.to_table()
+    assert tab['RA'].unit == u.deg
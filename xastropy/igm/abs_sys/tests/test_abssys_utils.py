@@ -0,0 +1,38 @@
+# Tests the line lookups in xastropy.igm.abs_sys.abssys_utils
+import numpy as np
+import os, pdb
+import pytest
+
+from astropy import units as u
+
+from linetools.spectralline import AbsLine
+
+from xastropy.igm.abs_sys import abssys_utils as xiau
+
+def test_line_index():
+    gensys = xiau.GenericAbsSystem(zabs=1.)
+    for wrest in [1548.195, 1550.770, 1526.7070]:
+        aline = AbsLine(wrest*u.AA)
+        aline.attrib['z'] = 1.
+        gensys.lines.append(aline)
+    assert isinstance(gensys.lines, xiau.LineIndex)
+    # Wavelength and name
+    civ = gensys.grab_line((1., 1548.195*u.AA))
+    np.testing.assert_allclose(civ.wrest.value, 1548.195)
+    assert gensys.grab_line(civ.data['name']) is civ
+    assert len(gensys.lines.by_zion((6,4))) == 2
+    # Remove
+    assert gensys.remove_line((1., 1548.195*u.AA))
+    assert gensys.grab_line((1., 1548.195*u.AA)) is None
+    assert len(gensys.lines.by_zion((6,4))) == 1
+
+def test_wrest_toler():
+    gensys = xiau.GenericAbsSystem(zabs=1.)
+    for wrest in [1548.195, 1548.1955]:
+        aline = AbsLine(1548.195*u.AA)
+        aline.wrest = wrest*u.AA
+        aline.attrib['z'] = 1.
+        gensys.lines.append(aline)
+    # Lines 5e-4 Ang apart are told apart
+    assert len(gensys[1548.195*u.AA]) == 1
+    assert len(gensys.lines.by_wrest(1548.195*u.AA, toler=1e-3*u.AA)) == 2
@@ -0,0 +1,98 @@
+# Tests the parsers in xastropy.igm.abs_sys.ionclms
+import numpy as np
+import os, pdb
+import pytest
+
+from astropy import units as u
+
+from xastropy.igm.abs_sys import ionclms as xiic
+
+def data_path(filename):
+    data_dir = os.path.join(os.path.dirname(__file__), 'files')
+    return os.path.join(data_dir, filename)
+
+CLM_TXT = """UM184.z2929
+3
+Spectra/UM184_HIRES.fits
+Spectra/UM184_ESI.fits
+2.9291
+UM184.z2929.ion
+19.800, 0.100
+1
+26
+13.512, 0.05, 1
+1
+1526.7070, -80., 120., 1
+9
+1808.0129, 14.21, 0.05, 2
+
+junk after the blank line
+"""
+
+def test_parse_all(tmpdir, monkeypatch):
+    monkeypatch.setenv('XASTROPY_CACHE', str(tmpdir))
+    table = xiic.read_all_file(data_path('UM184.z2929_MAGE.all'))
+    assert len(table) == 14
+    assert table['Z'][3] == 6
+    np.testing.assert_allclose(table['logN'][3], 13.900)
+    # From the cache
+    table2 = xiic.read_all_file(data_path('UM184.z2929_MAGE.all'))
+    assert np.all(table2['logN'] == table['logN'])
+
+def test_parse_clm(tmpdir, monkeypatch):
+    monkeypatch.setenv('XASTROPY_CACHE', str(tmpdir))
+    clm_file = str(tmpdir.join('UM184.z2929.clm'))
+    with open(clm_file, 'w') as f:
+        f.write(CLM_TXT)
+    clm_dict = xiic.parse_clm_file(clm_file)
+    assert clm_dict['fits_files'][2] == 'Spectra/UM184_ESI.fits'
+    np.testing.assert_allclose(clm_dict['zsys'], 2.9291)
+    np.testing.assert_allclose(clm_dict['NHI'], 19.8)
+    assert clm_dict['fixabund'][26][2] == 1
+    assert len(clm_dict['lines']) == 2
+    assert clm_dict['lines']['flg'][1] == 9
+    np.testing.assert_allclose(clm_dict['lines']['vmax'][0], 120.)
+    # A line without its partner
+    with open(clm_file, 'w') as f:
+        f.write(CLM_TXT.replace('1808.0129, 14.21, 0.05, 2\n', ''))
+    with pytest.raises(ValueError):
+        xiic.parse_clm_file(clm_file)
+
+def test_parse_ion(tmpdir, monkeypatch):
+    monkeypatch.setenv('XASTROPY_CACHE', str(tmpdir))
+    ion_fil = str(tmpdir.join('UM184.z2929.ion'))
+    with open(ion_fil, 'w') as f:
+        f.write(' 1526.7070  13.700  0.046  1  16\n')
+        f.write(' 1808.0129  14.210  0.050  2   8\n')
+    table = xiic.parse_ion_file(ion_fil)
+    assert table['flag_N'][1] == 2
+    np.testing.assert_allclose(table['wrest'][0], 1526.7070)
+
+def test_sum_lookup(tmpdir, monkeypatch):
+    monkeypatch.setenv('XASTROPY_CACHE', str(tmpdir))
+    ionc = xiic.IonClms(all_file=data_path('UM184.z2929_MAGE.all'))
+    # Lookup
+    assert ionc[(14,2)]['logN'] == ionc['SiII']['logN']
+    idx = ionc.index([(14,2), (14,4), (92,1)])
+    assert idx[-1] == -1
+    np.testing.assert_allclose(ionc.logN[idx[:2]], [13.700, 13.517])
+    # Sum
+    sumc = ionc.sum(ionc)
+    np.testing.assert_allclose(sumc[(14,2)]['logN'], 13.7+np.log10(2.))
+    assert sumc[(16,2)]['flg_clm'] == 3
+    # Survey table
+    tab = xiic.ionclms_table([ionc, sumc], ['SiII', (92,1)])
+    assert tab['logN'].shape == (2,2)
+    assert np.isnan(tab['logN'][0,1])
+
+def test_index_two_names(tmpdir, monkeypatch):
+    monkeypatch.setenv('XASTROPY_CACHE', str(tmpdir))
+    ionc = xiic.IonClms(all_file=data_path('UM184.z2929_MAGE.all'))
+    # A 2-tuple of names is not a (Z, ion) pair of arrays
+    idx = ionc.index(('SiII', 'SiIV'))
+    np.testing.assert_array_equal(idx, ionc.index([(14,2), (14,4)]))
+    np.testing.assert_array_equal(idx, ionc.index((np.array([14,14]), np.array([2,4]))))
+    out = ionc.batch(('SiII', 'SiIV'))
+    np.testing.assert_allclose(out['logN'], [13.700, 13.517])
+    # Empty dict
+    assert len(xiic.IonClms(idict={})._keys) == 0
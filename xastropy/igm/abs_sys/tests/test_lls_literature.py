@@ -0,0 +1,33 @@
+# Tests the loaders in xastropy.igm.abs_sys.lls_literature
+import numpy as np
+import os, pdb
+import pytest
+
+from xastropy.igm.abs_sys import lls_literature as xlls
+
+# Loaders whose tables are in data/LLS
+LOCAL_LOADERS = ['zonak2004', 'peroux06a', 'peroux06b', 'meiring06',
+                 'meiring07', 'meiring08', 'nestor08', 'meiring09',
+                 'dessauges09', 'kacprzak12']
+
+
+@pytest.mark.remote_data
+def test_load_all():
+    # Downloads the tables that are not in data/LLS
+    all_lls = xlls.load_all(nproc=1, use_cache=False)
+    assert len(all_lls) > 0
+    refs = set([ref for lls in all_lls for ref in lls.Refs])
+    assert 'Tum11' in refs
+
+
+def test_load_local(tmpdir, monkeypatch):
+    monkeypatch.setenv('XASTROPY_CACHE', str(tmpdir))
+    all_lls = xlls.load_all(loaders=LOCAL_LOADERS, nproc=1, use_cache=False)
+    assert len(all_lls) > 0
+    assert all_lls[0].abs_type == 'LLS'
+    assert sorted(all_lls[0].subsys.keys()) == ['A', 'B']
+    # Cached copies are independent of each other
+    lls1 = xlls.load_all(loaders=LOCAL_LOADERS, nproc=1)
+    lls1[0].NHI = -1.
+    lls2 = xlls.load_all(loaders=LOCAL_LOADERS, nproc=1)
+    assert lls2[0].NHI == all_lls[0].NHI
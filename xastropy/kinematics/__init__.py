@@ -1 +1,2 @@
 import absline
+import batch
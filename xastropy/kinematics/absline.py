@@ -34,9 +34,20 @@ class KinAbs(object):
       Rest wavelength of line analyzed
     vmnx: tuple (vmin,vmax)
       Velocity range for analysis
+    stau: ndarray
+      Smoothed optical depth (filled by mk_pix_stau)
+    tau_cache: dict
+      Quantities derived from stau, shared by the kinematic tests
+    kin_err: dict
+      Bootstrap errors (err_lo, err_hi) of the measurements, if run
 
     JXP on 11 Dec 2014
     """
+    # Schema of the kinematic measurements
+    keys = ['flg', 'Dv', 'fedg', 'fmm', 'delta_v', 'X_fcover',
+            'v_peak', 'zero_pk', 'JF_fcover']
+    key_dtype = ['i4', 'f4', 'f4', 'f4', 'f4', 'f4',
+                 'f4', 'f4', 'f4']
 
     # Initialize 
     def __init__(self, wrest, vmnx):
@@ -47,10 +58,9 @@ class KinAbs(object):
 
         # Data
         self.kin_data = {}
-        self.keys = ['flg', 'Dv', 'fedg', 'fmm', 'delta_v', 'X_fcover',
-                     'v_peak', 'zero_pk', 'JF_fcover']
-        self.key_dtype = ['i4', 'f4', 'f4', 'f4', 'f4', 'f4',
-                          'f4', 'f4', 'f4']
+        self.stau = None
+        self.tau_cache = {}
+        self.kin_err = {}
 
         # Init
         for key in self.keys:
@@ -123,6 +133,45 @@ class KinAbs(object):
         # Fill
         self.stau = stau
         self.pix = pix
+        self.fill_tau_cache()
+
+    def fill_tau_cache(self):
+        """ Cache the quantities derived from the smoothed tau array
+
+        The cumulative tau is normalized to unity.  Its running maximum
+        is monotonic, so the first pixel exceeding any percentile is
+        found with a binary search (see per_pix).
+        """
+        tottau = np.sum(self.stau)
+        cumtau = np.cumsum(self.stau) / tottau
+        self.tau_cache = dict(tottau=tottau, cumtau=cumtau,
+                              cummax=np.maximum.accumulate(cumtau),
+                              imx=np.argmax(self.stau),  # Peak
+                              imn=np.argmin(np.fabs(cumtau-0.5)))  # Median
+
+    def per_pix(self, per):
+        """ Index of the first pixel where the cumulative tau exceeds per
+
+        Parameters
+        ----------
+        per: float or ndarray
+          Percentile(s), between 0 and 1
+
+        Returns
+        -------
+        idx: int or ndarray
+        """
+        return np.searchsorted(self.tau_cache['cummax'], per, side='right')
+
+    def per_bounds(self, per=0.05):
+        """ Pixel indices bounding the central (1-2*per) of the optical depth
+
+        Returns
+        -------
+        lft, rgt: int
+          Dv uses these, e.g. Dv90 for per=0.05
+        """
+        return self.per_pix(per), self.per_pix(1.-per) - 1
 
 
     ########################## ##########################
@@ -149,21 +198,18 @@ class KinAbs(object):
             self.mk_pix_stau(spec, kbin=kbin)
 
         # Dv (usually dv90)
-        tottau = np.sum( self.stau )
-        cumtau = np.cumsum(self.stau) / tottau
-        lft = (np.where(cumtau > per)[0])[0]
-        rgt = (np.where(cumtau > (1.-per))[0])[0] - 1
+        lft, rgt = self.per_bounds(per)
         self.kin_data['Dv'] = np.round(np.abs(spec.velo[self.pix[rgt]]-spec.velo[self.pix[lft]]))
         #xdb.set_trace()
 
         # Mean/Median
         vcen = (spec.velo[self.pix[rgt]]+spec.velo[self.pix[lft]])/2.
         mean = self.kin_data['Dv']/2.
-        imn = np.argmin( np.fabs(cumtau-0.5) )
+        imn = self.tau_cache['imn']
         self.kin_data['fmm'] = np.abs( (spec.velo[self.pix[imn]]-vcen)/mean )
     
         # fedg
-        imx = np.argmax(self.stau)
+        imx = self.tau_cache['imx']
         self.kin_data['fedg'] = np.abs( (spec.velo[self.pix[imx]]-vcen) / mean )
     
         # Two-peak :: Not ported..  Not even to XIDL!
@@ -202,14 +248,11 @@ class KinAbs(object):
 
         # voff -- Velocity centroid of profile relative to zsys
         self.kin_data['delta_v'] = np.sum(
-            spec.velo[self.pix] * self.stau ) / np.sum( self.stau )  
+            spec.velo[self.pix] * self.stau ) / self.tau_cache['tottau']
 
         # ###
         # X "Covering" test
-        tottau = np.sum( self.stau )
-        cumtau = np.cumsum(self.stau) / tottau
-        lft = (np.where(cumtau > per)[0])[0]
-        rgt = (np.where(cumtau > (1.-per))[0])[0] - 1
+        lft, rgt = self.per_bounds(per)
 
         inpix = range(lft,rgt+1)
         tau_covering = np.mean( self.stau[inpix] )
@@ -220,7 +263,7 @@ class KinAbs(object):
 
         # ###
         # Peak -- Peak optical depth velocity
-        imx = np.argmax(self.stau)
+        imx = self.tau_cache['imx']
         self.kin_data['v_peak'] = spec.velo[self.pix[imx]]
 
         # ###
@@ -240,15 +283,46 @@ class KinAbs(object):
         # ###
         # Forbes "Covering"
         dv = np.abs(spec.velo[self.pix[1]]-spec.velo[self.pix[0]])
-        forbes_fcover = dv * np.sum( self.stau ) / tau_zero
+        forbes_fcover = dv * self.tau_cache['tottau'] / tau_zero
         self.kin_data['JF_fcover'] = forbes_fcover
 
         # Set flag
         if (self.kin_data['flg'] % 4) < 2:
             self.kin_data['flg'] += 2
 
+    ########################## ##########################
+    def boot_kin(self, spec, nboot=1000, **kwargs):
+        """ Bootstrap errors on the kinematic measurements
+
+        The flux is resampled from spec.sig;  see batch.boot_kin
+
+        Parameters
+        ----------
+        spec: Spectrum1D class
+          Input spectrum
+          velo is expected to have been filled already
+        nboot: int (1000)
+          Number of realizations
+        **kwargs :
+          Passed to batch.boot_kin if in batch.BOOT_KIN_KEYS;  others are ignored
+
+        Returns
+        -------
+        err_tab : Table
+          Also stored in kin_err as (err_lo, err_hi) per key
+        """
+        from xastropy.kinematics import batch as xkb
+        # Only the keywords that boot_kin and kin_stats accept
+        bkwargs = dict((key, val) for key, val in kwargs.items()
+                       if key in xkb.BOOT_KIN_KEYS)
+        err_tab = xkb.boot_kin(spec.velo, spec.flux, spec.sig, self.vmnx,
+                               nboot=nboot, **bkwargs)
+        for row in err_tab:
+            self.kin_err[row['key']] = (row['err_lo'], row['err_hi'])
+        return err_tab
+
     # Perform all the measurements
-    def fill_kin(self, spec, **kwargs):
+    def fill_kin(self, spec, nboot=0, **kwargs):
 
         # Setup
         self.mk_pix_stau(spec, **kwargs)
@@ -256,6 +330,9 @@ class KinAbs(object):
         self.orig_kin(spec, **kwargs)
         # Original kinematics
         self.cgm_kin(spec, **kwargs) 
+        # Errors
+        if nboot > 0:
+            self.boot_kin(spec, nboot=nboot, **kwargs)
 
     # Output
     def __repr__(self):
@@ -0,0 +1,453 @@
+"""
+#;+
+#; NAME:
+#; batch
+#;    Version 1.0
+#;
+#; PURPOSE:
+#;    Module for batch (many sightline) absorption line kinematics
+#;   18-Oct-2016
+#;-
+#;------------------------------------------------------------------------------
+"""
+from __future__ import print_function, absolute_import, division, unicode_literals
+
+import numpy as np
+import multiprocessing
+
+from astropy import units as u
+from astropy.table import Table
+from astropy.convolution import convolve, Box1DKernel
+
+from xastropy.kinematics.absline import KinAbs
+
+# Approximate number of (realization x pixel) float arrays alive at once
+# in boot_kin; sets the chunk size for a given memory cap
+_NBOOT_ARRAYS = 16
+
+# Keywords of boot_kin, including those it passes to kin_stats
+BOOT_KIN_KEYS = ('kbin', 'perc', 'max_mem', 'seed', 'per', 'cov_thresh', 'dv_zeropk')
+
+
+def kin_dtype():
+    """ numpy dtype of the kinematic table, following the KinAbs schema
+    """
+    return np.dtype([(str(key), str(dtype)) for key, dtype in
+                     zip(KinAbs.keys, KinAbs.key_dtype)])
+
+
+def _kms(val):
+    """ Strip km/s units (if any) and return a float ndarray
+    """
+    if isinstance(val, u.Quantity):
+        return val.to('km/s').value
+    return np.asarray(val, dtype=float)
+
+
+def box_nbin(velo, kbin=22.*u.km/u.s):
+    """ Number of pixels in the box kernel used to smooth tau
+
+    Parameters
+    ----------
+    velo : Quantity or ndarray
+      Velocity array (km/s if unitless)
+    kbin : Quantity or float, optional
+      Width of the box kernel
+
+    Returns
+    -------
+    nbin : float
+    """
+    velo = _kms(velo)
+    imn = np.argmin(np.fabs(velo))
+    dv = np.abs(velo[imn] - velo[imn+1])
+    return np.round(_kms(kbin)/dv)
+
+
+def flux_to_tau(flux, sig):
+    """ Optical depth of normalized flux, any shape
+
+    Saturated pixels (flux < sig/2) are assigned tau = ln(2/sig)
+    """
+    gd = (flux > sig/2.) & (sig > 0.)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(gd, np.log(1./flux), np.log(2./sig))
+
+
+def smooth_tau(tau, nbin):
+    """ Box-smooth tau along its last axis with an FFT convolution
+
+    Same kernel and zero-filled boundary as astropy.convolution.convolve
+    in pix_stau, but any number of profiles are done in one pass.
+    """
+    from scipy.signal import fftconvolve
+    kernel = Box1DKernel(nbin, mode='center').array
+    tau = np.atleast_2d(tau)
+    return fftconvolve(tau, kernel[None, :], mode='same', axes=-1)
+
+
+def _patch_badzero(flux, sig, pix):
+    """ Interpolate over a small section of bad data, in place
+    """
+    badzero = np.where((flux[pix] == 0) & (sig[pix] <= 0))[0]
+    if len(badzero) > 0:
+        if np.max(badzero)-np.min(badzero) >= 5:
+            raise ValueError('too many or too large sections of bad data')
+        edges = pix[[np.min(badzero)-1, np.max(badzero)+1]]
+        flux[pix[badzero]] = np.mean(flux[edges])
+        sig[pix[badzero]] = np.mean(sig[edges])
+
+
+def pix_stau(velo, flux, sig, vmnx, kbin=22.*u.km/u.s):
+    """ Generate the smoothed tau array for a single profile
+
+    Array-only version of KinAbs.mk_pix_stau.  The input arrays are
+    not modified.
+
+    Parameters
+    ----------
+    velo : Quantity or ndarray
+      Velocity array (km/s if unitless)
+    flux : ndarray
+      Normalized flux
+    sig : ndarray
+      Error array
+    vmnx : tuple (vmin,vmax)
+      Velocity range for analysis (km/s if unitless)
+    kbin : Quantity or float, optional
+      Width of the box kernel
+
+    Returns
+    -------
+    pix : int ndarray
+      Pixels analyzed
+    stau : ndarray
+      Smoothed optical depth
+    """
+    velo = _kms(velo)
+    flux = np.array(flux, dtype=float)
+    sig = np.array(sig, dtype=float)
+    vmin, vmax = _kms(vmnx[0]), _kms(vmnx[1])
+
+    pixmin = np.argmin(np.fabs(velo-vmin))
+    pixmax = np.argmin(np.fabs(velo-vmax))
+    pix = np.arange(pixmin, pixmax+1)
+
+    # Patch small sections of bad data
+    _patch_badzero(flux, sig, pix)
+
+    # Generate the tau array
+    if not np.any((flux[pix] > sig[pix]/2.) & (sig[pix] > 0.)):
+        raise ValueError('pix_stau: Profile too saturated.')
+    tau = flux_to_tau(flux[pix], sig[pix])
+
+    # Smooth
+    kernel = Box1DKernel(box_nbin(velo, kbin=kbin), mode='center')
+    stau = convolve(tau, kernel, boundary='fill', fill_value=0.)
+    return pix, stau
+
+
+def pad_profiles(velos, staus):
+    """ Pack profiles of varying length into padded 2D arrays
+
+    Parameters
+    ----------
+    velos : list of ndarray
+      Velocity arrays (km/s if unitless)
+    staus : list of ndarray
+      Smoothed optical depth arrays
+
+    Returns
+    -------
+    velo : ndarray (nprof, nmax)
+    stau : ndarray (nprof, nmax)
+    npix : int ndarray (nprof)
+    """
+    npix = np.array([len(stau) for stau in staus], dtype=int)
+    nmax = np.max(npix)
+    velo = np.zeros((len(npix), nmax))
+    stau = np.zeros((len(npix), nmax))
+    for ii, (ivelo, istau) in enumerate(zip(velos, staus)):
+        velo[ii, :npix[ii]] = _kms(ivelo)
+        stau[ii, :npix[ii]] = istau
+    return velo, stau, npix
+
+
+def kin_stats(velo, stau, npix=None, vmnx=None, per=0.05, cov_thresh=0.5,
+              dv_zeropk=15.*u.km/u.s):
+    """ Measure the KinAbs statistics for many smoothed tau profiles at once
+
+    All profiles are processed together as 2D arrays, padded past npix.
+
+    Parameters
+    ----------
+    velo : ndarray (nprof, nmax) or (nmax)
+      Velocities of the profile pixels (km/s if unitless)
+    stau : ndarray (nprof, nmax)
+      Smoothed optical depths
+    npix : int ndarray (nprof), optional
+      Number of valid pixels in each profile [all]
+    vmnx : ndarray (nprof, 2), optional
+      Velocity range analyzed;  only used for the zero_pk test
+      Defaults to the velocity limits of each profile
+    per : float, optional
+      Percentile for Dv;  0.05 gives Dv90
+    cov_thresh : float, optional
+      Parameter for the X_fcover test
+    dv_zeropk : Quantity or float, optional
+      Velocity window around zero for the zero_pk test
+
+    Returns
+    -------
+    kin : structured ndarray (nprof)
+      Kinematic measurements with the KinAbs keys
+    """
+    stau = np.atleast_2d(np.asarray(stau, dtype=float))
+    nprof, nmax = stau.shape
+    velo = np.broadcast_to(np.atleast_2d(_kms(velo)), stau.shape)
+    if npix is None:
+        npix = np.full(nprof, nmax, dtype=int)
+    rows = np.arange(nprof)
+    cols = np.arange(nmax)
+    mask = cols[None, :] < np.asarray(npix)[:, None]
+    if vmnx is None:
+        vmnx = np.array([velo[:, 0], velo[rows, npix-1]]).T
+    else:
+        vmnx = np.atleast_2d(_kms(vmnx))
+
+    kin = np.zeros(nprof, dtype=kin_dtype())
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # Cumulative tau;  the running maximum keeps the first
+        # crossing of a percentile while allowing negative tau
+        tau0 = np.where(mask, stau, 0.)
+        tottau = np.sum(tau0, axis=1)
+        cumtau = np.cumsum(tau0, axis=1) / tottau[:, None]
+        runmax = np.maximum.accumulate(cumtau, axis=1)
+        lft = np.argmax(runmax > per, axis=1)
+        rgt = np.maximum(np.argmax(runmax > (1.-per), axis=1) - 1, 0)
+
+        # Dv
+        vlft = velo[rows, lft]
+        vrgt = velo[rows, rgt]
+        kin['Dv'] = np.round(np.abs(vrgt-vlft))
+
+        # Mean/Median
+        vcen = (vrgt+vlft)/2.
+        mean = kin['Dv']/2.
+        imn = np.argmin(np.where(mask, np.fabs(cumtau-0.5), np.inf), axis=1)
+        kin['fmm'] = np.abs((velo[rows, imn]-vcen)/mean)
+
+        # fedg
+        imx = np.argmax(np.where(mask, stau, -np.inf), axis=1)
+        kin['fedg'] = np.abs((velo[rows, imx]-vcen)/mean)
+
+        # delta_v
+        kin['delta_v'] = np.sum(np.where(mask, velo*stau, 0.), axis=1) / tottau
+
+        # X "Covering" test
+        inpix = (cols[None, :] >= lft[:, None]) & (cols[None, :] <= rgt[:, None])
+        ninpix = np.sum(inpix, axis=1)
+        tau_covering = np.sum(np.where(inpix, stau, 0.), axis=1) / ninpix
+        i_cover = inpix & (stau > cov_thresh*tau_covering[:, None])
+        kin['X_fcover'] = np.sum(i_cover, axis=1) / ninpix
+
+        # Peak
+        kin['v_peak'] = velo[rows, imx]
+
+        # Zero peak
+        tau_zero = stau[rows, imx]
+        zmask = mask & (np.abs(velo) < _kms(dv_zeropk))
+        mx_ztau = np.max(np.where(zmask, stau, -np.inf), axis=1)
+        zero_pk = np.clip(mx_ztau/tau_zero, 0., 1.)
+        zero_pk[~np.any(zmask, axis=1)] = np.nan
+        covered = (vmnx[:, 0] <= 0.) & (vmnx[:, 1] >= 0.)
+        kin['zero_pk'] = np.where(covered, zero_pk, 0.)
+
+        # Forbes "Covering"
+        dv = np.abs(velo[:, 1]-velo[:, 0])
+        kin['JF_fcover'] = dv * tottau / tau_zero
+
+    # orig_kin + cgm_kin
+    kin['flg'] = 3
+    return kin
+
+
+def _kin_chunk(args):
+    """ Worker for batch_kin
+    """
+    velos, staus, vmnx, kwargs = args
+    velo, stau, npix = pad_profiles(velos, staus)
+    return kin_stats(velo, stau, npix=npix, vmnx=vmnx, **kwargs)
+
+
+def _spec_chunk(args):
+    """ Worker for batch_fill_kin
+    """
+    specs, vmnx, kbin, kwargs = args
+    velos, staus = [], []
+    for (velo, flux, sig), ivmnx in zip(specs, vmnx):
+        pix, stau = pix_stau(velo, flux, sig, ivmnx, kbin=kbin)
+        velos.append(velo[pix])
+        staus.append(stau)
+    return _kin_chunk((velos, staus, vmnx, kwargs))
+
+
+def _run_chunks(func, chunks, nproc):
+    """ Map func over the chunks, in parallel if nproc > 1
+    """
+    if nproc > 1 and len(chunks) > 1:
+        pool = multiprocessing.Pool(nproc)
+        try:
+            out = pool.map(func, chunks)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        out = [func(chunk) for chunk in chunks]
+    return Table(np.concatenate(out))
+
+
+def _chunk_slices(nobj, chunksize):
+    return [slice(ii, ii+chunksize) for ii in range(0, nobj, chunksize)]
+
+
+def batch_kin(velos, staus, vmnx=None, nproc=1, chunksize=256, **kwargs):
+    """ Kinematic measurements for many smoothed tau profiles
+
+    Parameters
+    ----------
+    velos : list of ndarray
+      Velocities of each profile (km/s if unitless)
+    staus : list of ndarray
+      Smoothed optical depths, e.g. from pix_stau
+    vmnx : ndarray (nprof, 2), optional
+      Velocity range analyzed for each profile
+    nproc : int, optional
+      Number of processes to split the sightlines over
+    chunksize : int, optional
+      Number of profiles measured together in one 2D pass
+    **kwargs :
+      Passed to kin_stats (per, cov_thresh, dv_zeropk)
+
+    Returns
+    -------
+    kin_tab : Table
+      One row per profile with the KinAbs keys as columns
+    """
+    nprof = len(staus)
+    if len(velos) != nprof:
+        raise ValueError('batch_kin: velos and staus must have the same length')
+    velos = [_kms(velo) for velo in velos]
+    if vmnx is None:
+        vmnx = np.array([[velo[0], velo[-1]] for velo in velos])
+    else:
+        vmnx = np.atleast_2d(_kms(vmnx))
+    chunks = [(velos[ss], staus[ss], vmnx[ss], kwargs)
+              for ss in _chunk_slices(nprof, chunksize)]
+    return _run_chunks(_kin_chunk, chunks, nproc)
+
+
+def batch_fill_kin(specs, vmnx, kbin=22.*u.km/u.s, nproc=1, chunksize=256,
+                   **kwargs):
+    """ Equivalent of KinAbs.fill_kin for many (sightline, transition) pairs
+
+    Parameters
+    ----------
+    specs : list
+      Spectra with velo filled, or (velo, flux, sig) tuples
+    vmnx : ndarray (nspec, 2) or tuple
+      Velocity range(s) for analysis (km/s if unitless)
+    kbin : Quantity or float, optional
+      Width of the box kernel for smoothing tau
+    nproc : int, optional
+      Number of processes to split the sightlines over
+    chunksize : int, optional
+      Number of profiles measured together in one 2D pass
+    **kwargs :
+      Passed to kin_stats (per, cov_thresh, dv_zeropk)
+
+    Returns
+    -------
+    kin_tab : Table
+      One row per spectrum with the KinAbs keys as columns
+    """
+    arrays = []
+    for spec in specs:
+        if isinstance(spec, tuple):
+            velo, flux, sig = spec
+        else:
+            velo, flux, sig = spec.velo, spec.flux, spec.sig
+        arrays.append((_kms(velo), np.asarray(flux, dtype=float),
+                       np.asarray(sig, dtype=float)))
+    vmnx = _kms(vmnx)
+    if vmnx.ndim == 1:
+        vmnx = np.tile(vmnx, (len(arrays), 1))
+    chunks = [(arrays[ss], vmnx[ss], kbin, kwargs)
+              for ss in _chunk_slices(len(arrays), chunksize)]
+    return _run_chunks(_spec_chunk, chunks, nproc)
+
+
+def boot_kin(velo, flux, sig, vmnx, nboot=1000, kbin=22.*u.km/u.s,
+             perc=(15.87, 84.13), max_mem=2**28, seed=None, **kwargs):
+    """ Bootstrap uncertainties on the kinematic statistics of one profile
+
+    The flux is resampled from sig for nboot realizations, processed as
+    (realization x pixel) arrays in chunks of at most max_mem bytes.
+
+    Parameters
+    ----------
+    velo : Quantity or ndarray
+      Velocity array (km/s if unitless)
+    flux : ndarray
+      Normalized flux
+    sig : ndarray
+      Error array
+    vmnx : tuple (vmin,vmax)
+      Velocity range for analysis (km/s if unitless)
+    nboot : int, optional
+      Number of realizations
+    kbin : Quantity or float, optional
+      Width of the box kernel for smoothing tau
+    perc : tuple, optional
+      Lower and upper percentiles defining the errors (1 sigma)
+    max_mem : int, optional
+      Approximate memory cap in bytes for the realization arrays
+    seed : int, optional
+      Seed for the random realizations
+    **kwargs :
+      Passed to kin_stats (per, cov_thresh, dv_zeropk)
+
+    Returns
+    -------
+    err_tab : Table
+      One row per statistic with the measured value and the
+      lower/upper errors from the percentiles of the realizations
+    """
+    velo = _kms(velo)
+    flux = np.array(flux, dtype=float)
+    sig = np.array(sig, dtype=float)
+    pix, stau = pix_stau(velo, flux, sig, vmnx, kbin=kbin)
+    _patch_badzero(flux, sig, pix)
+    nbin = box_nbin(velo, kbin=kbin)
+    vmnx = np.atleast_2d(_kms(vmnx))
+    meas = kin_stats(velo[pix], stau, vmnx=vmnx, **kwargs)
+
+    # Realizations, chunked to cap the memory footprint
+    rstate = np.random.RandomState(seed)
+    nchunk = max(1, int(max_mem // (_NBOOT_ARRAYS * 8 * len(pix))))
+    fpix, spix = flux[pix], np.maximum(sig[pix], 0.)
+    boot = np.zeros(nboot, dtype=kin_dtype())
+    for i0 in range(0, nboot, nchunk):
+        nreal = min(nchunk, nboot-i0)
+        bflux = fpix + spix * rstate.randn(nreal, len(pix))
+        bstau = smooth_tau(flux_to_tau(bflux, sig[pix]), nbin)
+        boot[i0:i0+nreal] = kin_stats(velo[pix], bstau, vmnx=vmnx, **kwargs)
+
+    # Errors
+    keys = [key for key in KinAbs.keys if key != 'flg']
+    err_tab = Table(names=('key', 'value', 'err_lo', 'err_hi'),
+                    dtype=('U10', 'f8', 'f8', 'f8'))
+    for key in keys:
+        lo, hi = np.nanpercentile(boot[key], perc)
+        err_tab.add_row((key, meas[key][0], meas[key][0]-lo, hi-meas[key][0]))
+    return err_tab
@@ -0,0 +1,58 @@
+# Tests the codes in xastropy.kinematics
+import numpy as np
+import os, pdb
+import pytest
+
+from astropy import units as u
+
+from xastropy.kinematics import absline as xkab
+from xastropy.kinematics import batch as xkb
+
+class FakeSpec(object):
+    def __init__(self, voff=0., dv=2.5, seed=1):
+        rstate = np.random.RandomState(seed)
+        velo = np.arange(-300., 300., dv)
+        tau = (1.5*np.exp(-0.5*((velo-voff)/25.)**2) +
+               0.8*np.exp(-0.5*((velo-40.)/15.)**2))
+        self.velo = velo * u.km/u.s
+        self.flux = np.exp(-tau) + rstate.normal(0., 0.02, velo.size)
+        self.sig = np.ones(velo.size) * 0.02
+
+def test_batch_vs_kinabs():
+    specs = [FakeSpec(voff=-100.+20*ii, dv=2.5+0.1*ii, seed=ii) for ii in range(5)]
+    vmnx = (-200., 200.)*u.km/u.s
+    # Batch, in two chunks
+    kin_tab = xkb.batch_fill_kin(specs, vmnx, chunksize=3)
+    assert len(kin_tab) == 5
+    assert kin_tab.colnames == xkab.KinAbs.keys
+    # One at a time
+    for ii, spec in enumerate(specs):
+        kin = xkab.KinAbs(1548.195, vmnx)
+        kin.fill_kin(spec)
+        for key in ['Dv', 'fedg', 'fmm', 'X_fcover', 'zero_pk']:
+            np.testing.assert_allclose(kin_tab[key][ii],
+                u.Quantity(kin[key]).value, rtol=1e-5)
+
+def test_tau_cache():
+    spec = FakeSpec()
+    kin = xkab.KinAbs(1548.195, (-200., 200.)*u.km/u.s)
+    kin.mk_pix_stau(spec)
+    cumtau = np.cumsum(kin.stau) / np.sum(kin.stau)
+    for per in [0.05, 0.1, 0.5, 0.95]:
+        assert kin.per_pix(per) == np.where(cumtau > per)[0][0]
+    # Vectorized
+    pers = np.array([0.05, 0.5])
+    assert np.all(kin.per_pix(pers) == [kin.per_pix(per) for per in pers])
+    assert kin.tau_cache['imx'] == np.argmax(kin.stau)
+
+def test_boot_kin():
+    spec = FakeSpec()
+    kin = xkab.KinAbs(1548.195, (-200., 200.)*u.km/u.s)
+    kin.fill_kin(spec, nboot=200, seed=1234, max_mem=2**16)
+    assert kin.kin_err['delta_v'][0] > 0.
+    assert kin.kin_err['delta_v'][1] > 0.
+    assert kin.kin_err['Dv'][1] >= 0.
+    assert 'flg' not in kin.kin_err
+    # Keywords for the other measurements are not passed to boot_kin
+    kin.fill_kin(spec, nboot=20, seed=1234, get_stau=True, do_orig_kin=False)
+    assert kin.kin_err['delta_v'][0] > 0.
@@ -20,6 +20,7 @@ from astropy.units import Quantity
 from xastropy.xutils import xdebug as xdb
 
 # def stod1 :: Input one RA/DEC pair as strings and return RA/DEC in decimal degrees
+# def stod_arrays :: Input arrays of RA/DEC strings and return RA/DEC in decimal degrees
 # def to_coord :: Input RA/DEC in one of several formats and return SkyCoord
 
 try:
@@ -80,6 +81,42 @@ def stod1(rads):
 
     return rad*u.degree, decd*u.degree
 
+#### ###############################
+#  Vectorized version of stod1 for columns of strings
+def _sexa_split(strs):
+    '''Split sexagesimal strings (colon or space delimited) into 3 floats
+    Missing seconds are taken as 0
+    '''
+    strs = np.char.strip(np.char.replace(np.asarray(strs).astype('U'), ':', ' '))
+    part1 = np.char.partition(strs, ' ')
+    part2 = np.char.partition(np.char.lstrip(part1[..., 2]), ' ')
+    third = np.char.strip(part2[..., 2])
+    third = np.where(third == '', '0', third)
+    return (part1[..., 0].astype(float), part2[..., 0].astype(float),
+            third.astype(float), np.char.startswith(part1[..., 0], '-'))
+
+def stod_arrays(ras, decs):
+    '''
+    Input arrays of RA/DEC as sexagesimal strings and return
+    RA/DEC in decimal degrees
+
+    Parameters:
+    ----------
+    ras, decs: ndarray or Column of str
+      RA (hours) and DEC (deg), colon or space delimited
+      e.g. '11:23:21.23', '+23 11 45.0'
+
+    Returns:
+    ----------
+    rad, decd: Quantity arrays (deg)
+    '''
+    rh, rm, rs, _ = _sexa_split(ras)
+    dd, dm, ds, neg = _sexa_split(decs)
+    rad = (360./24.)*(rh + rm/60. + rs/3600.)
+    decd = np.abs(dd) + dm/60. + ds/3600.
+    decd = np.where(neg, -1.*decd, decd)
+    return rad*u.degree, decd*u.degree
+
 #### ###############################
 #  Decimal degress or SkyCoord to string
 def dtos1(irad, fmt=0):
@@ -134,14 +171,13 @@ def stod_table(table):
         if card not in table.dtype.names:
             table.add_column( Column( np.zeros(len(table)), name=card, unit=u.degree) )
 
-    # Loop on rows
-    for k,row in enumerate(table):
-        try:
-            rad, decd = stod1( (row['RAS'], row['DECS']) )
-        except KeyError:
-            rad, decd = stod1( (row['RA'], row['DEC']) )
-        table['RA'][k] = rad
-        table['DEC'][k] = decd
+    # All rows at once
+    if 'RAS' in table.dtype.names:
+        rad, decd = stod_arrays(table['RAS'], table['DECS'])
+    else:
+        rad, decd = stod_arrays(table['RA'], table['DEC'])
+    table['RA'] = rad
+    table['DEC'] = decd
 
 #### ###############################
 #  String to decimal degress
@@ -0,0 +1,166 @@
+'''
+#;+
+#; NAME:
+#; skyindex
+#;    Version 1.0
+#;
+#; PURPOSE:
+#;   Spatial index of sky positions for cross-matching and cone searches
+#;     18-Oct-2016
+#;-
+#;------------------------------------------------------------------------------
+'''
+
+# Import libraries
+import numpy as np
+
+from scipy.spatial import cKDTree
+
+from astropy import units as u
+from astropy.units import Quantity
+
+from xastropy.xutils import files as xxf
+
+
+def radec_to_xyz(ra, dec):
+    ''' Unit vectors of RA/DEC in decimal degrees
+
+    Returns
+    -------
+    xyz : ndarray (..., 3)
+    '''
+    ra = np.radians(np.asarray(ra, dtype=float))
+    dec = np.radians(np.asarray(dec, dtype=float))
+    cosd = np.cos(dec)
+    return np.stack([cosd*np.cos(ra), cosd*np.sin(ra), np.sin(dec)], axis=-1)
+
+
+def to_deg(ang, unit=u.arcsec):
+    ''' Angle in degrees;  unit is assumed for floats
+    '''
+    if isinstance(ang, Quantity):
+        return ang.to(u.deg).value
+    return (ang*unit).to(u.deg).value
+
+
+def chord(radius):
+    ''' Chord length on the unit sphere for an angle in degrees
+    '''
+    return 2*np.sin(np.radians(radius)/2.)
+
+
+def chord_to_deg(dist):
+    ''' Angle in degrees for a chord length on the unit sphere
+    '''
+    return np.degrees(2*np.arcsin(np.minimum(np.asarray(dist)/2., 1.)))
+
+
+class SkyIndex(object):
+    '''KD-tree on the unit vectors of a set of sky positions
+
+    Handles RA wrap-around and the poles.
+
+    Parameters:
+    ----------
+    ra, dec: ndarray or Quantity
+      Decimal degrees if not Quantity
+    '''
+    def __init__(self, ra, dec):
+        self.ra = to_deg(ra, unit=u.deg)
+        self.dec = to_deg(dec, unit=u.deg)
+        self._tree = cKDTree(radec_to_xyz(self.ra, self.dec))
+
+    @classmethod
+    def from_cache(cls, ra, dec, key, stamp):
+        ''' Load an index from the binary cache or build (and save) it
+
+        Parameters:
+        ----------
+        ra, dec: ndarray
+        key: str
+          Name of the cache, e.g. from xutils.files.cache_key
+        stamp: tuple
+          Identifies the source catalog, e.g. from xutils.files.file_stamp
+        '''
+        slf = xxf.load_cache(key, stamp)
+        if slf is None:
+            slf = cls(ra, dec)
+            xxf.save_cache(key, stamp, slf)
+        return slf
+
+    def __len__(self):
+        return len(self.ra)
+
+    def match(self, ra, dec, radius=1.*u.arcsec):
+        ''' Nearest entry to each input position, within radius
+
+        Parameters:
+        ----------
+        ra, dec: float, ndarray or Quantity
+          Decimal degrees if not Quantity
+        radius: Quantity or float, optional
+          arcsec if float
+
+        Returns:
+        ----------
+        idx: int or ndarray
+          Index of the match;  -1 if none within radius
+        sep: float or ndarray
+          Separation in arcsec;  inf if no match
+        '''
+        xyz = radec_to_xyz(to_deg(ra, unit=u.deg), to_deg(dec, unit=u.deg))
+        dist, idx = self._tree.query(xyz, k=1,
+            distance_upper_bound=chord(to_deg(radius))*(1+1e-12))
+        miss = ~np.isfinite(dist)
+        idx = np.where(miss, -1, idx)
+        sep = np.where(miss, np.inf, chord_to_deg(np.where(miss, 0., dist))*3600.)
+        if np.ndim(idx) == 0:
+            return int(idx), float(sep)
+        return idx, sep
+
+    def count(self, ra, dec, radius):
+        ''' Number of entries within radius of each input position
+
+        Parameters:
+        ----------
+        ra, dec: float, ndarray or Quantity
+          Decimal degrees if not Quantity
+        radius: Quantity or float
+          arcsec if float
+
+        Returns:
+        ----------
+        nmatch: int or ndarray
+        '''
+        xyz = radec_to_xyz(to_deg(ra, unit=u.deg), to_deg(dec, unit=u.deg))
+        nmatch = self._tree.query_ball_point(xyz, chord(to_deg(radius))*(1+1e-12),
+                                             return_length=True)
+        if np.ndim(nmatch) == 0:
+            return int(nmatch)
+        return np.asarray(nmatch, dtype=int)
+
+    def cone(self, ra, dec, radius):
+        ''' All entries within radius of a position, sorted by separation
+
+        Parameters:
+        ----------
+        ra, dec: float or Quantity
+          Decimal degrees if not Quantity
+        radius: Quantity or float
+          arcsec if float
+
+        Returns:
+        ----------
+        idx: ndarray of int
+        sep: ndarray
+          Separations in arcsec
+        '''
+        xyz = radec_to_xyz(to_deg(ra, unit=u.deg), to_deg(dec, unit=u.deg))
+        idx = np.array(self._tree.query_ball_point(xyz, chord(to_deg(radius))*(1+1e-12)),
+                       dtype=int)
+        sep = chord_to_deg(np.sqrt(np.sum((self._tree.data[idx]-xyz)**2, axis=-1)))*3600.
+        srt = np.argsort(sep)
+        return idx[srt], sep[srt]
+
+    def __repr__(self):
+        return '[{:s}: nobj={:d}]'.format(self.__class__.__name__, len(self))
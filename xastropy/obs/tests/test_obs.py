@@ -24,6 +24,14 @@ def test_stod():
 	np.testing.assert_allclose(radec[0].value, 157.91195833333336)
 	assert radec[0].unit == u.deg
 
+def test_stod_arrays():
+	ras = np.array(['10:31:38.87', '10 31 38.87', '00:00:00'])
+	decs = np.array(['+25:59:02.3', '-00 30 00.0', '-00:00:36'])
+	ra, dec = x_r.stod_arrays(ras, decs)
+	np.testing.assert_allclose(ra.value, [157.91195833333336]*2+[0.])
+	np.testing.assert_allclose(dec.value, [25.9839722222, -0.5, -0.01])
+	assert ra.unit == u.deg
+
 def test_tocoord():
 	from astropy.coordinates import SkyCoord
 	radec = x_r.stod1('J103138.87+255902.3')
@@ -0,0 +1,44 @@
+# Module to run tests on the sky index
+
+import numpy as np
+import pytest
+
+from astropy import units as u
+
+from xastropy.obs.skyindex import SkyIndex
+
+
+def test_match():
+    ra = np.array([0.0001, 359.9999, 10., 180., 45.])
+    dec = np.array([0., 0., -30., 89.9999, 20.])
+    sidx = SkyIndex(ra, dec)
+    # Wrap-around in RA
+    idx, sep = sidx.match(0., 0., radius=1.*u.arcsec)
+    assert idx in [0, 1]
+    np.testing.assert_allclose(sep, 0.36, rtol=1e-3)
+    # Batch
+    idx, sep = sidx.match([10., 45.0001, 100.], [-30., 20., 0.], radius=1.*u.arcsec)
+    np.testing.assert_array_equal(idx, [2, 4, -1])
+    assert np.isinf(sep[2])
+    # Pole
+    idx, sep = sidx.match(0., 89.9999, radius=1.*u.arcsec)
+    assert idx == 3
+
+
+def test_cone():
+    ra = np.array([0.0001, 359.9999, 10., 180., 0.])
+    dec = np.array([0., 0., -30., 89.9999, 0.0002])
+    sidx = SkyIndex(ra, dec)
+    idx, sep = sidx.cone(0., 0., 1.*u.arcsec)
+    np.testing.assert_array_equal(np.sort(idx[:2]), [0, 1])
+    assert idx[2] == 4
+    assert np.all(np.diff(sep) >= 0.)
+
+
+def test_count():
+    ra = np.array([0.0001, 359.9999, 10., 180.])
+    dec = np.array([0., 0., -30., 89.9999])
+    sidx = SkyIndex(ra, dec)
+    np.testing.assert_array_equal(sidx.count([0., 10., 50.], [0., -30., 0.], 1.*u.arcsec),
+                                  [2, 1, 0])
+    assert sidx.count(0., 0., 0.1*u.arcsec) == 0
@@ -20,6 +20,8 @@ Modified by JXP
 
 import re
 
+import numpy as np
+
 #Define exceptions
 class RomanError(Exception): pass
 class OutOfRangeError(RomanError): pass
@@ -41,13 +43,8 @@ romanNumeralMap = (('M',  1000),
                    ('IV', 4),
                    ('I',  1))
 
-def toRoman(n):
-    """convert integer to Roman numeral"""
-    if not (0 < n < 5000):
-        raise OutOfRangeError, "number out of range (must be 1..4999)"
-    if int(n) != n:
-        raise NotIntegerError, "decimals can not be converted"
-
+def _toRoman(n):
+    """convert integer to Roman numeral, digit by digit"""
     result = ""
     for numeral, integer in romanNumeralMap:
         while n >= integer:
@@ -68,12 +65,12 @@ romanNumeralPattern = re.compile("""
     $                   # end of string
     """ ,re.VERBOSE)
 
-def fromRoman(s):
-    """convert Roman numeral to integer"""
+def _fromRoman(s):
+    """convert Roman numeral to integer, with the regex"""
     if not s:
-        raise InvalidRomanNumeralError, 'Input can not be blank'
+        raise InvalidRomanNumeralError('Input can not be blank')
     if not romanNumeralPattern.search(s):
-        raise InvalidRomanNumeralError, 'Invalid Roman numeral: %s' % s
+        raise InvalidRomanNumeralError('Invalid Roman numeral: %s' % s)
 
     result = 0
     index = 0
@@ -83,3 +80,60 @@ def fromRoman(s):
             index += len(numeral)
     return result
 
+#Lookup tables for the valid range (1..4999), filled on first use
+MAX_ROMAN = 4999
+_toRomanTable = []
+_toRomanNumpy = None  # _toRomanTable as an array, for toRomanArray
+_fromRomanTable = {}
+
+def _fillTables():
+    global _toRomanNumpy
+    del _toRomanTable[:]
+    _toRomanTable.extend([str('')] + [_toRoman(n) for n in range(1, MAX_ROMAN+1)])
+    _toRomanNumpy = np.array(_toRomanTable)
+    _fromRomanTable.update((numeral, n) for n, numeral in enumerate(_toRomanTable))
+    del _fromRomanTable['']
+
+def toRoman(n):
+    """convert integer to Roman numeral"""
+    if not _toRomanTable:
+        _fillTables()
+    if not (0 < n < 5000):
+        raise OutOfRangeError("number out of range (must be 1..4999)")
+    if int(n) != n:
+        raise NotIntegerError("decimals can not be converted")
+    return _toRomanTable[int(n)]
+
+def fromRoman(s):
+    """convert Roman numeral to integer"""
+    if not _toRomanTable:
+        _fillTables()
+    try:
+        return _fromRomanTable[s]
+    except KeyError:
+        if not s:
+            raise InvalidRomanNumeralError('Input can not be blank')
+        raise InvalidRomanNumeralError('Invalid Roman numeral: %s' % s)
+    except TypeError:  # Unhashable
+        raise InvalidRomanNumeralError('Invalid Roman numeral: %s' % s)
+
+def toRomanArray(n):
+    """convert an array of integers to an array of Roman numerals"""
+    if not _toRomanTable:
+        _fillTables()
+    n = np.asarray(n)
+    if np.any((n <= 0) | (n >= 5000)):
+        raise OutOfRangeError("number out of range (must be 1..4999)")
+    if np.any(n.astype(int) != n):
+        raise NotIntegerError("decimals can not be converted")
+    return _toRomanNumpy[n.astype(int)]
+
+def fromRomanArray(s):
+    """convert an array of Roman numerals to an array of integers"""
+    s = np.asarray(s)
+    if s.size == 0:
+        return np.zeros(s.shape, dtype=int)
+    # Look up each unique numeral once
+    uniq, inv = np.unique(s.astype('U'), return_inverse=True)
+    vals = np.array([fromRoman(str(numeral)) for numeral in uniq], dtype=int)
+    return vals[inv].reshape(s.shape)
@@ -0,0 +1,45 @@
+# Module to run tests on Roman numeral conversions
+
+### TEST_UNICODE_LITERALS
+
+import numpy as np
+import timeit
+import pytest
+
+from xastropy.outils import roman
+
+
+def test_roundtrip():
+    for n in range(1, 5000):
+        numeral = roman.toRoman(n)
+        assert numeral == roman._toRoman(n)
+        assert roman.fromRoman(numeral) == n
+    with pytest.raises(roman.OutOfRangeError):
+        roman.toRoman(5000)
+    with pytest.raises(roman.NotIntegerError):
+        roman.toRoman(1.5)
+    for bad in ['', 'IIII', 'VX', 'Si']:
+        with pytest.raises(roman.InvalidRomanNumeralError):
+            roman.fromRoman(bad)
+
+
+def test_arrays():
+    n = np.array([[1, 4, 9], [14, 40, 1999]])
+    numerals = roman.toRomanArray(n)
+    assert numerals[1, 2] == 'MCMXCIX'
+    np.testing.assert_array_equal(roman.fromRomanArray(numerals), n)
+    with pytest.raises(roman.InvalidRomanNumeralError):
+        roman.fromRomanArray(['II', 'IIII'])
+
+
+def benchmark():
+    """ Time the lookup tables against the regex parser
+    Not collected by pytest;  run by hand
+    """
+    numerals = [roman._toRoman(n) for n in range(1, 40)]
+    roman.fromRoman('I')
+    t_table = min(timeit.repeat(lambda: [roman.fromRoman(s) for s in numerals],
+                                number=200, repeat=3))
+    t_regex = min(timeit.repeat(lambda: [roman._fromRoman(s) for s in numerals],
+                                number=200, repeat=3))
+    print('fromRoman: table {:g}s, regex {:g}s'.format(t_table, t_regex))
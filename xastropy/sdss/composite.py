@@ -0,0 +1,272 @@
+'''
+#;+
+#; NAME:
+#; sdss.composite
+#;    Version 1.0
+#;
+#; PURPOSE:
+#;   Streaming rest-frame composites of SDSS quasar spectra
+#;     18-Oct-2016
+#;-
+#;------------------------------------------------------------------------------
+'''
+
+# Import libraries
+import numpy as np
+import os, shutil, tempfile
+
+from astropy.table import Table, Column
+from astropy import units as u
+
+from xastropy.sdss import spectra as sdss_spec
+
+
+# Number of values in each block of the median
+MEDIAN_BLOCK = 2**22
+
+# CDF of Poisson(1), for the bootstrap multiplicities
+_POISSON1_CDF = np.cumsum([np.exp(-1.)/np.prod(np.arange(1., kk+1)) for kk in range(20)])
+
+
+def _nanstat(func, arr, axis=0):
+    '''np.nanmedian, np.nanstd, ... without warnings where all are NaN
+    '''
+    import warnings
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        return func(arr, axis=axis)
+
+
+def boot_weights(seed, iboot, ispec):
+    '''Poisson(1) bootstrap multiplicities of spectra
+
+    Each multiplicity is a hash of (seed, iboot, ispec), so any subset
+    can be generated on its own without holding the (nboot, nspec) matrix.
+
+    Parameters:
+    ----------
+    seed: int
+    iboot, ispec: int or ndarray
+      Bootstrap realization and spectrum indices;  broadcast together
+
+    Returns:
+    ----------
+    weights: ndarray of float
+    '''
+    with np.errstate(over='ignore'):
+        key = _splitmix(np.uint64(seed) ^ _splitmix(np.asarray(iboot, dtype=np.uint64)))
+        bits = _splitmix(key + np.asarray(ispec, dtype=np.uint64))
+    uni = (bits >> np.uint64(11)).astype(float) * 2.**-53
+    return np.searchsorted(_POISSON1_CDF, uni, side='right').astype(float)
+
+
+def _splitmix(x):
+    '''splitmix64 mixing of unsigned 64-bit integers
+    '''
+    x = x + np.uint64(0x9E3779B97F4A7C15)
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+def _wmedian(srt, order, weights):
+    '''Median of each column with integer weights of the rows
+
+    Parameters:
+    ----------
+    srt: ndarray (nspec, npix)
+      Sorted along axis 0, NaN last
+    order: ndarray (nspec, npix)
+      Argsort that gave srt
+    weights: ndarray (nspec)
+    '''
+    wsrt = np.where(np.isnan(srt), 0., weights[order])
+    cumw = np.cumsum(wsrt, axis=0)
+    tot = cumw[-1]
+    lo = np.argmax(cumw > np.floor((tot-1)/2.), axis=0)
+    hi = np.argmax(cumw > np.floor(tot/2.), axis=0)
+    cols = np.arange(srt.shape[1])
+    return np.where(tot > 0, 0.5*(srt[lo, cols] + srt[hi, cols]), np.nan)
+
+
+def to_rest(loglam, flux, ivar, zem, rest_loglam):
+    '''Shift a chunk of spectra on a uniform log-lambda grid to the rest frame
+
+    Vectorized linear interpolation;  pixels beyond the spectrum or next
+    to a masked pixel get ivar=0
+
+    Parameters:
+    ----------
+    loglam: ndarray (npix)
+      Uniform observed-frame grid
+    flux, ivar: ndarray (nspec, npix)
+    zem: ndarray (nspec)
+    rest_loglam: ndarray (nrest)
+
+    Returns:
+    ----------
+    rflux, rivar: ndarray (nspec, nrest)
+    '''
+    dloglam = loglam[1] - loglam[0]
+    pos = (rest_loglam[None, :] + np.log10(1.+np.asarray(zem))[:, None] - loglam[0]) / dloglam
+    i0 = np.floor(pos).astype(int)
+    frac = pos - i0
+    inside = (i0 >= 0) & (i0 < loglam.size-1)
+    i0 = np.clip(i0, 0, loglam.size-2)
+    rows = np.arange(flux.shape[0])[:, None]
+    f0, f1 = flux[rows, i0], flux[rows, i0+1]
+    v0, v1 = ivar[rows, i0], ivar[rows, i0+1]
+    gd = inside & (v0 > 0.) & (v1 > 0.)
+    rflux = np.where(gd, f0*(1-frac) + f1*frac, 0.)
+    rivar = np.where(gd, v0*(1-frac) + v1*frac, 0.)
+    return rflux, rivar
+
+
+def normalize(rest_loglam, flux, ivar, norm_wv):
+    '''Normalize spectra by their median flux in a rest-frame window
+
+    Spectra with no good pixels (or a non-positive median) in the
+    window get ivar=0 everywhere
+
+    Returns:
+    ----------
+    flux, ivar: ndarray
+    norm: ndarray (nspec)
+    '''
+    win = ((rest_loglam >= np.log10(norm_wv[0])) &
+           (rest_loglam <= np.log10(norm_wv[1])))
+    if not np.any(win):
+        raise ValueError('composite.normalize: norm_wv is not in the rest-frame grid')
+    norm = _nanstat(np.nanmedian, np.where(ivar[:, win] > 0., flux[:, win], np.nan), axis=1)
+    good = np.isfinite(norm) & (norm > 0.)
+    norm = np.where(good, norm, 1.)
+    flux = flux / norm[:, None]
+    ivar = np.where(good[:, None], ivar * norm[:, None]**2, 0.)
+    return flux, ivar, np.where(good, norm, np.nan)
+
+
+def stack_cube(cube, zem, rest_loglam, norm_wv=(1450., 1470.), nboot=0,
+               chunksize=500, seed=None, workdir=None, median=True):
+    '''Mean, median and ivar-weighted composites from a spectral cube
+
+    Spectra are processed in chunks, so memory is bounded by chunksize.
+    The normalized rest-frame spectra are written to a temporary
+    memory-mapped array for the median, which is then taken over
+    blocks of pixels.  The bootstrap uses Poisson(1) multiplicities
+    (boot_weights), generated for each chunk or realization as needed.
+
+    Parameters:
+    ----------
+    cube: dict
+      From sdss.spectra.load_cube (loglam, flux, ivar)
+    zem: ndarray
+      Redshift of each spectrum
+    rest_loglam: ndarray
+      Rest-frame log10-lambda grid of the composite
+    norm_wv: tuple, optional
+      Rest-frame window (Ang) for the normalization
+    nboot: int, optional
+      Number of bootstrap resamplings of the spectra
+    chunksize: int, optional
+      Spectra per chunk
+    seed: int, optional
+    workdir: str, optional
+      Where the temporary rest-frame cube is written
+    median: bool, optional
+      Compute the median stack
+
+    Returns:
+    ----------
+    stack: Table
+      WAVE, NSPEC (good spectra per pixel), MEAN, WMEAN (ivar-weighted),
+      WIVAR, MEDIAN and, with nboot, the bootstrap errors SIG_*
+    '''
+    loglam = np.asarray(cube['loglam'])
+    flux, ivar = cube['flux'], cube['ivar']
+    zem = np.asarray(zem, dtype=float)
+    nspec, nrest = flux.shape[0], rest_loglam.size
+    if seed is None:
+        seed = np.random.randint(0, 2**31)
+    iboot = np.arange(nboot)
+    # Accumulators
+    nsum = np.zeros(nrest)
+    fsum = np.zeros(nrest)
+    wfsum = np.zeros(nrest)
+    wsum = np.zeros(nrest)
+    if nboot > 0:
+        bnsum = np.zeros((nboot, nrest))
+        bfsum = np.zeros((nboot, nrest))
+        bwfsum = np.zeros((nboot, nrest))
+        bwsum = np.zeros((nboot, nrest))
+    if median:
+        tmpdir = tempfile.mkdtemp(dir=workdir)
+        rest_flux = np.lib.format.open_memmap(os.path.join(tmpdir, 'rest_flux.npy'),
+            mode='w+', dtype=np.float32, shape=(nspec, nrest))
+
+    try:
+        # Stream the spectra
+        for i0 in range(0, nspec, chunksize):
+            i1 = min(i0+chunksize, nspec)
+            cflux, civar = to_rest(loglam, np.asarray(flux[i0:i1], dtype=float),
+                                   np.asarray(ivar[i0:i1], dtype=float),
+                                   zem[i0:i1], rest_loglam)
+            cflux, civar, _ = normalize(rest_loglam, cflux, civar, norm_wv)
+            gd = (civar > 0.).astype(float)
+            nsum += gd.sum(axis=0)
+            fsum += (gd*cflux).sum(axis=0)
+            wfsum += (civar*cflux).sum(axis=0)
+            wsum += civar.sum(axis=0)
+            if nboot > 0:
+                ccount = boot_weights(seed, iboot[:, None], np.arange(i0, i1)[None, :])
+                bnsum += ccount.dot(gd)
+                bfsum += ccount.dot(gd*cflux)
+                bwfsum += ccount.dot(civar*cflux)
+                bwsum += ccount.dot(civar)
+            if median:
+                rest_flux[i0:i1] = np.where(gd > 0., cflux, np.nan)
+
+        # Stacks
+        stack = Table()
+        stack['WAVE'] = Column(10.**rest_loglam, unit=u.AA)
+        stack['NSPEC'] = nsum.astype(int)
+        with np.errstate(all='ignore'):
+            stack['MEAN'] = np.where(nsum > 0, fsum/nsum, 0.)
+            stack['WMEAN'] = np.where(wsum > 0, wfsum/wsum, 0.)
+            stack['WIVAR'] = wsum
+            if nboot > 0:
+                stack['SIG_MEAN'] = _nanstat(np.nanstd,
+                    np.where(bnsum > 0, bfsum/bnsum, np.nan), axis=0)
+                stack['SIG_WMEAN'] = _nanstat(np.nanstd,
+                    np.where(bwsum > 0, bwfsum/bwsum, np.nan), axis=0)
+
+        # Median, by blocks of pixels
+        if median:
+            rest_flux.flush()
+            med = np.zeros(nrest)
+            sig_med = np.zeros(nrest)
+            nblock = max(1, MEDIAN_BLOCK // nspec)
+            for j0 in range(0, nrest, nblock):
+                j1 = min(j0+nblock, nrest)
+                block = np.asarray(rest_flux[:, j0:j1], dtype=float)
+                med[j0:j1] = _nanstat(np.nanmedian, block, axis=0)
+                if nboot > 0:
+                    order = np.argsort(block, axis=0)
+                    block = block[order, np.arange(block.shape[1])]
+                    bmed = np.array([_wmedian(block, order,
+                                              boot_weights(seed, ib, np.arange(nspec)))
+                                     for ib in range(nboot)])
+                    sig_med[j0:j1] = _nanstat(np.nanstd, bmed, axis=0)
+            stack['MEDIAN'] = np.where(np.isfinite(med), med, 0.)
+            if nboot > 0:
+                stack['SIG_MEDIAN'] = sig_med
+    finally:
+        if median:
+            del rest_flux
+            shutil.rmtree(tmpdir)
+    return stack
+
+
+def rest_grid(wvmin=1000., wvmax=3000., dloglam=1e-4):
+    '''Rest-frame log10-lambda grid for a composite
+    '''
+    return sdss_spec.loglam_grid(wvmin=wvmin, wvmax=wvmax, dloglam=dloglam)
@@ -56,16 +56,7 @@ class SdssQso(object):
         if self.database is None:
             raise IOError('SdssQso: Need to be linked to an SDSS Database')
         # Generate file name (DR4 is different)
-        pnm = '{0:04d}'.format(
-            self.database._data[self.database.index]['PLATE'])
-        #fnm = '{0:04d}'.format(
-        #    self.database._data[self.database.index]['FIBERID'])
-        fnm = '{0:03d}'.format(
-            self.database._data[self.database.index]['FIBERID'])
-        mjd = str(self.database._data[self.database.index]['MJD'])
-        sfil = self.database._datdir+pnm+'/1d/'+'spSpec-' 
-        # Finish
-        self._specfil = sfil+mjd+'-'+pnm+'-'+fnm+'.fit'  # Is usually gzipped
+        self._specfil = self.database.specfiles(self.database.index)  # Is usually gzipped
 
     def load_spec(self):
         '''Input the Spectrum
@@ -13,7 +13,7 @@
 
 # Import libraries
 import numpy as np
-import os
+import os, io, json
 
 from astropy.table import QTable, Column
 from astropy.coordinates import SkyCoord
@@ -21,8 +21,15 @@ from astropy import units as u
 from astropy.units import Quantity
 
 from xastropy.obs import radec as xor
+from xastropy.obs.skyindex import SkyIndex
+from xastropy.xutils import files as xxf
 from xastropy.xutils import xdebug as xdb
 
+try:
+    basestring
+except NameError:  # For Python 3
+    basestring = str
+
 class SdssQuasars(object):
     '''Class to handle a data release of SDSS quasars
 
@@ -50,7 +57,274 @@ class SdssQuasars(object):
         self._summf = self._path+self._version.lower()+'_qso.fits.gz'
         if self.verbose:
             print('SDSS_QUASAR: Using summary file {:s}'.format(self._summf))
-        self._data = QTable.read(self._summf)
+        # Uncompressed copy, memory-mapped;  columns are read on access
+        self._mmap, self._units = self.load_mmap()
+        self._columns = {}
+        self._table = None
+        self._sky_index = None
+        self._pmf_index = None
+
+    def mmap_files(self):
+        '''Files of the uncompressed copy of the summary file
+        Next to the summary file if writeable, else in the xastropy cache
+        '''
+        root = self._summf.replace('.fits.gz', '').replace('.fits', '')
+        if not os.access(os.path.dirname(os.path.abspath(self._summf)), os.W_OK):
+            root = os.path.join(xxf.cache_dir(),
+                xxf.cache_key(os.path.abspath(self._summf), 'mmap'))
+        return root+'.npy', root+'_npy.json'
+
+    def load_mmap(self):
+        '''Memory-map the uncompressed copy of the summary file
+        Generated from the summary file the first time (or when it changes);
+        the summary file must not have masked values
+
+        Returns:
+        ----------
+        mmap: structured ndarray (memory-mapped)
+        units: dict
+          Unit string of each column with one
+        '''
+        npy_fil, meta_fil = self.mmap_files()
+        stamp = list(xxf.file_stamp(self._summf)[1:])
+        try:
+            with io.open(meta_fil, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            if meta['stamp'] != stamp:
+                raise IOError('Stale')
+            return np.load(npy_fil, mmap_mode='r'), meta['units']
+        except (IOError, OSError, ValueError, KeyError):
+            pass
+        # Generate
+        if self.verbose:
+            print('SDSS_QUASAR: Writing uncompressed copy {:s}'.format(npy_fil))
+        tab = QTable.read(self._summf)
+        # The .npy copy cannot hold masks
+        masked = [key for key in tab.colnames if np.any(getattr(tab[key], 'mask', False))]
+        if len(masked) > 0:
+            raise ValueError('SDSS_QUASAR: Masked values in {:s} of {:s}'.format(
+                ', '.join(masked), self._summf))
+        units = dict((key, tab[key].unit.to_string()) for key in tab.colnames
+                     if getattr(tab[key], 'unit', None) is not None)
+        if not os.path.isdir(os.path.dirname(npy_fil)):
+            os.makedirs(os.path.dirname(npy_fil))
+        tmp_fil = npy_fil+'.{:d}.tmp.npy'.format(os.getpid())
+        np.save(tmp_fil, np.asarray(tab.as_array()))
+        os.rename(tmp_fil, npy_fil)
+        with io.open(meta_fil, 'w', encoding='utf-8') as f:
+            f.write(json.dumps(dict(stamp=stamp, units=units)))
+        return np.load(npy_fil, mmap_mode='r'), units
+
+    @property
+    def colnames(self):
+        return list(self._mmap.dtype.names)
+
+    def __len__(self):
+        return len(self._mmap)
+
+    def column(self, k):
+        '''One column of the summary table, read on first access
+        Quantity if the column has units
+        '''
+        if k not in self._columns:
+            col = np.array(self._mmap[k])
+            if col.dtype.kind == 'S':
+                col = np.char.decode(col, 'utf-8')
+            if k in self._units:
+                col = col * u.Unit(self._units[k])
+            self._columns[k] = col
+        return self._columns[k]
+
+    def rows(self, idx):
+        '''QTable of a subset of the rows of the summary table
+        '''
+        return self._with_units(QTable(np.array(self._mmap[idx], ndmin=1)))
+
+    def _with_units(self, tab):
+        for key, unit in self._units.items():
+            tab[key] = tab[key] * u.Unit(unit)
+        return tab
+
+    @property
+    def _data(self):
+        '''Full summary table (QTable), generated on first access
+        '''
+        if self._table is None:
+            self._table = self._with_units(QTable(np.array(self._mmap)))
+        return self._table
+
+    @staticmethod
+    def pmf_key(plate, mjd, fiber):
+        '''Integer key(s) of (PLATE, MJD, FIBERID);  sorts by PLATE, FIBERID, MJD
+        '''
+        pf = np.asarray(plate, dtype=np.int64)*1000 + np.asarray(fiber, dtype=np.int64)
+        return pf*100000 + np.asarray(mjd, dtype=np.int64)
+
+    @property
+    def pmf_index(self):
+        '''Sorted (PLATE, MJD, FIBERID) keys and their rows
+        Built on first use
+        '''
+        if self._pmf_index is None:
+            keys = self.pmf_key(self.column('PLATE'), self.column('MJD'),
+                                self.column('FIBERID'))
+            srt = np.argsort(keys, kind='mergesort')
+            self._pmf_index = (keys[srt], srt)
+        return self._pmf_index
+
+    def plate_rows(self, plate, fiber, mjd=None):
+        '''Rows of the quasars for arrays of PLATE, FIBERID (and MJD)
+
+        Parameters:
+        ----------
+        plate, fiber: int or ndarray
+        mjd: int or ndarray, optional
+          Required where a plate was observed on several nights
+
+        Returns:
+        ----------
+        rows: int or ndarray
+          -1 where there is no match
+        '''
+        keys, srt = self.pmf_index
+        plate, fiber = np.broadcast_arrays(plate, fiber)
+        if mjd is not None:
+            qkey = self.pmf_key(plate, np.broadcast_to(mjd, plate.shape), fiber)
+            ii = np.minimum(np.searchsorted(keys, qkey), len(keys)-1)
+            rows = np.where(keys[ii] == qkey, srt[ii], -1)
+        else:
+            # Range of MJD for each PLATE, FIBERID
+            qkey = self.pmf_key(plate, 0, fiber)
+            i0 = np.searchsorted(keys, qkey)
+            i1 = np.searchsorted(keys, qkey+100000)
+            if np.any(i1-i0 > 1):
+                raise ValueError('SDSS_QUASAR: Multiple MJD for a PLATE, FIBERID;  specify mjd')
+            rows = np.where(i1 > i0, srt[np.minimum(i0, len(keys)-1)], -1)
+        if rows.ndim == 0:
+            return int(rows)
+        return rows
+
+    def specfiles(self, rows):
+        '''spSpec files of rows of the summary table (DR7 layout)
+        Usually gzipped
+
+        Parameters:
+        ----------
+        rows: int, ndarray or bool mask
+
+        Returns:
+        ----------
+        specfil: str or ndarray of str
+        '''
+        plate = np.char.zfill(np.asarray(self.column('PLATE')[rows]).astype(str), 4)
+        fiber = np.char.zfill(np.asarray(self.column('FIBERID')[rows]).astype(str), 3)
+        mjd = np.asarray(self.column('MJD')[rows]).astype(str)
+        specfil = self._datdir
+        for part in [plate, '/1d/spSpec-', mjd, '-', plate, '-', fiber, '.fit']:
+            specfil = np.char.add(specfil, part)
+        if np.ndim(specfil) == 0:
+            return str(specfil)
+        return specfil
+
+    def load_spectra(self, sel, outroot, loglam=None, nthread=8, clobber=False):
+        '''Read the spectra of a selection of quasars into a memory-mapped cube
+
+        Parameters:
+        ----------
+        sel: ndarray
+          Row indices or bool mask of the summary table
+        outroot: str
+          Root of the cube files (see sdss.spectra.cube_files)
+        loglam: ndarray, optional
+          Common log10-lambda grid [sdss.spectra.loglam_grid()]
+        nthread: int, optional
+          Threads reading the spectra
+
+        Returns:
+        ----------
+        cube: dict
+          loglam, flux (nspec, npix), ivar (nspec, npix), rows, specfiles
+        '''
+        from xastropy.sdss import spectra as sdss_spec
+        rows = np.arange(len(self))[sel]
+        return sdss_spec.load_cube(self.specfiles(rows), outroot, loglam=loglam,
+                                   rows=rows, nthread=nthread, clobber=clobber,
+                                   verbose=self.verbose)
+
+    def composite(self, sel, outroot, rest_loglam=None, loglam=None, nthread=8,
+                  **kwargs):
+        '''Rest-frame composite of a selection of quasars
+
+        Parameters:
+        ----------
+        sel: ndarray
+          Row indices or bool mask of the summary table
+        outroot: str
+          Root of the spectral cube files (see load_spectra)
+        rest_loglam: ndarray, optional
+          Rest-frame grid [sdss.composite.rest_grid()]
+        loglam: ndarray, optional
+          Observed-frame grid of the cube
+        **kwargs:
+          Passed to sdss.composite.stack_cube (norm_wv, nboot, chunksize, ...)
+
+        Returns:
+        ----------
+        stack: Table
+        '''
+        from xastropy.sdss import composite as sdss_comp
+        if rest_loglam is None:
+            rest_loglam = sdss_comp.rest_grid()
+        cube = self.load_spectra(sel, outroot, loglam=loglam, nthread=nthread)
+        zem = np.asarray(self.column('Z'))[cube['rows']]
+        return sdss_comp.stack_cube(cube, zem, rest_loglam, **kwargs)
+
+    @property
+    def sky_index(self):
+        '''SkyIndex of RAOBJ/DECOBJ
+        Built on first use and cached to disk next to the parsed files
+        '''
+        if self._sky_index is None:
+            self._sky_index = SkyIndex.from_cache(
+                self.column('RAOBJ'), self.column('DECOBJ'),
+                xxf.cache_key(os.path.abspath(self._summf), 'sky_index'),
+                xxf.file_stamp(self._summf))
+        return self._sky_index
+
+    def match_coord(self, coord, radius=1.*u.arcsec):
+        '''Cross-match coordinates against the quasars
+
+        Parameters:
+        ----------
+        coord: SkyCoord (scalar or array)
+        radius: Quantity, optional
+
+        Returns:
+        ----------
+        idx: int or ndarray
+          Row of the nearest quasar within radius;  -1 if none
+        sep: float or ndarray
+          Separation (arcsec)
+        '''
+        return self.sky_index.match(coord.ra.deg, coord.dec.deg, radius=radius)
+
+    def cone_search(self, coord, radius):
+        '''Quasars within radius of a coordinate
+
+        Parameters:
+        ----------
+        coord: SkyCoord
+        radius: Quantity
+
+        Returns:
+        ----------
+        rows: QTable
+          Sorted by separation, with a SEP column (arcsec)
+        '''
+        idx, sep = self.sky_index.cone(coord.ra.deg, coord.dec.deg, radius)
+        rows = self.rows(idx)
+        rows['SEP'] = sep*u.arcsec
+        return rows
 
 
     #### ###############################
@@ -61,7 +335,7 @@ class SdssQuasars(object):
         Parameters:
         ----------
         inp: tuple or str
-          tuple: (PLATE,FIBER)
+          tuple: (PLATE,FIBER) or (PLATE,MJD,FIBER)
           string (JXXXXXX.X+XXXXXX.X format)
 
         Returns:
@@ -71,14 +345,17 @@ class SdssQuasars(object):
         '''
         # Branch on inp
         if isinstance(inp,tuple):
-            mt = np.where( (self._data['PLATE']==inp[0]) & 
-                (self._data['FIBERID']==inp[1]))[0]
+            if len(inp) == 3:
+                idx = self.plate_rows(inp[0], inp[2], mjd=inp[1])
+            else:
+                idx = self.plate_rows(inp[0], inp[1])
+            mt = np.array([idx]) if idx >= 0 else np.array([], dtype=int)
         elif isinstance(inp,basestring):
             # Get RA/DEC
             radec = xor.stod1(inp)
-            # Match
-            mt = np.where( (np.abs(self._data['RAOBJ']-radec[0].value)<5e-3) & 
-                (np.abs(self._data['DECOBJ']-radec[1].value)<5e-3))[0]
+            # Match (nearest within the precision of the name)
+            idx, sep = self.sky_index.match(radec[0], radec[1], radius=5e-3*u.deg)
+            mt = np.array([idx]) if idx >= 0 else np.array([], dtype=int)
         else:
             raise ValueError('SDSS_QUASAR: Bad input type')
 
@@ -87,14 +364,14 @@ class SdssQuasars(object):
             if isinstance(inp,tuple):
                 if self.verbose:
                     print('Plate={:d}, FIBERID={:d} not found in SDSS-{:s}'.format(
-                        inp[0],inp[1],self._version))
+                        inp[0],inp[-1],self._version))
             elif isinstance(inp,basestring):
                 if self.verbose:
                     print('Quasar {:s} not found in SDSS-{:s}'.format(inp,self._version))
             return
         elif len(mt) == 1:
             self.index = mt[0] # Useful for SdssQso class
-            return self._data[mt]
+            return self.rows(mt)
         else:
             raise ValueError('Not expecting this')
 
@@ -117,13 +394,18 @@ class SdssQuasars(object):
 
         #####
     def __getattr__(self, k):
-        """ Passback a SdssQso object
-        k: Input to get_qso
+        """ Passback a column of the summary table (loaded on first access)
+        k: Column name (case-insensitive)
         """
+        if k.startswith('_'):
+            raise AttributeError(k)
         try:
-            return self._data[k]
-        except KeyError:
-            return self._data[k.upper()]
+            return self.column(k)
+        except ValueError:
+            try:
+                return self.column(k.upper())
+            except ValueError:
+                raise AttributeError(k)
 
     def __repr__(self):
         ''' For printing
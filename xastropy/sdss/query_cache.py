@@ -0,0 +1,338 @@
+'''
+#;+
+#; NAME:
+#; sdss.query_cache
+#;    Version 1.0
+#;
+#; PURPOSE:
+#;   On-disk cache of SDSS region queries and spectra, with
+#;     pluggable (remote or local) backends
+#;     18-Oct-2016
+#;-
+#;------------------------------------------------------------------------------
+'''
+
+# Import libraries
+import numpy as np
+import os, io, json
+
+from astropy.io import fits
+from astropy.table import Table, vstack
+from astropy import units as u
+
+from xastropy.obs.skyindex import SkyIndex, radec_to_xyz, to_deg, chord_to_deg
+from xastropy.xutils import files as xxf
+
+
+# Columns identifying unique rows, in order of preference
+ID_COLUMNS = ('specobjid', 'objid')
+
+# Default caches, keyed by directory
+_DEFAULT = {}
+
+
+def _makedirs(fil):
+    d = os.path.dirname(fil)
+    if not os.path.isdir(d):
+        os.makedirs(d)
+
+
+def spec_name(row):
+    '''Name of the spectrum file of a row of a spectroscopic query
+    '''
+    return 'spec-{:04d}-{:05d}-{:04d}.fits'.format(int(row['plate']),
+        int(row['mjd']), int(row['fiberID']))
+
+
+class SdssBackend(object):
+    '''Backend running the queries on the SDSS servers (astroquery)
+
+    Parameters:
+    ----------
+    timeout: float, optional
+      Timeout limit for connection with SDSS (s)
+    '''
+    def __init__(self, timeout=600.):
+        self.timeout = timeout
+
+    def query_region(self, ra, dec, radius, fields=None):
+        '''Spectroscopic objects around a position
+
+        Parameters:
+        ----------
+        ra, dec: float
+          Decimal degrees
+        radius: float
+          Decimal degrees
+        fields: list of str, optional
+          PhotoObj fields;  SpecObj data if None
+
+        Returns:
+        ----------
+        tbl: Table or None
+        '''
+        from astroquery.sdss import SDSS
+        from astropy.coordinates import SkyCoord
+        coord = SkyCoord(ra=ra*u.deg, dec=dec*u.deg)
+        if fields is None:
+            return SDSS.query_region(coord, spectro=True, radius=radius*u.deg,
+                                     timeout=self.timeout)
+        return SDSS.query_region(coord, spectro=True, radius=radius*u.deg,
+                                 timeout=self.timeout, photoobj_fields=list(fields))
+
+    def get_spectra(self, row):
+        '''List with the HDUList of the spectrum of a spectroscopic row
+        '''
+        from astroquery.sdss import SDSS
+        return SDSS.get_spectra(matches=Table(row), timeout=self.timeout)
+
+
+class LocalBackend(object):
+    '''Backend answering the queries from local files
+
+    Stands in for SdssBackend, e.g. offline or in tests.
+
+    Parameters:
+    ----------
+    phot_file: str
+      Table of the photometric (PhotoObj) data, with ra, dec
+    spec_file: str
+      Table of the spectroscopic (SpecObj) data, with ra, dec,
+      plate, mjd, fiberID
+    spec_dir: str, optional
+      Directory of the spectra, named as spec_name()
+    '''
+    def __init__(self, phot_file, spec_file, spec_dir=None):
+        self.phot = Table.read(phot_file)
+        self.spec = Table.read(spec_file)
+        self.spec_dir = spec_dir
+        self._phot_index = SkyIndex(self.phot['ra'], self.phot['dec'])
+        self._spec_index = SkyIndex(self.spec['ra'], self.spec['dec'])
+
+    def query_region(self, ra, dec, radius, fields=None):
+        '''As SdssBackend.query_region;  the rows are those within radius
+        '''
+        if fields is None:
+            idx, _ = self._spec_index.cone(ra, dec, radius*u.deg)
+            tbl = self.spec[np.sort(idx)]
+        else:
+            idx, _ = self._phot_index.cone(ra, dec, radius*u.deg)
+            tbl = self.phot[np.sort(idx)][list(fields)]
+        if len(tbl) == 0:
+            return None
+        return tbl
+
+    def get_spectra(self, row):
+        '''As SdssBackend.get_spectra
+        '''
+        if self.spec_dir is None:
+            raise IOError('LocalBackend: No directory of spectra')
+        return [fits.open(os.path.join(self.spec_dir, spec_name(row)))]
+
+
+class QueryCache(object):
+    '''Cache of SDSS region queries and spectra on disk
+
+    Queries are grouped by their fields.  The rows returned for a group
+    are merged into one table, and the regions already queried are
+    recorded.  A query inside one of these regions is answered from a
+    spatial index of the table;  the others are sent to the backend.
+
+    Parameters:
+    ----------
+    cache_dir: str, optional
+      [xutils.files.cache_dir()/sdss]
+    backend: object, optional
+      With query_region() and get_spectra() as SdssBackend [SdssBackend()]
+    '''
+    def __init__(self, cache_dir=None, backend=None):
+        if cache_dir is None:
+            cache_dir = os.path.join(xxf.cache_dir(), 'sdss')
+        if backend is None:
+            backend = SdssBackend()
+        self.cache_dir = cache_dir
+        self.backend = backend
+        self._catalogs = {}
+
+    def files(self, fields=None):
+        '''Files of a group of queries:  merged rows and queried regions
+        '''
+        if fields is None:
+            tag = 'spec'
+        else:
+            tag = 'phot_'+xxf.cache_key(*fields)[:12]
+        return dict(rows=os.path.join(self.cache_dir, tag+'_rows.fits'),
+                    regions=os.path.join(self.cache_dir, tag+'_regions.json'))
+
+    def regions(self, fields=None):
+        '''Regions already queried, as an array of (ra, dec, radius) in deg
+        '''
+        reg_file = self.files(fields)['regions']
+        if not os.path.isfile(reg_file):
+            return np.zeros((0, 3))
+        with io.open(reg_file, 'r', encoding='utf-8') as f:
+            return np.array(json.load(f)['regions'], dtype=float).reshape(-1, 3)
+
+    def catalog(self, fields=None):
+        '''Merged table of the rows of all of the queries;  None if empty
+
+        Returns:
+        ----------
+        tbl: Table
+        sindex: SkyIndex
+        '''
+        rows_file = self.files(fields)['rows']
+        if not os.path.isfile(rows_file):
+            return None, None
+        stamp = xxf.file_stamp(rows_file)
+        try:
+            mstamp, tbl, sindex = self._catalogs[rows_file]
+        except KeyError:
+            pass
+        else:
+            if mstamp == stamp:
+                return tbl, sindex
+        tbl = Table.read(rows_file)
+        sindex = SkyIndex.from_cache(tbl['ra'], tbl['dec'],
+            xxf.cache_key(stamp[0], 'sdss_query_cache'), stamp)
+        self._catalogs[rows_file] = (stamp, tbl, sindex)
+        return tbl, sindex
+
+    def covered(self, ra, dec, radius, fields=None):
+        '''Is the region inside one already queried?
+
+        Parameters:
+        ----------
+        ra, dec: ndarray
+          Decimal degrees
+        radius: float
+          Decimal degrees
+
+        Returns:
+        ----------
+        covered: ndarray of bool
+        '''
+        ra, dec = np.atleast_1d(ra), np.atleast_1d(dec)
+        regions = self.regions(fields)
+        if len(regions) == 0:
+            return np.zeros(ra.size, dtype=bool)
+        dist = np.sqrt(np.sum((radec_to_xyz(ra, dec)[:, None, :] -
+                               radec_to_xyz(regions[:, 0], regions[:, 1])[None, :, :])**2,
+                              axis=-1))
+        sep = chord_to_deg(dist)
+        return np.any(sep + radius <= regions[:, 2][None, :] + 1e-9, axis=1)
+
+    def fetch(self, radecs, radius, fields=None):
+        '''Query the backend for regions not yet covered
+
+        The new rows are merged with the cached ones and written once.
+
+        Parameters:
+        ----------
+        radecs: list of tuple
+          (ra, dec) of each region, in deg or Quantity
+        radius: Quantity or float
+          deg if float
+        fields: list of str, optional
+          PhotoObj fields;  SpecObj data if None
+
+        Returns:
+        ----------
+        nquery: int
+          Number of backend queries
+        '''
+        radius = to_deg(radius, unit=u.deg)
+        ra = np.array([to_deg(radec[0], unit=u.deg) for radec in radecs])
+        dec = np.array([to_deg(radec[1], unit=u.deg) for radec in radecs])
+        miss = np.where(~self.covered(ra, dec, radius, fields=fields))[0]
+        if len(miss) == 0:
+            return 0
+        # Query
+        tbl, _ = self.catalog(fields)
+        new_tbls = [] if tbl is None else [tbl]
+        regions = self.regions(fields).tolist()
+        for ii in miss:
+            print('QueryCache: Querying SDSS at ({:g},{:g})'.format(ra[ii], dec[ii]))
+            qtbl = self.backend.query_region(ra[ii], dec[ii], radius, fields=fields)
+            if qtbl is not None:
+                new_tbls.append(Table(qtbl, masked=False))
+            regions.append([ra[ii], dec[ii], radius])
+        # Merge
+        if len(new_tbls) > 0:
+            tbl = vstack(new_tbls, join_type='exact')
+            id_clms = [clm for clm in ID_COLUMNS if clm in tbl.colnames]
+            if len(id_clms) > 0:
+                _, uni = np.unique(np.array(tbl[id_clms[0]]), return_index=True)
+                tbl = tbl[np.sort(uni)]
+        # Write (rows before regions)
+        files = self.files(fields)
+        _makedirs(files['rows'])
+        if tbl is not None:
+            tmp = files['rows']+'.{:d}.fits'.format(os.getpid())
+            tbl.write(tmp, format='fits', overwrite=True)
+            os.rename(tmp, files['rows'])
+        tmp = files['regions']+'.{:d}'.format(os.getpid())
+        with io.open(tmp, 'w', encoding='utf-8') as f:
+            f.write(json.dumps(dict(regions=regions)))
+        os.rename(tmp, files['regions'])
+        return len(miss)
+
+    def query_regions(self, radecs, radius, fields=None):
+        '''Rows within radius of each position
+
+        Regions not yet covered are fetched from the backend in one pass.
+
+        Parameters:
+        ----------
+        radecs: list of tuple
+          (ra, dec) of each region, in deg or Quantity
+        radius: Quantity or float
+          deg if float
+        fields: list of str, optional
+          PhotoObj fields;  SpecObj data if None
+
+        Returns:
+        ----------
+        tbls: list of Table
+          Sorted by separation;  None if there are no rows
+        '''
+        self.fetch(radecs, radius, fields=fields)
+        tbl, sindex = self.catalog(fields)
+        radius = to_deg(radius, unit=u.deg)
+        tbls = []
+        for radec in radecs:
+            if tbl is None:
+                tbls.append(None)
+                continue
+            idx, _ = sindex.cone(radec[0], radec[1], radius*u.deg)
+            tbls.append(tbl[idx] if len(idx) > 0 else None)
+        return tbls
+
+    def query_region(self, ra, dec, radius, fields=None):
+        '''Rows within radius of one position;  see query_regions
+        '''
+        return self.query_regions([(ra, dec)], radius, fields=fields)[0]
+
+    def get_spectra(self, row):
+        '''List with the HDUList of the spectrum of a spectroscopic row
+
+        The spectrum is taken from the cache or written to it.
+        '''
+        spec_fil = os.path.join(self.cache_dir, 'spectra', spec_name(row))
+        if not os.path.isfile(spec_fil):
+            hdul = self.backend.get_spectra(row)[0]
+            _makedirs(spec_fil)
+            tmp = spec_fil+'.{:d}.fits'.format(os.getpid())
+            hdul.writeto(tmp)
+            os.rename(tmp, spec_fil)
+        return [fits.open(spec_fil)]
+
+
+def default_cache(cache_dir=None, timeout=600.):
+    '''QueryCache of the SDSS servers, shared within the process
+    '''
+    if cache_dir is None:
+        cache_dir = os.path.join(xxf.cache_dir(), 'sdss')
+    if cache_dir not in _DEFAULT:
+        _DEFAULT[cache_dir] = QueryCache(cache_dir, backend=SdssBackend(timeout=timeout))
+    return _DEFAULT[cache_dir]
@@ -0,0 +1,200 @@
+'''
+#;+
+#; NAME:
+#; sdss.spectra
+#;    Version 1.0
+#;
+#; PURPOSE:
+#;   Bulk loading of SDSS spectra onto a common log-lambda grid
+#;     18-Oct-2016
+#;-
+#;------------------------------------------------------------------------------
+'''
+
+# Import libraries
+import numpy as np
+import os, io, json
+
+from multiprocessing.pool import ThreadPool
+
+from astropy.io import fits
+
+from xastropy.xutils import files as xxf
+
+
+def loglam_grid(wvmin=3800., wvmax=9200., dloglam=1e-4):
+    '''Common log10-lambda grid;  SDSS pixels by default
+
+    Parameters:
+    ----------
+    wvmin, wvmax: float
+      Wavelength range (Ang)
+    dloglam: float, optional
+
+    Returns:
+    ----------
+    loglam: ndarray
+    '''
+    npix = int(np.round((np.log10(wvmax)-np.log10(wvmin))/dloglam)) + 1
+    return np.log10(wvmin) + dloglam*np.arange(npix)
+
+
+def read_spspec(specfil):
+    '''Read the flux and inverse variance of an spSpec file (DR7)
+
+    Parameters:
+    ----------
+    specfil: str
+      Gzipped version used if the file is missing
+
+    Returns:
+    ----------
+    loglam, flux, ivar: ndarray
+    '''
+    if (not os.path.isfile(specfil)) and os.path.isfile(specfil+'.gz'):
+        specfil = specfil+'.gz'
+    with fits.open(specfil, memmap=False) as hdul:
+        head = hdul[0].header
+        data = hdul[0].data
+        flux = np.array(data[0], dtype=float)
+        sig = np.array(data[2], dtype=float)
+    loglam = head['COEFF0'] + head['COEFF1']*np.arange(flux.size)
+    ivar = np.zeros_like(sig)
+    gd = sig > 0.
+    ivar[gd] = 1./sig[gd]**2
+    return loglam, flux, ivar
+
+
+def resample(loglam, flux, ivar, new_loglam):
+    '''Linear interpolation of a spectrum onto a new log-lambda grid
+
+    Pixels outside the spectrum, or next to a masked pixel, get ivar=0.
+
+    Returns:
+    ----------
+    flux, ivar: ndarray
+    '''
+    new_flux = np.interp(new_loglam, loglam, flux, left=0., right=0.)
+    new_ivar = np.interp(new_loglam, loglam, ivar, left=0., right=0.)
+    # Any masked neighbour masks the new pixel
+    bad = np.interp(new_loglam, loglam, (ivar <= 0.).astype(float), left=1., right=1.)
+    new_ivar[bad > 0.] = 0.
+    new_flux[new_ivar == 0.] = 0.
+    return new_flux, new_ivar
+
+
+def spec_stamp(specfil):
+    '''[mtime, size] of a spectrum file as read by read_spspec;  None if missing
+    '''
+    for fil in [specfil, specfil+'.gz']:
+        if os.path.isfile(fil):
+            return list(xxf.file_stamp(fil)[1:])
+    return None
+
+
+def cube_files(outroot):
+    '''Files of a spectral cube:  flux, ivar, loglam and the JSON meta data
+    '''
+    return dict(flux=outroot+'_flux.npy', ivar=outroot+'_ivar.npy',
+                loglam=outroot+'_loglam.npy', meta=outroot+'_cube.json')
+
+
+def open_cube(outroot, mode='r'):
+    '''Memory-map a spectral cube written by load_cube
+
+    Returns:
+    ----------
+    cube: dict
+      loglam, flux (nspec, npix), ivar (nspec, npix), rows, specfiles
+    '''
+    files = cube_files(outroot)
+    with io.open(files['meta'], 'r', encoding='utf-8') as f:
+        meta = json.load(f)
+    cube = dict(loglam=np.load(files['loglam']),
+                flux=np.load(files['flux'], mmap_mode=mode),
+                ivar=np.load(files['ivar'], mmap_mode=mode))
+    cube.update(meta)
+    cube['rows'] = np.array(meta['rows'], dtype=int)
+    return cube
+
+
+def load_cube(specfiles, outroot, loglam=None, rows=None, nthread=8,
+              clobber=False, verbose=True):
+    '''Read spectra concurrently and resample them into a memory-mapped cube
+
+    A cube with the same spectra and grid is reused unless clobber.
+    The (mtime, size) of each spectrum is saved with the cube, and the
+    cube is rebuilt when any of them changes.
+
+    Parameters:
+    ----------
+    specfiles: list of str
+    outroot: str
+      Root of the output files (see cube_files)
+    loglam: ndarray, optional
+      Common grid [loglam_grid()]
+    rows: ndarray, optional
+      Row of each spectrum in the parent catalog;  saved with the cube
+    nthread: int, optional
+      Threads reading the files
+    clobber: bool, optional
+
+    Returns:
+    ----------
+    cube: dict
+      From open_cube
+    '''
+    if loglam is None:
+        loglam = loglam_grid()
+    if rows is None:
+        rows = np.arange(len(specfiles))
+    files = cube_files(outroot)
+    specfiles = [str(specfil) for specfil in specfiles]
+    stamps = [spec_stamp(specfil) for specfil in specfiles]
+    # Reuse?
+    if (not clobber) and os.path.isfile(files['meta']):
+        cube = open_cube(outroot)
+        if ((cube['specfiles'] == specfiles) and (cube.get('stamps') == stamps)
+                and np.array_equal(cube['loglam'], loglam)):
+            return cube
+    if os.path.isfile(files['meta']):
+        os.remove(files['meta'])
+    # Preallocate
+    nspec, npix = len(specfiles), len(loglam)
+    outdir = os.path.dirname(files['flux'])
+    if (len(outdir) > 0) and (not os.path.isdir(outdir)):
+        os.makedirs(outdir)
+    flux = np.lib.format.open_memmap(files['flux'], mode='w+', dtype=np.float32,
+                                     shape=(nspec, npix))
+    ivar = np.lib.format.open_memmap(files['ivar'], mode='w+', dtype=np.float32,
+                                     shape=(nspec, npix))
+    np.save(files['loglam'], loglam)
+
+    # Read and resample
+    def fill(ii):
+        try:
+            sloglam, sflux, sivar = read_spspec(specfiles[ii])
+        except (IOError, OSError) as err:
+            if verbose:
+                print('SDSS_QUASAR: Unable to read {:s}: {}'.format(specfiles[ii], err))
+            return False
+        flux[ii], ivar[ii] = resample(sloglam, sflux, sivar, loglam)
+        return True
+    pool = ThreadPool(nthread)
+    try:
+        gdspec = pool.map(fill, range(nspec), chunksize=max(1, nspec//(4*nthread)))
+    finally:
+        pool.close()
+        pool.join()
+    flux.flush()
+    ivar.flush()
+    del flux, ivar
+
+    # Meta data (written last, so a partial cube is never reused)
+    with io.open(files['meta'], 'w', encoding='utf-8') as f:
+        f.write(json.dumps(dict(specfiles=specfiles, stamps=stamps,
+                                rows=[int(row) for row in rows],
+                                good=[bool(gd) for gd in gdspec])))
+    if verbose:
+        print('SDSS_QUASAR: Wrote {:d} spectra to {:s}'.format(nspec, files['flux']))
+    return open_cube(outroot)
@@ -0,0 +1,43 @@
+# Tests the streaming composites of SDSS spectra
+import numpy as np
+import pytest
+
+from xastropy.sdss import composite as sdss_comp
+from xastropy.sdss import spectra as sdss_spec
+
+
+def mk_cube(nspec=30, seed=1):
+    rng = np.random.RandomState(seed)
+    loglam = sdss_spec.loglam_grid(wvmin=3800., wvmax=9000.)
+    zem = rng.uniform(2., 2.5, nspec)
+    # Power law in the rest frame, scaled
+    rest_wave = 10.**(loglam[None, :] - np.log10(1+zem[:, None]))
+    scale = rng.uniform(0.5, 2., nspec)
+    flux = scale[:, None] * (rest_wave/1460.)**(-1.5)
+    ivar = np.full(flux.shape, 100.)
+    ivar[0, 1000:1100] = 0.
+    return dict(loglam=loglam, flux=flux, ivar=ivar), zem
+
+
+def test_stack():
+    cube, zem = mk_cube()
+    rest_loglam = sdss_comp.rest_grid(1300., 1700.)
+    stack = sdss_comp.stack_cube(cube, zem, rest_loglam, chunksize=7, nboot=20, seed=2)
+    model = (stack['WAVE']/1460.)**(-1.5)
+    for key in ['MEAN', 'WMEAN', 'MEDIAN']:
+        np.testing.assert_allclose(stack[key], model, rtol=1e-3)
+    assert np.all(stack['NSPEC'] <= 30) and np.max(stack['NSPEC']) == 30
+    assert np.all(np.isfinite(stack['SIG_MEDIAN']))
+    # Chunking does not change the stack
+    stack2 = sdss_comp.stack_cube(cube, zem, rest_loglam, chunksize=100, median=False)
+    np.testing.assert_allclose(stack2['WMEAN'], stack['WMEAN'])
+
+
+def test_boot_weights():
+    iboot = np.arange(20)[:, None]
+    weights = sdss_comp.boot_weights(5, iboot, np.arange(1000)[None, :])
+    assert weights.shape == (20, 1000)
+    np.testing.assert_allclose(weights.mean(), 1., atol=0.05)
+    # Any chunk can be regenerated on its own
+    np.testing.assert_array_equal(weights[:, 300:400],
+        sdss_comp.boot_weights(5, iboot, np.arange(300, 400)[None, :]))
@@ -12,17 +12,53 @@ def test_init_class():
 	assert sdss_dr7._version == 'DR7'
 
 def test_parse_by_plate_fiber():
-    if os.getenv('SDSSPATH') is None:
-        assert True
-        return
+	if os.getenv('SDSSPATH') is None:
+		assert True
+		return
 	sdss_dr7 = sdssq.SdssQuasars()
 	row = sdss_dr7.get_qso((287,264))
 	np.testing.assert_allclose(row['Z'], 0.331188)
 
 def test_parse_by_name():
-    if os.getenv('SDSSPATH') is None:
-        assert True
-        return
+	if os.getenv('SDSSPATH') is None:
+		assert True
+		return
 	sdss_dr7 = sdssq.SdssQuasars()
 	row = sdss_dr7.get_qso('J000009.42-102751.9')
 	np.testing.assert_allclose(row['Z'], 1.84493)
+
+def test_match_coord():
+	if os.getenv('SDSSPATH') is None:
+		assert True
+		return
+	from astropy.coordinates import SkyCoord
+	sdss_dr7 = sdssq.SdssQuasars()
+	coord = SkyCoord(['00:00:09.42 -10:27:51.9', '00:00:00.00 +89:59:59.0'],
+                     unit=(u.hourangle, u.deg))
+	idx, sep = sdss_dr7.match_coord(coord, radius=2*u.arcsec)
+	np.testing.assert_allclose(sdss_dr7._data['Z'][idx[0]], 1.84493)
+	assert idx[1] == -1
+	rows = sdss_dr7.cone_search(coord[0], 1*u.arcmin)
+	np.testing.assert_allclose(rows['Z'][0], 1.84493)
+
+def test_plate_rows():
+	if os.getenv('SDSSPATH') is None:
+		assert True
+		return
+	sdss_dr7 = sdssq.SdssQuasars()
+	rows = sdss_dr7.plate_rows(sdss_dr7._data['PLATE'][:100],
+                               sdss_dr7._data['FIBERID'][:100],
+                               mjd=sdss_dr7._data['MJD'][:100])
+	np.testing.assert_array_equal(rows, np.arange(100))
+	assert sdss_dr7.plate_rows(287, 1000) == -1
+
+def test_lazy_columns():
+	if os.getenv('SDSSPATH') is None:
+		assert True
+		return
+	sdss_dr7 = sdssq.SdssQuasars()
+	# Second instance reads the memory-mapped copy
+	sdss_dr7 = sdssq.SdssQuasars()
+	assert sdss_dr7._table is None
+	assert len(sdss_dr7.z) == len(sdss_dr7)
+	assert 'Z' in sdss_dr7._columns
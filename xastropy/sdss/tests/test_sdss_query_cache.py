@@ -0,0 +1,65 @@
+# Module to run tests on the SDSS query cache
+
+import numpy as np
+import os
+import pytest
+
+from astropy.table import Table
+from astropy import units as u
+
+from xastropy.sdss import query_cache as xsqc
+
+
+class CountingBackend(xsqc.LocalBackend):
+    ''' Counts the queries that reach the backend
+    '''
+    nquery = 0
+    def query_region(self, *args, **kwargs):
+        self.nquery += 1
+        return xsqc.LocalBackend.query_region(self, *args, **kwargs)
+
+
+@pytest.fixture
+def backend(tmpdir):
+    rng = np.random.RandomState(1)
+    nobj = 200
+    ra = 150. + rng.uniform(-1., 1., nobj)
+    dec = 2. + rng.uniform(-1., 1., nobj)
+    phot = Table(dict(ra=ra, dec=dec, objid=np.arange(nobj, dtype=np.int64),
+                      petroMag_r=rng.uniform(15., 20., nobj)))
+    spec = Table(dict(ra=ra, dec=dec, specobjid=np.arange(nobj, dtype=np.int64),
+                      z=rng.uniform(0., 0.3, nobj), plate=np.full(nobj, 500),
+                      mjd=np.full(nobj, 51994), fiberID=np.arange(nobj)))
+    phot_file = str(tmpdir.join('phot.fits'))
+    spec_file = str(tmpdir.join('spec.fits'))
+    phot.write(phot_file)
+    spec.write(spec_file)
+    return CountingBackend(phot_file, spec_file)
+
+
+def test_query_cache(backend, tmpdir):
+    cache = xsqc.QueryCache(str(tmpdir.join('cache')), backend=backend)
+    fields = ['ra', 'dec', 'objid', 'petroMag_r']
+    tbl = cache.query_region(150., 2., 0.3*u.deg, fields=fields)
+    direct = backend.phot[np.hypot((backend.phot['ra']-150.)*np.cos(np.radians(2.)),
+                                   backend.phot['dec']-2.) < 0.3]
+    assert sorted(tbl['objid']) == sorted(direct['objid'])
+    assert backend.nquery == 1
+    # Repeat and overlapping (contained) regions come from the cache
+    tbl2 = cache.query_region(150., 2., 0.3, fields=fields)
+    assert len(tbl2) == len(tbl)
+    tbl3 = cache.query_region(150.1, 2., 0.1*u.deg, fields=fields)
+    assert set(tbl3['objid']) <= set(tbl['objid'])
+    assert backend.nquery == 1
+    # Spectra are a separate group
+    spec = cache.query_region(150., 2., 0.3*u.deg)
+    assert 'z' in spec.colnames
+    assert backend.nquery == 2
+    # A new cache reads the files
+    cache2 = xsqc.QueryCache(str(tmpdir.join('cache')), backend=backend)
+    tbls = cache2.query_regions([(150., 2.), (150.5, 2.5)], 0.2*u.deg, fields=fields)
+    assert backend.nquery == 3
+    assert len(tbls) == 2
+    # No duplicates in the merged rows
+    cat, _ = cache2.catalog(fields)
+    assert len(np.unique(cat['objid'])) == len(cat)
@@ -0,0 +1,57 @@
+# Tests the bulk loading of SDSS spectra
+import numpy as np
+import os
+import pytest
+
+from astropy.io import fits
+
+from xastropy.sdss import spectra as sdss_spec
+
+
+def mk_spspec(specfil, flux, coeff0, npix=2000):
+    data = np.zeros((5, npix), dtype=np.float32)
+    data[0] = flux
+    data[2] = 0.5
+    data[2][100] = 0.  # Bad pixel
+    hdu = fits.PrimaryHDU(data)
+    hdu.header['COEFF0'] = coeff0
+    hdu.header['COEFF1'] = 1e-4
+    hdu.writeto(specfil)
+
+
+def test_load_cube(tmpdir):
+    specfiles = []
+    for ii in range(4):
+        specfil = str(tmpdir.join('spSpec-{:d}.fit'.format(ii)))
+        mk_spspec(specfil, 1.+ii, np.log10(3800.)+ii*1e-4)
+        specfiles.append(specfil)
+    specfiles.append(str(tmpdir.join('missing.fit')))
+    outroot = str(tmpdir.join('cube', 'tst'))
+    cube = sdss_spec.load_cube(specfiles, outroot, nthread=2)
+    assert cube['flux'].shape == (5, len(sdss_spec.loglam_grid()))
+    assert cube['good'] == [True]*4 + [False]
+    # Shifted by one pixel
+    np.testing.assert_allclose(cube['flux'][1, :3], [0., 2., 2.])
+    np.testing.assert_allclose(cube['ivar'][0, 99:102], [4., 0., 4.])
+    assert np.all(cube['ivar'][4] == 0.)
+    # Reuse
+    cube2 = sdss_spec.load_cube(specfiles, outroot)
+    assert isinstance(cube2['flux'], np.memmap)
+    np.testing.assert_allclose(cube2['flux'], cube['flux'])
+
+
+def test_cube_outroot(tmpdir):
+    specfil = str(tmpdir.join('spSpec-0.fit'))
+    mk_spspec(specfil, 1., np.log10(3800.))
+    # Bare and nested roots
+    with tmpdir.as_cwd():
+        cube = sdss_spec.load_cube([specfil], 'tst', nthread=1, verbose=False)
+        assert os.path.isfile('tst_flux.npy')
+    outroot = str(tmpdir.join('a', 'b', 'tst'))
+    cube = sdss_spec.load_cube([specfil], outroot, nthread=1, verbose=False)
+    np.testing.assert_allclose(cube['flux'][0, :3], 1.)
+    # A changed spectrum rebuilds the cube
+    os.remove(specfil)
+    mk_spspec(specfil, 3., np.log10(3800.), npix=2001)
+    cube = sdss_spec.load_cube([specfil], outroot, nthread=1, verbose=False)
+    np.testing.assert_allclose(cube['flux'][0, :3], 3.)
@@ -1,5 +1,6 @@
 from . import arrays
 from . import files
+from . import jsonl
 from . import fits
 from . import math
 from . import printing
@@ -28,3 +28,112 @@ def ensure_dir(fil):  # Stolen from the Web
     d = os.path.dirname(fil)
     if not os.path.exists(d):
         os.mkdir(d)
+
+# In-memory copies of parsed files, keyed as the disk cache
+_PARSED = {}
+
+def cache_dir():
+    ''' Directory for binary caches of parsed files
+    Set by the XASTROPY_CACHE environment variable [~/.xastropy/cache]
+    '''
+    cdir = os.getenv('XASTROPY_CACHE')
+    if cdir is None:
+        cdir = os.path.join(os.path.expanduser('~'), '.xastropy', 'cache')
+    return cdir
+
+def file_stamp(fil):
+    ''' (path, mtime, size) of a file, used to validate caches
+    '''
+    fil = os.path.abspath(fil)
+    stat = os.stat(fil)
+    return (fil, stat.st_mtime, stat.st_size)
+
+def cache_key(*args):
+    ''' Hash of strings (e.g. a file path and a tag) naming a cache
+    '''
+    import hashlib
+    return hashlib.md5('|'.join(args).encode('utf-8')).hexdigest()
+
+def load_cache(key, stamp):
+    ''' Load a cached object if its stamp matches
+
+    Parameters
+    ----------
+    key : str
+      Name of the cache, e.g. from cache_key
+    stamp : tuple
+      Identifies the sources, e.g. from file_stamp;  must match the
+      stamp saved with the object
+
+    Returns
+    -------
+    data : object or None
+      None if there is no valid cache
+    '''
+    import pickle
+    # Memory
+    try:
+        mstamp, data = _PARSED[key]
+    except KeyError:
+        pass
+    else:
+        if mstamp == stamp:
+            return data
+    # Disk
+    cfil = os.path.join(cache_dir(), key+'.pkl')
+    if not os.path.isfile(cfil):
+        return None
+    try:
+        with open(cfil, 'rb') as f:
+            cstamp, data = pickle.load(f)
+    except Exception:  # Corrupt or incompatible cache
+        return None
+    if cstamp != stamp:
+        return None
+    _PARSED[key] = (stamp, data)
+    return data
+
+def save_cache(key, stamp, data):
+    ''' Save an object (with its stamp) to the memory and disk caches
+    '''
+    import pickle
+    _PARSED[key] = (stamp, data)
+    cfil = os.path.join(cache_dir(), key+'.pkl')
+    try:
+        if not os.path.isdir(cache_dir()):
+            os.makedirs(cache_dir())
+        tmp = cfil+'.{:d}'.format(os.getpid())
+        with open(tmp, 'wb') as f:
+            pickle.dump((stamp, data), f, pickle.HIGHEST_PROTOCOL)
+        os.rename(tmp, cfil)
+    except (IOError, OSError):
+        print('save_cache: Unable to write {:s}'.format(cfil))
+
+def cached_parse(fil, parser, tag='', use_cache=True):
+    ''' Parse a file, using a binary (pickle) cache keyed by path and mtime
+
+    Parameters
+    ----------
+    fil : str
+      File to parse
+    parser : function
+      Called as parser(fil) when there is no valid cache.
+      Its output must be picklable
+    tag : str, optional
+      Distinguishes caches of different parsers of the same file
+    use_cache : bool, optional
+      Set to False to always parse (and not write a cache)
+
+    Returns
+    -------
+    Output of parser(fil)
+    '''
+    if not use_cache:
+        return parser(fil)
+    stamp = file_stamp(fil)
+    key = cache_key(stamp[0], tag)
+    data = load_cache(key, stamp)
+    if data is None:
+        data = parser(fil)
+        save_cache(key, stamp, data)
+    return data
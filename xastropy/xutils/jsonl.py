@@ -0,0 +1,184 @@
+"""
+#;+
+#; NAME:
+#; jsonl
+#;    Version 1.0
+#;
+#; PURPOSE:
+#;    Module for line-delimited JSON files with an offset index
+#;   18-Oct-2016
+#;-
+#;------------------------------------------------------------------------------
+"""
+from __future__ import print_function, absolute_import, division, unicode_literals
+
+import numpy as np
+import os, io, json
+
+from xastropy.xutils import files as xxf
+
+
+def _to_json(obj):
+    ''' Default for JSONEncoder: numpy scalars, arrays and Quantities
+    '''
+    if hasattr(obj, 'unit') and hasattr(obj, 'value'):
+        return _to_json(obj.value)
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, bytes):
+        return obj.decode('utf-8')
+    raise TypeError('{} is not JSON serializable'.format(repr(obj)))
+
+
+def index_file(fil):
+    ''' Name of the offset index of a JSONL file
+    '''
+    return fil+'.idx'
+
+
+class JsonlWriter(object):
+    '''Write records to a JSONL file, one line at a time
+
+    The offset and length of each record are kept and written to an
+    index file on close.  Use as a context manager.
+
+    Parameters
+    ----------
+    outfil : str
+    key : str, optional
+      Field holding the name of each record ['Name']
+    '''
+    def __init__(self, outfil, key='Name'):
+        self.outfil = outfil
+        self.key = key
+        self.index = {}
+        self._f = io.open(outfil, 'wb')
+        self._encoder = json.JSONEncoder(sort_keys=True, default=_to_json)
+
+    def write(self, record, name=None):
+        ''' Append one record
+
+        Parameters
+        ----------
+        record : dict
+          Not modified
+        name : str, optional
+          Stored in record[key] if given;  otherwise read from it
+        '''
+        if name is not None:
+            record = dict(record)
+            record[self.key] = name
+        name = record[self.key]
+        if name in self.index:
+            raise ValueError('Duplicate record {:s}'.format(name))
+        line = (self._encoder.encode(record)+'\n').encode('utf-8')
+        self.index[name] = (self._f.tell(), len(line))
+        self._f.write(line)
+
+    def close(self):
+        if self._f.closed:
+            return
+        self._f.close()
+        write_index(self.outfil, self.index, self.key)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def write_index(fil, index, key='Name'):
+    ''' Write the offset index of a JSONL file
+
+    Parameters
+    ----------
+    fil : str
+      JSONL file
+    index : dict
+      (offset, length) of each record, keyed by name
+    '''
+    idx = dict(key=key, stamp=list(xxf.file_stamp(fil)[1:]), index=index)
+    with io.open(index_file(fil), 'w', encoding='utf-8') as f:
+        f.write(json.dumps(idx, sort_keys=True))
+
+
+def scan_index(fil, key='Name'):
+    ''' Build the offset index of a JSONL file by reading each line
+    '''
+    index = {}
+    offset = 0
+    with io.open(fil, 'rb') as f:
+        for line in f:
+            if len(line.strip()) > 0:
+                name = json.loads(line.decode('utf-8'))[key]
+                index[name] = (offset, len(line))
+            offset += len(line)
+    return index
+
+
+class JsonlReader(object):
+    '''Random access by name to the records of a JSONL file
+
+    The offset index is read from the index file, or rebuilt (and
+    saved) when it is missing or stale (mtime and size of the file).
+
+    Parameters
+    ----------
+    fil : str
+    key : str, optional
+      Field holding the name of each record ['Name']
+    '''
+    def __init__(self, fil, key='Name'):
+        self.fil = fil
+        self.key = key
+        self.index = self.load_index()
+
+    def load_index(self):
+        ''' Offset index of the file, keyed by name
+        '''
+        idx_fil = index_file(self.fil)
+        if os.path.isfile(idx_fil):
+            with io.open(idx_fil, 'r', encoding='utf-8') as f:
+                idx = json.load(f)
+            if ((idx.get('stamp') == list(xxf.file_stamp(self.fil)[1:])) &
+                    (idx['key'] == self.key)):
+                return dict((name, tuple(val))
+                            for name, val in idx['index'].items())
+        # Rebuild
+        index = scan_index(self.fil, key=self.key)
+        write_index(self.fil, index, key=self.key)
+        return index
+
+    @property
+    def names(self):
+        ''' Names of the records, in file order
+        '''
+        return sorted(self.index, key=lambda name: self.index[name][0])
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, name):
+        return name in self.index
+
+    def __getitem__(self, name):
+        ''' Read one record
+        '''
+        offset, length = self.index[name]
+        with io.open(self.fil, 'rb') as f:
+            f.seek(offset)
+            return json.loads(f.read(length).decode('utf-8'))
+
+    def __iter__(self):
+        ''' Stream the records in file order
+        '''
+        with io.open(self.fil, 'rb') as f:
+            for line in f:
+                if len(line.strip()) > 0:
+                    yield json.loads(line.decode('utf-8'))
+
+    def __repr__(self):
+        return '[JsonlReader: {:s}, nrec={:d}]'.format(self.fil, len(self))
@@ -0,0 +1,60 @@
+# Module to run tests on line-delimited JSON files
+
+### TEST_UNICODE_LITERALS
+
+import numpy as np
+import os
+import pytest
+
+from xastropy.xutils import jsonl as xxj
+
+
+def test_write_read(tmpdir):
+    outfil = str(tmpdir.join('sys.jsonl'))
+    with xxj.JsonlWriter(outfil) as jwrite:
+        for ii in range(5):
+            jwrite.write(dict(zabs=np.float64(2.+ii/10.), flux=np.arange(ii)),
+                         name='J{:d}'.format(ii))
+    assert os.path.isfile(xxj.index_file(outfil))
+    # Random access
+    jread = xxj.JsonlReader(outfil)
+    assert len(jread) == 5
+    assert jread.names == ['J0', 'J1', 'J2', 'J3', 'J4']
+    rec = jread['J3']
+    np.testing.assert_allclose(rec['zabs'], 2.3)
+    assert rec['flux'] == [0, 1, 2]
+    # Stream
+    assert [rec['Name'] for rec in jread] == jread.names
+
+
+def test_stale_index(tmpdir):
+    outfil = str(tmpdir.join('sys.jsonl'))
+    with xxj.JsonlWriter(outfil) as jwrite:
+        jwrite.write(dict(zabs=2.), name='J0')
+    # Append without updating the index
+    with open(outfil, 'ab') as f:
+        f.write(b'{"Name": "J1", "zabs": 3.0}\n')
+    jread = xxj.JsonlReader(outfil)
+    assert 'J1' in jread
+    assert jread['J1']['zabs'] == 3.
+    with pytest.raises(ValueError):
+        with xxj.JsonlWriter(outfil) as jwrite:
+            jwrite.write(dict(Name='J0'))
+            jwrite.write(dict(Name='J0'))
+
+
+def test_same_size_rewrite(tmpdir):
+    outfil = str(tmpdir.join('sys.jsonl'))
+    rec = dict(zabs=2.)
+    with xxj.JsonlWriter(outfil) as jwrite:
+        jwrite.write(rec, name='J0')
+    assert 'Name' not in rec
+    xxj.JsonlReader(outfil)
+    # Same size, new name;  only the mtime changes
+    stat = os.stat(outfil)
+    with open(outfil, 'wb') as f:
+        f.write(b'{"Name": "J9", "zabs": 2.0}\n')
+    os.utime(outfil, (stat.st_atime, stat.st_mtime+10))
+    assert os.path.getsize(outfil) == stat.st_size
+    jread = xxj.JsonlReader(outfil)
+    assert jread.names == ['J9']